@@ -2,8 +2,12 @@ import streamlit as st
 from datetime import datetime
 import time 
 from dotenv import load_dotenv
-import os
-import psycopg2
+from db import init_db, cursor, consultar, consultar_um
+from livro_saldos import origem_movimento
+from migracoes import schema_em_dia
+from referencias import casas, categorias, torneios, invalidar_referencias
+from modelo_embeddings import iniciar_aquecimento
+from importacao_apostas import ler_arquivo, validar_apostas, importar_apostas, OBRIGATORIAS
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -64,64 +68,27 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Função para conectar ao PostgreSQL utilizando o DATABASE_URL do .env
-def init_db():
-    try:
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            st.error("Variável de ambiente DATABASE_URL não definida")
-            return None
-        
-        conn = psycopg2.connect(database_url)
-        cursor = conn.cursor()
+# Função para subtrair o valor apostado do saldo da casa (na transação do chamador)
+def subtrair_saldo_casa(cur, casa_de_aposta, valor_apostado):
+    origem_movimento(cur, "Aposta", "Aposta registrada")
+    cur.execute("""
+        UPDATE saldo_casas
+        SET saldo = saldo - %s
+        WHERE casa_id = (SELECT id FROM casas WHERE nome = %s)
+    """, (valor_apostado, casa_de_aposta))
 
-        # Cria a tabela 'apostas' se não existir
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS apostas (
-                id SERIAL PRIMARY KEY,
-                data TEXT,
-                casa_de_apostas TEXT,
-                tipo_aposta TEXT,
-                categoria TEXT,
-                resultado TEXT,
-                valor_apostado REAL,
-                odd TEXT, 
-                valor_final REAL,
-                torneio TEXT,
-                partida TEXT,
-                detalhes TEXT,
-                bonus REAL
-            )
-        """)
-        conn.commit()
-        return conn
-    except Exception as e:
-        st.error(f"Erro de conexão: {e}")
-        return None
-
-# Função para subtrair o valor apostado do saldo da casa
-def subtrair_saldo_casa(casa_de_aposta, valor_apostado):
-    try:
-        conn = init_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE saldo_casas
-            SET saldo = saldo - %s
-            WHERE casa_nome = %s
-        """, (valor_apostado, casa_de_aposta))
-        conn.commit()
-    except Exception as e:
-        st.error(f"Erro ao subtrair saldo da casa: {e}")
-        conn.rollback()
+# Começa a carregar o modelo do Agente de IA já na página inicial, em segundo plano
+iniciar_aquecimento()
 
 # Inicializa o banco de dados
-conn = init_db()
+if not init_db() or not schema_em_dia():
+    st.stop()
 
 # Título principal com estilo melhorado
 st.markdown('<h1 class="main-header">📊 Registro de Apostas Esportivas</h1>', unsafe_allow_html=True)
 
 # Criando abas para melhor organização
-tab1, tab2 = st.tabs(["📝 Nova Aposta", "📋 Apostas Registradas"])
+tab1, tab2, tab3 = st.tabs(["📝 Nova Aposta", "📋 Apostas Registradas", "📥 Importar Planilha"])
 
 with tab1:
     # Organizando em colunas para melhor layout
@@ -135,21 +102,9 @@ with tab1:
             help="Selecione a data em que a aposta foi realizada"
         )
         
-        casas_de_apostas = [
-            'Bet 365', 'Betano', 'Betfair', 'Superbet', 'Estrela Bet', 
-            '4Play Bet', 'PixBet', 'Vera Bet', 'Bet7k', 'Cassino Pix',  'Bet MGM',
-            'McGames', 'Aposta Ganha', 'Aposta tudo', 'Novibet', 'Sporting Bet',
-            'KTO', 'Stake', 'LotoGreen', 'BR Bet', 'Rei do Pitaco',
-            'Bulls Bet', 'BR4 Bet', 'Casa de Apostas', 'Bateu Bet', 
-            'Betnacional', 'Jogue Facil', 'Jogo de Ouro', 'H2 Bet', 
-            'Pagol', 'MetGol', 'UxBet', 'HiperBet', 'Seu Bet', 
-            'Bet Esporte', 'BetFast', 'Faz1Bet', 'Esportiva Bet', 
-            'Betpix365', 'Seguro Bet', 'Outros'
-        ]
-        
         casa_de_aposta = st.selectbox(
             '🏢 Casa de Apostas',
-            options=casas_de_apostas,
+            options=casas(),
             help="Selecione a casa de apostas onde a aposta foi realizada"
         )
         
@@ -160,16 +115,9 @@ with tab1:
             help="Selecione o tipo de aposta realizada"
         )
         
-        categorias_aposta = [
-            'Resultado', 'Finalizações', 'Escanteios', 'HT', 'FT', 
-            'Gols', 'Chutes ao Gol', 'Ambas Equipes', 'Faltas cometidas', 
-            'Faltas Sofridas', 'Cartões', 'Defesas', 'Desarmes', 
-            'Handicap', 'Tiro de Linha', 'Impedimentos', 'Desempenho', 'Outros'
-        ]
-        
         categoria = st.multiselect(
             "🔍 Categoria da Aposta",
-            options=categorias_aposta,
+            options=categorias(),
             help="Selecione todas as categorias aplicáveis a esta aposta"
         )
     
@@ -223,17 +171,9 @@ with tab1:
     col3, col4 = st.columns(2)
     
     with col3:
-        torneios = [
-            'Brasileirão A', 'Champions League', 'Europa League', 'Conference League', 
-            'Premier League', 'La Liga', 'Bundesliga', 'Serie A', 'Ligue 1', 'Mundial de Clubes',
-            'Copa do Brasil', 'Serie B', 'Brasileirão B', 'Championship', 
-            'Pro Saudi League', 'Torneo Betano', 'Libertadores', 'Sul-Americana', 
-            'FA Cup', 'Liga Portugal', 'Super Lig', 'Estaduais', 'Data Fifa', 'Outros'
-        ]
-        
         torneio = st.multiselect(
             "🏆 Torneio",
-            options=torneios,
+            options=torneios(),
             help="Selecione o(s) torneio(s) relacionado(s) à aposta"
         )
         
@@ -289,31 +229,30 @@ with tab1:
                 else:
                     valor_final = 0
     
-                if not bonus_flag:
-                    subtrair_saldo_casa(casa_de_aposta, valor_apostado)
+                # Débito do saldo e inserção no banco na mesma transação
+                with cursor() as cur:
+                    if not bonus_flag:
+                        subtrair_saldo_casa(cur, casa_de_aposta, valor_apostado)
     
-                # Inserção no banco
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO apostas (
-                        data, casa_de_apostas, tipo_aposta, categoria, resultado, bonus, 
-                        valor_apostado, odd, valor_final, torneio, partida, detalhes
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    data.strftime("%Y-%m-%d"),
-                    casa_de_aposta,
-                    tipo_aposta,
-                    ", ".join(categoria) if categoria else "",
-                    resultado,
-                    1 if bonus_flag else (2 if bonus_combinadas_flag else 0),
-                    valor_apostado,
-                    f"{', '.join(map(str, odds_list))}|{bonus_percent}" if bonus_combinadas_flag else ", ".join(map(str, odds_list)),
-                    valor_final,
-                    ", ".join(torneio) if torneio else "",
-                    partida,
-                    detalhes_aposta
-                ))
-                conn.commit()
+                    cur.execute("""
+                        INSERT INTO apostas (
+                            data, casa_id, tipo_aposta, categoria, resultado, bonus, 
+                            valor_apostado, odd, valor_final, torneio, partida, detalhes
+                        ) VALUES (%s, id_casa(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """, (
+                        data.strftime("%Y-%m-%d"),
+                        casa_de_aposta,
+                        tipo_aposta,
+                        ", ".join(categoria) if categoria else "",
+                        resultado,
+                        1 if bonus_flag else (2 if bonus_combinadas_flag else 0),
+                        valor_apostado,
+                        f"{', '.join(map(str, odds_list))}|{bonus_percent}" if bonus_combinadas_flag else ", ".join(map(str, odds_list)),
+                        valor_final,
+                        ", ".join(torneio) if torneio else "",
+                        partida,
+                        detalhes_aposta
+                    ))
                 
                 # Mensagem de sucesso personalizada
                 st.markdown(
@@ -333,13 +272,12 @@ with tab1:
             
         except Exception as e:
             st.error(f"❌ Erro ao salvar aposta: {e}")
-            conn.rollback()
 
 with tab2:
     st.markdown('<h3 class="section-header">Histórico de Apostas</h3>', unsafe_allow_html=True)
     
     # Adicionando filtros para o histórico
-    filtro_col1, filtro_col2, filtro_col3 = st.columns(3)
+    filtro_col1, filtro_col2, filtro_col3, filtro_col4 = st.columns([2, 2, 2, 1])
     
     with filtro_col1:
         filtro_resultado = st.selectbox(
@@ -351,7 +289,7 @@ with tab2:
     with filtro_col2:
         filtro_casa = st.selectbox(
             "Filtrar por casa de apostas",
-            options=["Todas"] + casas_de_apostas,
+            options=["Todas"] + casas(),
             index=0
         )
     
@@ -362,35 +300,66 @@ with tab2:
             help="Deixe vazio para ver todas as datas"
         )
     
+    with filtro_col4:
+        tamanho_pagina = st.selectbox(
+            "Por página",
+            options=[25, 50, 100, 200],
+            index=1
+        )
+    
+    # Paginação por chave (id): cada página guarda o id a partir do qual começa,
+    # então o custo é o mesmo na primeira ou na centésima página
+    chave_filtros = (filtro_resultado, filtro_casa, filtro_data, tamanho_pagina)
+    if st.session_state.get("historico_filtros") != chave_filtros:
+        st.session_state.historico_filtros = chave_filtros
+        st.session_state.historico_paginas = [None]
+    
     try:
-        cursor = conn.cursor()
-        
-        # Base da consulta SQL
-        query = "SELECT * FROM apostas WHERE 1=1"
+        # Condições dos filtros, compartilhadas pelo resumo e pela página
+        condicoes = "WHERE 1=1"
         params = []
         
         # Aplicar filtros se selecionados
         if filtro_resultado != "Todos":
-            query += " AND resultado = %s"
+            condicoes += " AND a.resultado = %s"
             params.append(filtro_resultado)
             
         if filtro_casa != "Todas":
-            query += " AND casa_de_apostas = %s"
+            condicoes += " AND a.casa_id = (SELECT id FROM casas WHERE nome = %s)"
             params.append(filtro_casa)
             
         if filtro_data:
-            query += " AND data = %s"
+            condicoes += " AND a.data = %s"
             params.append(filtro_data.strftime("%Y-%m-%d"))
-            
-        query += " ORDER BY id DESC"
         
-        # Executar a consulta com os filtros
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-            
-        apostas = cursor.fetchall()
+        # Totais de todas as apostas filtradas em uma única agregação
+        total_apostas, total_apostado = consultar_um(
+            f"SELECT COUNT(*), COALESCE(SUM(a.valor_apostado), 0) FROM apostas a {condicoes}", params
+        )
+        
+        # Página atual: apostas com id abaixo do início da página (uma a mais para saber se há próxima)
+        inicio_pagina = st.session_state.historico_paginas[-1]
+        query = f"""
+            SELECT a.id, a.data, c.nome, a.tipo_aposta, a.valor_apostado, a.odd, a.resultado, a.partida
+            FROM apostas a
+            LEFT JOIN casas c ON c.id = a.casa_id
+            {condicoes}
+        """
+        params_pagina = list(params)
+        if inicio_pagina is not None:
+            query += " AND a.id < %s"
+            params_pagina.append(inicio_pagina)
+        query += " ORDER BY a.id DESC LIMIT %s"
+        params_pagina.append(tamanho_pagina + 1)
+        
+        apostas = consultar(query, params_pagina)
+        tem_proxima = len(apostas) > tamanho_pagina
+        apostas = apostas[:tamanho_pagina]
+        
+        # Página ficou vazia (apostas excluídas em outra sessão): volta para a primeira
+        if not apostas and len(st.session_state.historico_paginas) > 1:
+            st.session_state.historico_paginas = [None]
+            st.rerun()
         
         if apostas:
             # Exibindo em formato de tabela estilizada
@@ -440,22 +409,22 @@ with tab2:
             dados = []
             for a in apostas:
                 # Formatando o resultado com cor
-                if a[5] == "Ganhou":
-                    resultado_format = f'<span class="ganhou">{a[5]}</span>'
-                elif a[5] == "Perdeu":
-                    resultado_format = f'<span class="perdeu">{a[5]}</span>'
+                if a[6] == "Ganhou":
+                    resultado_format = f'<span class="ganhou">{a[6]}</span>'
+                elif a[6] == "Perdeu":
+                    resultado_format = f'<span class="perdeu">{a[6]}</span>'
                 else:
-                    resultado_format = f'<span class="pendente">{a[5]}</span>'
+                    resultado_format = f'<span class="pendente">{a[6]}</span>'
                 
                 dados.append([
                     a[0],  # ID
                     datetime.strptime(a[1], "%Y-%m-%d").strftime("%d/%m/%Y") if a[1] else "",  # Data formatada
                     a[2],  # Casa de apostas
                     a[3],  # Tipo de aposta
-                    f"{a[6]:.2f}",  # Valor apostado formatado
-                    a[7],  # Odd
+                    f"{a[4]:.2f}",  # Valor apostado formatado
+                    a[5],  # Odd
                     resultado_format,  # Resultado formatado
-                    a[10]  # Partida
+                    a[7]  # Partida
                 ])
             
             # Exibindo a tabela
@@ -473,12 +442,27 @@ with tab2:
                 unsafe_allow_html=True
             )
             
-            # Estatísticas resumidas
-            st.markdown('<h3 class="section-header">Estatísticas</h3>', unsafe_allow_html=True)
+            # Navegação entre páginas
+            pagina_atual = len(st.session_state.historico_paginas)
+            total_paginas = max(1, -(-total_apostas // tamanho_pagina))
+            nav_col1, nav_col2, nav_col3 = st.columns([1, 2, 1])
+            with nav_col1:
+                if st.button("◀ Anterior", disabled=pagina_atual == 1, use_container_width=True):
+                    st.session_state.historico_paginas.pop()
+                    st.rerun()
+            with nav_col2:
+                st.markdown(
+                    f"<p style='text-align: center; padding-top: 0.4rem;'>Página {pagina_atual} de {total_paginas}</p>",
+                    unsafe_allow_html=True
+                )
+            with nav_col3:
+                if st.button("Próxima ▶", disabled=not tem_proxima, use_container_width=True):
+                    st.session_state.historico_paginas.append(apostas[-1][0])
+                    st.rerun()
             
-            # Calculando estatísticas
-            total_apostas = len(apostas)
-            total_apostado = sum(a[6] for a in apostas if a[6] is not None)
+            # Estatísticas resumidas (de todas as apostas filtradas, não só da página)
+            st.markdown('<h3 class="section-header">Estatísticas</h3>', unsafe_allow_html=True)
+            total_apostado = float(total_apostado)
             
             # Exibindo estatísticas em cards
             stat_col1, stat_col2, stat_col3 = st.columns(3)
@@ -521,6 +505,58 @@ with tab2:
     except Exception as e:
         st.error(f"Erro ao carregar apostas: {e}")
 
+with tab3:
+    st.markdown('<h3 class="section-header">Importação em Lote</h3>', unsafe_allow_html=True)
+    st.caption(
+        f"Colunas obrigatórias: {', '.join(OBRIGATORIAS)}. Opcionais: tipo_aposta, categoria, resultado, "
+        "bonus, valor_final, torneio, partida, detalhes. Também disponível pela linha de comando: "
+        "`python importacao_apostas.py planilha.csv`"
+    )
+
+    arquivo = st.file_uploader("📄 Planilha de apostas", type=["csv", "xlsx", "xls"])
+    if arquivo is not None:
+        try:
+            inicio_validacao = time.perf_counter()
+            validas, rejeitadas = validar_apostas(ler_arquivo(arquivo, arquivo.name))
+            tempo_validacao = time.perf_counter() - inicio_validacao
+        except Exception as e:
+            st.error(f"Erro ao ler a planilha: {e}")
+            st.stop()
+
+        col_v1, col_v2, col_v3 = st.columns(3)
+        col_v1.metric("Apostas válidas", len(validas))
+        col_v2.metric("Linhas rejeitadas", len(rejeitadas))
+        col_v3.metric("Validação", f"{tempo_validacao:.2f} s")
+
+        if not rejeitadas.empty:
+            with st.expander("⚠️ Linhas rejeitadas"):
+                st.dataframe(rejeitadas, hide_index=True, use_container_width=True)
+        if not validas.empty:
+            st.dataframe(validas.head(50), hide_index=True, use_container_width=True)
+
+            ajustar_saldo = st.checkbox(
+                "💰 Ajustar saldo das casas",
+                value=True,
+                help="Debita as apostas e credita os ganhos no saldo de cada casa, como no registro manual"
+            )
+            if st.button(f"📥 IMPORTAR {len(validas)} APOSTAS", use_container_width=True):
+                try:
+                    with st.spinner("Importando..."):
+                        relatorio = importar_apostas(validas, ajustar_saldo=ajustar_saldo)
+                    # A planilha pode trazer casas, categorias ou torneios novos
+                    invalidar_referencias()
+                    st.success(
+                        f"✅ {relatorio['linhas']} apostas importadas em {relatorio['segundos']:.2f} s "
+                        f"({relatorio['linhas_por_segundo']:,.0f} linhas/s)"
+                    )
+                    if relatorio['casas_sem_saldo']:
+                        st.warning(
+                            "Casas sem saldo cadastrado (saldo não ajustado): "
+                            + ", ".join(relatorio['casas_sem_saldo'])
+                        )
+                except Exception as e:
+                    st.error(f"Erro na importação: {e}")
+
 # Adiciona um footer
 st.markdown(
     """
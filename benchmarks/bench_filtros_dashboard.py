@@ -0,0 +1,176 @@
+# Compara os filtros do Dashboard em pandas (tabela inteira) e no SQL.
+#
+#   python benchmarks/bench_filtros_dashboard.py --tamanhos 10000 100000 1000000
+#
+# Os dados sintéticos ficam em um schema separado (apagado ao final), então o
+# benchmark pode rodar contra o mesmo banco do app sem tocar nas tabelas reais.
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+SCHEMA = "bench_dashboard"
+# Todas as conexões do pool deste processo enxergam primeiro o schema do benchmark
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from db import cursor  # noqa: E402
+from dados_apostas import _buscar_apostas, filtrar_apostas, montar_filtro_sql  # noqa: E402
+from migracao_apostas import NOME_MIGRACAO, aplicar_schema  # noqa: E402
+
+CASAS = ['Bet 365', 'Betano', 'Betfair', 'Superbet', 'Estrela Bet', 'KTO', 'Stake', 'Novibet', 'PixBet', 'Outros']
+TIPOS = ['Simples', 'Dupla', 'Tripla', 'Múltipla', 'Super Odd']
+CATEGORIAS = ['Resultado', 'Finalizações', 'Escanteios', 'Gols', 'Cartões', 'Handicap', 'Ambas Equipes', 'Outros']
+TORNEIOS = ['Brasileirão A', 'Champions League', 'Premier League', 'La Liga', 'Serie A', 'Libertadores',
+            'Copa do Brasil', 'Bundesliga', 'Ligue 1', 'Outros']
+
+# Seleção típica de quem usa a sidebar: um mês, algumas casas, liquidadas
+FILTROS = {
+    'periodo': (date(2024, 6, 1), date(2024, 6, 30)),
+    'tipo_aposta': TIPOS,
+    'torneio': ['Brasileirão A', 'Libertadores', 'Copa do Brasil'],
+    'casa_de_apostas': ['Bet 365', 'Betano', 'Superbet'],
+    'resultado': ['Ganhou', 'Perdeu'],
+    'categoria': CATEGORIAS,
+}
+
+
+def _array_sql(valores):
+    return "ARRAY[" + ", ".join("'" + v.replace("'", "''") + "'" for v in valores) + "]"
+
+
+def _sorteio(valores):
+    return f"({_array_sql(valores)})[1 + floor(random() * {len(valores)})::int]"
+
+
+def preparar_dados(n):
+    with cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        cur.execute("""
+            CREATE TABLE casas (
+                id SERIAL PRIMARY KEY,
+                nome TEXT UNIQUE NOT NULL,
+                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("INSERT INTO casas (nome) SELECT unnest(%s::text[])", (CASAS,))
+        cur.execute("""
+            CREATE TABLE apostas (
+                id SERIAL PRIMARY KEY,
+                data TEXT,
+                casa_id INTEGER REFERENCES casas(id),
+                tipo_aposta TEXT,
+                categoria TEXT,
+                resultado TEXT,
+                valor_apostado REAL,
+                odd TEXT,
+                valor_final REAL,
+                torneio TEXT,
+                partida TEXT,
+                detalhes TEXT,
+                bonus REAL
+            )
+        """)
+        cur.execute(f"""
+            INSERT INTO apostas (data, casa_id, tipo_aposta, categoria, resultado,
+                                 valor_apostado, odd, valor_final, torneio, partida, detalhes, bonus)
+            SELECT
+                to_char(DATE '2023-01-01' + floor(random() * 730)::int, 'YYYY-MM-DD'),
+                1 + floor(random() * {len(CASAS)})::int,
+                {_sorteio(TIPOS)},
+                {_sorteio(CATEGORIAS)} || CASE WHEN random() < 0.4 THEN ', ' || {_sorteio(CATEGORIAS)} ELSE '' END,
+                {_sorteio(['Ganhou', 'Perdeu', 'Pendente'])},
+                round((5 + random() * 95)::numeric, 2),
+                round((1.2 + random() * 2)::numeric, 2)::text,
+                round((random() * 200 - 100)::numeric, 2),
+                {_sorteio(TORNEIOS)},
+                'Time A vs Time B',
+                'Aposta sintética ' || g,
+                0
+            FROM generate_series(1, %s) AS g
+        """, (n,))
+
+        # Estrutura tipada criada depois da carga, e preenchida em SQL de uma vez
+        aplicar_schema(cur)
+        cur.execute("UPDATE apostas SET data_aposta = texto_para_data(data), odd_total = produto_odds(odd)")
+        for coluna, juncao, tabela in (("categoria", "aposta_categorias", "categorias"),
+                                       ("torneio", "aposta_torneios", "torneios")):
+            cur.execute(f"""
+                INSERT INTO {tabela} (nome)
+                SELECT DISTINCT lista_texto({coluna}) FROM apostas
+                ON CONFLICT (nome) DO NOTHING
+            """)
+            cur.execute(f"""
+                INSERT INTO {juncao}
+                SELECT a.id, t.id
+                FROM apostas a
+                CROSS JOIN LATERAL lista_texto(a.{coluna}) AS n(nome)
+                JOIN {tabela} t ON t.nome = n.nome
+            """)
+        cur.execute("""
+            UPDATE migracao_progresso
+            SET concluida = TRUE, ultimo_id = (SELECT MAX(id) FROM apostas)
+            WHERE nome = %s
+        """, (NOME_MIGRACAO,))
+    with cursor() as cur:
+        cur.execute("ANALYZE")
+
+
+def caminho_pandas():
+    df = _buscar_apostas()
+    return filtrar_apostas(df, FILTROS)
+
+
+def caminho_sql():
+    where, params = montar_filtro_sql(FILTROS)
+    return _buscar_apostas(f"WHERE {where} ORDER BY apostas.id", params)
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os filtros do Dashboard em pandas e no SQL.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--manter", action="store_true", help="Não apaga o schema do benchmark ao final")
+    args = parser.parse_args()
+
+    resultados = []
+    try:
+        for n in args.tamanhos:
+            print(f"Gerando {n} apostas sintéticas...")
+            preparar_dados(n)
+            t_pandas, linhas_pandas = medir(caminho_pandas, args.repeticoes)
+            t_sql, linhas_sql = medir(caminho_sql, args.repeticoes)
+            if linhas_pandas != linhas_sql:
+                print(f"  atenção: caminhos divergem ({linhas_pandas} x {linhas_sql} linhas)")
+            resultados.append({
+                "linhas": n,
+                "filtradas": linhas_sql,
+                "pandas (s)": round(t_pandas, 3),
+                "sql (s)": round(t_sql, 3),
+                "ganho": f"{t_pandas / t_sql:.1f}x" if t_sql else "-",
+            })
+    finally:
+        if not args.manter:
+            with cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    print()
+    print(pd.DataFrame(resultados).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
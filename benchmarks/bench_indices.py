@@ -0,0 +1,176 @@
+# Planos (EXPLAIN) e tempos das consultas das páginas antes e depois dos índices
+# da migração 5 (migracoes.DDL_INDICES), sobre dados sintéticos.
+#
+#   python benchmarks/bench_indices.py --linhas 1000000
+#
+# Como em bench_filtros_dashboard.py, tudo roda em um schema separado, apagado ao final.
+import argparse
+import os
+import statistics
+import sys
+import time
+
+SCHEMA = "bench_indices"
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from db import cursor  # noqa: E402
+from migracao_apostas import aplicar_schema  # noqa: E402
+from migracoes import DDL_BASE, DDL_INDICES  # noqa: E402
+
+CASAS = ['Bet 365', 'Betano', 'Betfair', 'Superbet', 'Estrela Bet', 'KTO', 'Stake', 'Novibet', 'PixBet', 'Outros']
+OPERACOES = ['Depósito', 'Saque', 'Ganhou', 'Perdeu', 'Ajuste Manual']
+
+# Mesmas consultas das páginas, com valores fixos
+CONSULTAS = [
+    ("Atualização: resumo das pendentes", """
+        SELECT SUM(valor_apostado), COUNT(*) FROM apostas WHERE resultado = 'Pendente'
+    """),
+    ("Atualização: listagem das pendentes", """
+        SELECT id, data, tipo_aposta, valor_apostado, odd, torneio, partida, detalhes, casa_de_apostas, bonus
+        FROM apostas WHERE resultado = 'Pendente' ORDER BY data DESC
+    """),
+    ("Histórico: página por casa", """
+        SELECT id, data, casa_de_apostas, tipo_aposta, valor_apostado, odd, resultado, partida
+        FROM apostas WHERE 1=1 AND casa_de_apostas = 'Betano' ORDER BY id DESC LIMIT 51
+    """),
+    ("Histórico: página por resultado", """
+        SELECT id, data, casa_de_apostas, tipo_aposta, valor_apostado, odd, resultado, partida
+        FROM apostas WHERE 1=1 AND resultado = 'Pendente' ORDER BY id DESC LIMIT 51
+    """),
+    ("Histórico: totais por data", """
+        SELECT COUNT(*), COALESCE(SUM(valor_apostado), 0) FROM apostas WHERE 1=1 AND data = '2024-06-15'
+    """),
+    ("Dashboard: apostas de um mês", """
+        SELECT id FROM apostas WHERE data_aposta BETWEEN DATE '2024-06-01' AND DATE '2024-06-30'
+    """),
+    ("Saldos: histórico de uma casa", """
+        SELECT h.id, h.data, h.casa_nome, h.operacao, h.valor, h.observacao, h.saldo_resultante
+        FROM historico_saldos h WHERE h.casa_nome = 'Betano' ORDER BY h.data DESC LIMIT 100
+    """),
+    ("Saldos: evolução 30 dias", """
+        SELECT DATE(data) AS dia, casa_nome, SUM(valor)
+        FROM historico_saldos WHERE data >= CURRENT_DATE - INTERVAL '30 DAY'
+        GROUP BY dia, casa_nome ORDER BY dia
+    """),
+    ("Saldos: evolução 30 dias de uma casa", """
+        SELECT DATE(data) AS dia, casa_nome, SUM(valor)
+        FROM historico_saldos WHERE data >= CURRENT_DATE - INTERVAL '30 DAY' AND casa_nome = 'Betano'
+        GROUP BY dia, casa_nome ORDER BY dia
+    """),
+]
+
+
+def _array_sql(valores):
+    return "ARRAY[" + ", ".join("'" + v.replace("'", "''") + "'" for v in valores) + "]"
+
+
+def _sorteio(valores):
+    return f"({_array_sql(valores)})[1 + floor(random() * {len(valores)})::int]"
+
+
+def preparar_dados(n):
+    with cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        for ddl in DDL_BASE:
+            cur.execute(ddl)
+        # Datas crescem com o id (com alguns dias de desordem), como no uso real;
+        # ~2% pendentes, já que apostas antigas costumam estar liquidadas
+        cur.execute(f"""
+            INSERT INTO apostas (data, casa_de_apostas, tipo_aposta, categoria, resultado,
+                                 valor_apostado, odd, valor_final, torneio, partida, detalhes, bonus)
+            SELECT
+                to_char(DATE '2023-01-01' + (g * 730 / %s + floor(random() * 3))::int, 'YYYY-MM-DD'),
+                {_sorteio(CASAS)}, 'Simples', 'Resultado',
+                CASE WHEN random() < 0.02 THEN 'Pendente' WHEN random() < 0.5 THEN 'Ganhou' ELSE 'Perdeu' END,
+                round((5 + random() * 95)::numeric, 2),
+                round((1.2 + random() * 2)::numeric, 2)::text,
+                round((random() * 200 - 100)::numeric, 2),
+                'Brasileirão A', 'Time A vs Time B', 'Aposta sintética ' || g, 0
+            FROM generate_series(1, %s) AS g
+        """, (n, n))
+        # Um movimento por minuto terminando agora: os últimos 30 dias têm ~43 mil linhas
+        cur.execute(f"""
+            INSERT INTO historico_saldos (data, casa_nome, operacao, valor, observacao, saldo_resultante)
+            SELECT
+                date_trunc('minute', now()) - (%s - g) * INTERVAL '1 minute',
+                {_sorteio(CASAS)}, {_sorteio(OPERACOES)},
+                round((random() * 200)::numeric, 2), 'Movimento sintético',
+                round((random() * 5000)::numeric, 2)
+            FROM generate_series(1, %s) AS g
+        """, (n, n))
+        # Estrutura tipada depois da carga (sem os triggers por linha), preenchida de uma vez
+        aplicar_schema(cur)
+        cur.execute("UPDATE apostas SET data_aposta = texto_para_data(data)")
+    with cursor() as cur:
+        cur.execute("ANALYZE")
+
+
+def criar_indices():
+    with cursor() as cur:
+        for ddl in DDL_INDICES:
+            cur.execute(ddl)
+    with cursor() as cur:
+        cur.execute("ANALYZE")
+
+
+def medir(sql, repeticoes):
+    tempos = []
+    with cursor() as cur:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            cur.execute(sql)
+            cur.fetchall()
+            tempos.append(time.perf_counter() - inicio)
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql)
+        plano = "\n".join(linha[0] for linha in cur.fetchall())
+    return statistics.median(tempos), plano
+
+
+def rodada(repeticoes):
+    return {nome: medir(sql, repeticoes) for nome, sql in CONSULTAS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN e tempos das consultas antes/depois dos índices.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="Apostas e movimentos sintéticos")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--manter", action="store_true", help="Não apaga o schema do benchmark ao final")
+    args = parser.parse_args()
+
+    try:
+        print(f"Gerando {args.linhas} apostas e {args.linhas} movimentos de saldo...")
+        preparar_dados(args.linhas)
+        antes = rodada(args.repeticoes)
+        print("Criando índices da migração 5...")
+        criar_indices()
+        depois = rodada(args.repeticoes)
+    finally:
+        if not args.manter:
+            with cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    resultados = []
+    for nome, _ in CONSULTAS:
+        (t_antes, plano_antes), (t_depois, plano_depois) = antes[nome], depois[nome]
+        print(f"\n=== {nome} ===")
+        print("-- antes")
+        print(plano_antes)
+        print("-- depois")
+        print(plano_depois)
+        resultados.append({
+            "consulta": nome,
+            "antes (ms)": round(t_antes * 1000, 1),
+            "depois (ms)": round(t_depois * 1000, 1),
+            "ganho": f"{t_antes / t_depois:.1f}x" if t_depois else "-",
+        })
+
+    print()
+    print(pd.DataFrame(resultados).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+PASTA_CACHE = os.getenv(
+    "EMBEDDINGS_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_embeddings")
+)
+ARQUIVO_VETORES = "vetores.f32"
+ARQUIVO_MAPA = "mapa.json"
+# Fração de vetores obsoletos (apostas editadas ou excluídas) tolerada antes de compactar
+FOLGA_COMPACTACAO = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+def hash_texto(texto):
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+# Embeddings de documentos guardados por SHA-256 do texto: uma matriz float32
+# (lida via memmap) onde cada linha é um vetor, e um mapa hash -> linha em JSON.
+# Só textos nunca vistos passam pelo modelo; consultas (perguntas) não são guardadas.
+class EmbeddingsEmCache(Embeddings):
+    def __init__(self, modelo, nome_modelo, pasta=PASTA_CACHE):
+        self.modelo = modelo
+        # Um cache por modelo: vetores de modelos diferentes não se misturam
+        self.pasta = os.path.join(pasta, re.sub(r"[^\w.-]+", "_", nome_modelo))
+        self.mapa = {}
+        self.dimensao = None
+        self.vetores = None
+        self.acertos = 0
+        self.calculados = 0
+        self._lock = threading.Lock()
+        self._carregar()
+
+    def _caminho(self, nome):
+        return os.path.join(self.pasta, nome)
+
+    def _carregar(self):
+        try:
+            with open(self._caminho(ARQUIVO_MAPA), encoding="utf-8") as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.dimensao = estado["dimensao"]
+        self.mapa = estado["mapa"]
+        # Linhas gravadas depois do último mapa salvo (ex.: processo interrompido) são descartadas
+        tamanho = len(self.mapa) * self.dimensao * 4
+        caminho = self._caminho(ARQUIVO_VETORES)
+        if not os.path.exists(caminho) or os.path.getsize(caminho) < tamanho:
+            logger.warning("Cache de embeddings em %s incompleto, será refeito", self.pasta)
+            self.mapa, self.dimensao = {}, None
+            if os.path.exists(caminho):
+                os.remove(caminho)
+            return
+        if os.path.getsize(caminho) > tamanho:
+            with open(caminho, "r+b") as f:
+                f.truncate(tamanho)
+        self._abrir_matriz()
+
+    def _abrir_matriz(self):
+        if self.mapa:
+            self.vetores = np.memmap(self._caminho(ARQUIVO_VETORES), dtype=np.float32, mode="r",
+                                     shape=(len(self.mapa), self.dimensao))
+
+    def _gravar_mapa(self):
+        temporario = self._caminho(ARQUIVO_MAPA + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"dimensao": self.dimensao, "mapa": self.mapa}, f)
+        os.replace(temporario, self._caminho(ARQUIVO_MAPA))
+
+    def _acrescentar(self, hashes, vetores):
+        os.makedirs(self.pasta, exist_ok=True)
+        matriz = np.asarray(vetores, dtype=np.float32)
+        if self.dimensao is None:
+            self.dimensao = matriz.shape[1]
+        # Vetores primeiro, mapa depois (troca atômica): o mapa nunca aponta para linha inexistente
+        with open(self._caminho(ARQUIVO_VETORES), "ab") as f:
+            f.write(matriz.tobytes())
+        for h in hashes:
+            self.mapa[h] = len(self.mapa)
+        self._gravar_mapa()
+        self._abrir_matriz()
+
+    # Mantém só os vetores dos textos atuais (hashes_atuais); só reescreve quando os
+    # obsoletos passam da folga. Retorna quantos vetores saíram.
+    def compactar(self, hashes_atuais, folga=FOLGA_COMPACTACAO):
+        with self._lock:
+            manter = [h for h in self.mapa if h in hashes_atuais]
+            removidos = len(self.mapa) - len(manter)
+            if removidos == 0 or removidos <= folga * len(self.mapa):
+                return 0
+            matriz = np.asarray(self.vetores[[self.mapa[h] for h in manter]]) if manter else None
+            self.vetores = None
+            # Vetores primeiro, mapa depois: se parar no meio, o mapa antigo não cabe no
+            # arquivo novo e _carregar() descarta o cache em vez de ler linhas trocadas
+            temporario = self._caminho(ARQUIVO_VETORES + ".tmp")
+            with open(temporario, "wb") as f:
+                if matriz is not None:
+                    f.write(matriz.astype(np.float32).tobytes())
+            os.replace(temporario, self._caminho(ARQUIVO_VETORES))
+            self.mapa = {h: linha for linha, h in enumerate(manter)}
+            self._gravar_mapa()
+            self._abrir_matriz()
+            return removidos
+
+    def embed_documents(self, texts):
+        hashes = [hash_texto(t) for t in texts]
+        with self._lock:
+            faltantes = {}
+            for h, texto in zip(hashes, texts):
+                if h not in self.mapa and h not in faltantes:
+                    faltantes[h] = texto
+            if faltantes:
+                novos = self.modelo.embed_documents(list(faltantes.values()))
+                self._acrescentar(list(faltantes), novos)
+            self.calculados += len(faltantes)
+            self.acertos += len(texts) - len(faltantes)
+            linhas = [self.mapa[h] for h in hashes]
+            return np.asarray(self.vetores[linhas]).tolist() if linhas else []
+
+    def embed_query(self, text):
+        return self.modelo.embed_query(text)
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+from roteador_perguntas import normalizar
+
+CAMINHO_CACHE = os.getenv(
+    "AGENTE_CACHE_ARQUIVO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_respostas.sqlite3")
+)
+MAX_ENTRADAS = int(os.getenv("AGENTE_CACHE_MAX", "500"))
+TTL_SEGUNDOS = float(os.getenv("AGENTE_CACHE_TTL", str(24 * 3600)))
+
+
+def normalizar_pergunta(pergunta):
+    texto = normalizar(pergunta)
+    texto = re.sub(r"[^\w%]+", " ", texto)
+    return " ".join(texto.split())
+
+
+# Respostas do Agente em SQLite local, com expiração (TTL) e descarte do menos usado (LRU).
+# A versão dos dados entra na chave: inserir, liquidar ou excluir uma aposta muda a versão
+# e as respostas antigas deixam de valer (e são apagadas na próxima consulta).
+class CacheRespostas:
+    def __init__(self, caminho=CAMINHO_CACHE, max_entradas=MAX_ENTRADAS, ttl=TTL_SEGUNDOS):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.versao = None
+        self._lock = threading.Lock()
+        with self._conectar() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave TEXT PRIMARY KEY,
+                    versao TEXT NOT NULL,
+                    resposta TEXT NOT NULL,
+                    latencia REAL NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (acessado_em)")
+
+    # Transação curta em uma conexão própria (fechada ao final)
+    @contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def chave(pergunta, contexto, versao):
+        impressao = hashlib.sha256(contexto.encode("utf-8")).hexdigest()
+        bruto = "\x1f".join([normalizar_pergunta(pergunta), impressao, repr(versao)])
+        return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+    # Apaga o que é de outra versão dos dados (uma vez por troca de versão) e o que expirou
+    def _podar(self, conn, versao):
+        if repr(versao) != self.versao:
+            conn.execute("DELETE FROM respostas WHERE versao <> ?", (repr(versao),))
+            self.versao = repr(versao)
+        conn.execute("DELETE FROM respostas WHERE criado_em < ?", (time.time() - self.ttl,))
+
+    # Retorna (resposta, latência original em s) ou None
+    def obter(self, chave, versao):
+        with self._lock, self._conectar() as conn:
+            self._podar(conn, versao)
+            linha = conn.execute(
+                "SELECT resposta, latencia FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha:
+                conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+            return linha
+
+    def guardar(self, chave, versao, resposta, latencia):
+        agora = time.time()
+        with self._lock, self._conectar() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO respostas (chave, versao, resposta, latencia, criado_em, acessado_em)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (chave, repr(versao), resposta, latencia, agora, agora))
+            conn.execute("""
+                DELETE FROM respostas WHERE chave IN (
+                    SELECT chave FROM respostas ORDER BY acessado_em DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entradas,))
+
+    def limpar(self):
+        with self._lock, self._conectar() as conn:
+            conn.execute("DELETE FROM respostas")
+
+
+@st.cache_resource
+def cache_respostas():
+    return CacheRespostas()
@@ -0,0 +1,102 @@
+import os
+
+from db import consultar
+from dados_apostas import CAMPOS_APOSTAS, FROM_APOSTAS, SELECT_APOSTAS
+
+# Orçamento do prompt em tokens (estimados); o histórico tem uma fatia própria
+ORCAMENTO_TOKENS = int(os.getenv("AGENTE_ORCAMENTO_TOKENS", "4000"))
+ORCAMENTO_HISTORICO = int(os.getenv("AGENTE_ORCAMENTO_HISTORICO", "800"))
+TURNOS_RECENTES = int(os.getenv("AGENTE_TURNOS_RECENTES", "4"))
+CARACTERES_RESUMO = 160
+
+
+# Aproximação de ~4 caracteres por token (suficiente para orçamento, sem tokenizer)
+def estimar_tokens(texto):
+    return len(texto) // 4 + 1
+
+
+def _celula(valor):
+    if valor is None:
+        return ""
+    return " ".join(str(valor).split())
+
+
+# Apostas recuperadas em formato tabular (TSV, cabeçalho uma vez só), na ordem
+# de relevância; as de pior score ficam de fora quando o orçamento acaba.
+# docs_com_score: [(Document, distância)] como devolvido por similarity_search_with_score
+def construir_contexto(docs_com_score, orcamento):
+    ordenados = sorted(docs_com_score, key=lambda par: par[1])
+    ids = [doc.metadata["id"] for doc, _ in ordenados]
+    if not ids:
+        return "", 0, 0
+
+    # Valores atuais direto do banco, em vez de reparsear o page_content
+    linhas = {linha[0]: linha for linha in consultar(
+        f"SELECT {SELECT_APOSTAS} FROM {FROM_APOSTAS} WHERE apostas.id = ANY(%s)", (ids,)
+    )}
+    return tabela_no_orcamento(ids, linhas, orcamento)
+
+
+# TSV das linhas (dict id -> valores na ordem de CAMPOS_APOSTAS) na ordem de ids,
+# parando na primeira que não cabe no orçamento: (texto, incluídas, descartadas)
+def tabela_no_orcamento(ids, linhas, orcamento):
+    cabecalho = "\t".join(CAMPOS_APOSTAS)
+    partes = [cabecalho]
+    usados = estimar_tokens(cabecalho)
+    for aposta_id in ids:
+        if aposta_id not in linhas:
+            continue
+        texto = "\t".join(_celula(valor) for valor in linhas[aposta_id])
+        custo = estimar_tokens(texto)
+        if usados + custo > orcamento:
+            break
+        partes.append(texto)
+        usados += custo
+
+    incluidas = len(partes) - 1
+    return "\n".join(partes), incluidas, len(ids) - incluidas
+
+
+def _resumo_turno(msg):
+    texto = " ".join(msg["content"].split())
+    if len(texto) > CARACTERES_RESUMO:
+        texto = texto[:CARACTERES_RESUMO].rsplit(" ", 1)[0] + "..."
+    return f"- {msg['role'].capitalize()}: {texto}"
+
+
+# Últimos turnos na íntegra; os anteriores viram uma linha resumida cada.
+# Se ainda passar do orçamento, os resumos mais antigos saem primeiro.
+def resumir_historico(mensagens, orcamento=ORCAMENTO_HISTORICO, turnos_recentes=TURNOS_RECENTES):
+    recentes = mensagens[-turnos_recentes:] if turnos_recentes else []
+    antigas = mensagens[:len(mensagens) - len(recentes)]
+
+    blocos_recentes = [f"{m['role'].capitalize()}: {m['content']}" for m in recentes]
+    # Turnos recentes muito longos também são cortados, do mais antigo para o mais novo
+    while blocos_recentes and estimar_tokens("\n".join(blocos_recentes)) > orcamento:
+        if len(blocos_recentes) == 1:
+            # estimar_tokens() soma 1: o texto cortado mais "..." fica em (orcamento - 1) * 4
+            limite = max((orcamento - 1) * 4 - 3, 0)
+            blocos_recentes[0] = blocos_recentes[0][:limite] + "..."
+            break
+        antigas.append(recentes[len(recentes) - len(blocos_recentes)])
+        blocos_recentes.pop(0)
+
+    resumos = [_resumo_turno(m) for m in antigas]
+    restante = orcamento - estimar_tokens("\n".join(blocos_recentes))
+    while resumos and estimar_tokens("\n".join(resumos)) > restante - 10:
+        resumos.pop(0)
+
+    partes = []
+    if resumos:
+        partes.append("Resumo de turnos anteriores:\n" + "\n".join(resumos))
+    partes.extend(blocos_recentes)
+    return "\n".join(partes)
+
+
+# Histórico que acompanha uma pergunta nova: todas as mensagens anteriores a ela,
+# inclusive a última resposta. A pergunta vai separada no prompt; se já estiver no
+# fim da lista, fica de fora.
+def historico_da_pergunta(mensagens, pergunta):
+    if mensagens and mensagens[-1]["role"] == "user" and mensagens[-1]["content"] == pergunta:
+        mensagens = mensagens[:-1]
+    return resumir_historico(mensagens)
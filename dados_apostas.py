@@ -0,0 +1,292 @@
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from db import consultar, consultar_um
+from migracao_apostas import NOME_MIGRACAO
+from notificacoes import versao_notificada
+
+# Campos de uma aposta como as páginas leem (ordem do SELECT_APOSTAS). Não é a
+# lista de colunas da tabela: a casa é gravada como casa_id e lida pelo nome, via join
+CAMPOS_APOSTAS = ['id', 'data', 'tipo_aposta', 'valor_apostado', 'odd', 'valor_final',
+                  'torneio', 'resultado', 'casa_de_apostas', 'categoria', 'partida', 'bonus', 'detalhes']
+
+# Folga na comparação de atualizado_em, para não perder transações que
+# começaram antes da última sincronização mas só fizeram commit depois dela
+MARGEM_SYNC = timedelta(seconds=60)
+
+
+# A casa é gravada como casa_id (tabela casas); o nome vem do join na leitura
+FROM_APOSTAS = "apostas LEFT JOIN casas ON casas.id = apostas.casa_id"
+SELECT_APOSTAS = ", ".join(
+    "casas.nome AS casa_de_apostas" if c == 'casa_de_apostas' else f"apostas.{c}" for c in CAMPOS_APOSTAS
+)
+# Renomear uma casa conta como alteração das apostas dela (para os caches incrementais)
+ALTERACAO_APOSTA = "GREATEST(apostas.atualizado_em, casas.atualizado_em)"
+
+
+# Converte as colunas cruas do banco para os tipos usados no Dashboard
+def processar_apostas(df):
+    df['data'] = pd.to_datetime(df['data'], errors='coerce')
+    df['valor_final'] = pd.to_numeric(df['valor_final'], errors='coerce')
+    df['resultado'] = df['resultado'].str.strip().str.title()
+    df['retorno'] = df['valor_final'] / df['valor_apostado'].replace(0, 1)  # Evitar divisão por zero
+    df['odd'] = pd.to_numeric(df['odd'].str.replace(',', ''), errors='coerce')
+    df['categoria'] = df['categoria'].str.split(', ')
+    df['torneio'] = df['torneio'].str.split(', ')
+    return df
+
+
+def _consultar_versao_dados():
+    max_id, total, ultima_alteracao = consultar_um("""
+        SELECT COALESCE(MAX(id), 0), COUNT(*),
+               GREATEST(MAX(atualizado_em), (SELECT MAX(atualizado_em) FROM casas))
+        FROM apostas
+    """)
+    return max_id, total, ultima_alteracao
+
+
+# Com o ouvinte de notificações, a consulta só roda de novo depois de uma alteração
+@st.cache_data(max_entries=4, show_spinner=False)
+def _versao_dados_notificada(versao):
+    return _consultar_versao_dados()
+
+
+# Versão dos dados: muda a cada inserção, atualização ou exclusão em apostas
+def versao_dados():
+    versao = versao_notificada()
+    if versao is None:
+        return _consultar_versao_dados()
+    return _versao_dados_notificada(versao)
+
+
+def _buscar_apostas(where="", params=None):
+    linhas = consultar(f"SELECT {SELECT_APOSTAS} FROM {FROM_APOSTAS} {where}", params)
+    return processar_apostas(pd.DataFrame(linhas, columns=CAMPOS_APOSTAS))
+
+
+# Matriz booleana aposta x valor para as colunas de listas (torneio, categoria):
+# o filtro "contém algum dos selecionados" vira um .any() vetorizado
+class IndicePertinencia:
+    def __init__(self, listas):
+        explodido = listas.reset_index(drop=True).explode()
+        codigos, valores = pd.factorize(explodido)
+        linhas = explodido.index.to_numpy()
+        validos = codigos >= 0
+
+        self.valores = list(valores)
+        self.posicao = {valor: i for i, valor in enumerate(self.valores)}
+        # Ordem por coluna: cada valor selecionado é uma fatia contígua
+        self.matriz = np.zeros((len(listas), len(self.valores)), dtype=bool, order='F')
+        self.matriz[linhas[validos], codigos[validos]] = True
+
+    def contem_algum(self, selecionados):
+        colunas = [self.posicao[valor] for valor in selecionados if valor in self.posicao]
+        if not colunas:
+            return np.zeros(len(self.matriz), dtype=bool)
+        return self.matriz[:, colunas].any(axis=1)
+
+
+def construir_indices(df):
+    return {coluna: IndicePertinencia(df[coluna]) for coluna in ('torneio', 'categoria')}
+
+
+# Frame de apostas compartilhado entre as sessões e atualizado incrementalmente
+class CacheApostas:
+    def __init__(self):
+        # (frame, índices) publicados juntos para nunca ficarem de versões diferentes
+        self.snapshot = None
+        self.versao = None
+        self.watermark_id = 0
+        self.ultima_sync = None
+        self._lock = threading.Lock()
+
+    def obter(self):
+        versao = versao_dados()
+        if versao == self.versao:
+            return self.snapshot
+
+        with self._lock:
+            # Outra sessão pode ter sincronizado enquanto esperávamos o lock
+            if versao == self.versao:
+                return self.snapshot
+
+            max_id, total, ultima_alteracao = versao
+            if self.snapshot is None:
+                df = _buscar_apostas("ORDER BY apostas.id")
+            else:
+                condicoes = ["apostas.id > %s"]
+                params = [self.watermark_id]
+                if self.ultima_sync is not None:
+                    condicoes.append(f"{ALTERACAO_APOSTA} >= %s")
+                    params.append(self.ultima_sync - MARGEM_SYNC)
+                novas = _buscar_apostas("WHERE " + " OR ".join(condicoes), params)
+
+                df = self.snapshot[0]
+                if not novas.empty:
+                    df = pd.concat([df[~df['id'].isin(novas['id'])], novas], ignore_index=True)
+
+                # Exclusões (ex.: reembolso) não deixam rastro; basta podar pelos ids existentes
+                if len(df) != total:
+                    ids = [linha[0] for linha in consultar("SELECT id FROM apostas")]
+                    df = df[df['id'].isin(ids)]
+
+                df = df.sort_values('id', ignore_index=True)
+
+            # Publica um novo objeto em vez de alterar o antigo, que pode estar em uso
+            self.snapshot = (df, construir_indices(df))
+            self.versao = versao
+            self.watermark_id = max_id
+            self.ultima_sync = ultima_alteracao
+            return self.snapshot
+
+
+@st.cache_resource
+def _cache_apostas():
+    return CacheApostas()
+
+
+# Função para carregar os dados de apostas (somente o que mudou desde a última carga)
+def load_apostas():
+    return load_apostas_indexadas()[0]
+
+
+# Frame completo junto com os índices de torneio/categoria da mesma versão
+def load_apostas_indexadas():
+    return _cache_apostas().obter()
+
+
+# Junções usadas pelos filtros multivalorados: coluna -> (tabela de junção, tabela de nomes, chave)
+JUNCOES_FILTRO = {
+    'torneio': ('aposta_torneios', 'torneios', 'torneio_id'),
+    'categoria': ('aposta_categorias', 'categorias', 'categoria_id'),
+}
+
+
+# Filtros no SQL dependem do schema tipado (migracao_apostas.py) já convertido;
+# DASHBOARD_FILTRO_SQL=0 força o caminho antigo de filtrar tudo em pandas
+@st.cache_data(ttl=60, show_spinner=False)
+def filtro_sql_disponivel():
+    if os.getenv("DASHBOARD_FILTRO_SQL", "1") == "0":
+        return False
+    if not consultar_um("SELECT to_regclass('migracao_progresso') IS NOT NULL")[0]:
+        return False
+    linha = consultar_um("SELECT concluida FROM migracao_progresso WHERE nome = %s", (NOME_MIGRACAO,))
+    return bool(linha and linha[0])
+
+
+def _periodo(filtros):
+    periodo = filtros['periodo']
+    return periodo[0], periodo[-1]
+
+
+# Transforma a seleção da sidebar em um WHERE parametrizado sobre as colunas tipadas
+def montar_filtro_sql(filtros):
+    inicio, fim = _periodo(filtros)
+    condicoes = ["apostas.data_aposta BETWEEN %s AND %s"]
+    params = [inicio, fim]
+
+    for coluna in ('tipo_aposta', 'resultado'):
+        condicoes.append(f"apostas.{coluna} = ANY(%s)")
+        params.append(list(filtros[coluna]))
+    # Casas: os nomes viram ids uma vez e o filtro compara inteiros
+    condicoes.append("apostas.casa_id = ANY(ARRAY(SELECT id FROM casas WHERE nome = ANY(%s)))")
+    params.append(list(filtros['casa_de_apostas']))
+
+    # Torneio/categoria: basta um dos valores bater; seleção vazia não filtra
+    for coluna, (juncao, tabela, chave) in JUNCOES_FILTRO.items():
+        selecionados = list(filtros[coluna])
+        if not selecionados:
+            continue
+        condicao = f"""EXISTS (
+            SELECT 1 FROM {juncao} j JOIN {tabela} t ON t.id = j.{chave}
+            WHERE j.aposta_id = apostas.id AND t.nome = ANY(%s)
+        )"""
+        params.append([nome for nome in selecionados if nome])
+        # '' representa apostas sem nenhum valor, como no split do caminho em pandas
+        if '' in selecionados:
+            condicao = f"({condicao} OR NOT EXISTS (SELECT 1 FROM {juncao} j WHERE j.aposta_id = apostas.id))"
+        condicoes.append(condicao)
+
+    return " AND ".join(condicoes), params
+
+
+# Apenas as apostas que passam nos filtros saem do banco (cache por versão + filtros)
+@st.cache_data(max_entries=32, show_spinner=False)
+def _apostas_filtradas(versao, where, params):
+    return _buscar_apostas(f"WHERE {where} ORDER BY apostas.id", params)
+
+
+def load_apostas_filtradas(filtros):
+    where, params = montar_filtro_sql(filtros)
+    return _apostas_filtradas(versao_dados(), where, params)
+
+
+# Caminho completo: filtra em pandas o frame com todas as apostas
+def filtrar_apostas(df, filtros, indices=None):
+    if indices is None:
+        indices = construir_indices(df)
+    inicio, fim = _periodo(filtros)
+    mascara = (
+        df['data'].between(pd.to_datetime(inicio), pd.to_datetime(fim)) &
+        df['tipo_aposta'].isin(filtros['tipo_aposta']) &
+        df['casa_de_apostas'].isin(filtros['casa_de_apostas']) &
+        df['resultado'].isin(filtros['resultado'])
+    ).to_numpy()
+    # Torneio/categoria: basta um dos valores bater; seleção vazia não filtra
+    for coluna in ('torneio', 'categoria'):
+        if filtros[coluna]:
+            mascara &= indices[coluna].contem_algum(filtros[coluna])
+    return df[mascara]
+
+
+# Opções da sidebar sem carregar a tabela inteira (recalculadas só quando os dados mudam)
+@st.cache_data(max_entries=4, show_spinner=False)
+def _opcoes_filtros(versao):
+    data_min, data_max, total = consultar_um("SELECT MIN(data_aposta), MAX(data_aposta), COUNT(*) FROM apostas")
+    opcoes = {
+        'tipo_aposta': [l[0] for l in consultar("SELECT DISTINCT tipo_aposta FROM apostas ORDER BY 1")],
+        'casa_de_apostas': [l[0] for l in consultar("""
+            SELECT c.nome FROM casas c
+            WHERE EXISTS (SELECT 1 FROM apostas a WHERE a.casa_id = c.id)
+            ORDER BY 1
+        """)],
+        'data_min': data_min or date.today(),
+        'data_max': data_max or date.today(),
+        'total': total,
+    }
+    for coluna, (juncao, tabela, chave) in JUNCOES_FILTRO.items():
+        nomes = [l[0] for l in consultar(f"""
+            SELECT t.nome FROM {tabela} t
+            WHERE EXISTS (SELECT 1 FROM {juncao} j WHERE j.{chave} = t.id)
+            ORDER BY t.nome
+        """)]
+        sem_valor = consultar_um(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM apostas a
+                WHERE NOT EXISTS (SELECT 1 FROM {juncao} j WHERE j.aposta_id = a.id)
+            )
+        """)[0]
+        opcoes[coluna] = nomes + ([''] if sem_valor else [])
+    return opcoes
+
+
+def opcoes_filtros():
+    return _opcoes_filtros(versao_dados())
+
+
+# Mesmas opções, tiradas do frame completo (caminho de fallback)
+def opcoes_do_frame(df, indices):
+    return {
+        'tipo_aposta': df['tipo_aposta'].unique(),
+        'casa_de_apostas': df['casa_de_apostas'].unique(),
+        'torneio': indices['torneio'].valores,
+        'categoria': indices['categoria'].valores,
+        'data_min': df['data'].min().date(),
+        'data_max': df['data'].max().date(),
+        'total': len(df),
+    }
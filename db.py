@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+import streamlit as st
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente do arquivo .env
+load_dotenv()
+
+# Limites do pool (ajustáveis pelo .env)
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Conexões ociosas há mais tempo que isso são testadas com SELECT 1 antes do uso
+PING_INTERVALO = float(os.getenv("DB_PING_INTERVALO", "30"))
+
+ERROS_CONEXAO = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+# Pool limitado e thread-safe compartilhado por todas as sessões do servidor
+class PoolConexoes:
+    def __init__(self, dsn, minconn=POOL_MIN, maxconn=POOL_MAX, timeout=POOL_TIMEOUT):
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, dsn)
+        # O ThreadedConnectionPool falha na hora quando esgota; o semáforo faz esperar
+        self._vagas = threading.BoundedSemaphore(maxconn)
+        self._ultimo_uso = {}
+        self._lock = threading.Lock()
+        self.timeout = timeout
+
+    def _saudavel(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            ultimo_uso = self._ultimo_uso.get(id(conn))
+        if ultimo_uso is not None and time.monotonic() - ultimo_uso < PING_INTERVALO:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn):
+        with self._lock:
+            self._ultimo_uso.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    # Retira uma conexão saudável do pool, reconectando se a atual caiu
+    def obter(self):
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError("Tempo esgotado aguardando uma conexão livre no pool")
+        try:
+            for _ in range(3):
+                conn = self._pool.getconn()
+                if self._saudavel(conn):
+                    return conn
+                self._descartar(conn)
+            raise psycopg2.OperationalError("Não foi possível obter uma conexão saudável com o banco")
+        except BaseException:
+            self._vagas.release()
+            raise
+
+    # Devolve a conexão ao pool (ou fecha, se estiver quebrada)
+    def devolver(self, conn, quebrada=False):
+        try:
+            if quebrada or conn.closed:
+                self._descartar(conn)
+            else:
+                with self._lock:
+                    self._ultimo_uso[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._vagas.release()
+
+    def fechar(self):
+        self._pool.closeall()
+
+
+# Cria o pool uma única vez por processo do servidor
+@st.cache_resource
+def _criar_pool():
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("Variável de ambiente DATABASE_URL não definida")
+    return PoolConexoes(database_url)
+
+
+# Função para inicializar o acesso ao banco nas páginas
+def init_db():
+    try:
+        return _criar_pool()
+    except Exception as e:
+        st.error(f"Erro de conexão: {e}")
+        return None
+
+
+# Empresta uma conexão do pool: commit ao sair, rollback em caso de erro
+@contextmanager
+def conexao():
+    pool = _criar_pool()
+    conn = pool.obter()
+    quebrada = False
+    try:
+        yield conn
+        conn.commit()
+    except BaseException as e:
+        # BaseException também cobre st.rerun()/st.stop() disparados dentro do bloco
+        if isinstance(e, ERROS_CONEXAO):
+            quebrada = True
+        else:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                quebrada = True
+        raise
+    finally:
+        pool.devolver(conn, quebrada=quebrada)
+
+
+# Atalho para quando só é preciso um cursor
+@contextmanager
+def cursor():
+    with conexao() as conn:
+        with conn.cursor() as cur:
+            yield cur
+
+
+# Executa uma consulta e retorna todas as linhas
+def consultar(query, params=None):
+    with cursor() as cur:
+        cur.execute(query, params)
+        return cur.fetchall()
+
+
+# Executa uma consulta e retorna apenas a primeira linha
+def consultar_um(query, params=None):
+    with cursor() as cur:
+        cur.execute(query, params)
+        return cur.fetchone()
+
+
+# Executa um comando de escrita em sua própria transação
+def executar(query, params=None):
+    with cursor() as cur:
+        cur.execute(query, params)
+        return cur.rowcount
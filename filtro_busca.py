@@ -0,0 +1,87 @@
+import os
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from db import consultar
+from dados_apostas import versao_dados
+from roteador_perguntas import extrair_restricoes, normalizar
+
+# k da busca sem restrições e com restrições (o subconjunto já é relevante)
+K_BUSCA = int(os.getenv("AGENTE_K", "150"))
+K_FILTRADO = int(os.getenv("AGENTE_K_FILTRADO", "40"))
+
+
+# Índice invertido casa/torneio -> ids, e ids ordenados por data para recortes de período
+class IndiceInvertido:
+    def __init__(self, linhas):
+        self.por_casa = defaultdict(set)
+        self.por_torneio = defaultdict(set)
+        ids, datas = [], []
+        for aposta_id, casa, torneio, data in linhas:
+            if casa:
+                self.por_casa[casa].add(aposta_id)
+            for nome in (torneio or "").split(","):
+                if nome.strip():
+                    self.por_torneio[nome.strip()].add(aposta_id)
+            ids.append(aposta_id)
+            datas.append(data)
+
+        datas = pd.to_datetime(pd.Series(datas, dtype=object), errors="coerce").to_numpy(dtype="datetime64[D]")
+        ordem = np.argsort(datas, kind="stable")
+        self.datas = datas[ordem]
+        self.ids_por_data = np.asarray(ids, dtype=np.int64)[ordem]
+        # Nomes mais longos primeiro, como no roteador
+        self.casas = sorted(self.por_casa, key=len, reverse=True)
+        self.torneios = sorted(self.por_torneio, key=len, reverse=True)
+
+    def _ids_periodo(self, inicio, fim):
+        # NaT fica no fim do array ordenado, fora de qualquer intervalo
+        esquerda = np.searchsorted(self.datas, np.datetime64(inicio, "D"), side="left")
+        direita = np.searchsorted(self.datas, np.datetime64(fim, "D"), side="right")
+        return set(self.ids_por_data[esquerda:direita].tolist())
+
+    # Interseção entre os tipos de restrição; dentro de um tipo, basta um valor bater
+    def ids(self, restricoes):
+        conjuntos = []
+        if restricoes['casas']:
+            conjuntos.append(set().union(*(self.por_casa[c] for c in restricoes['casas'])))
+        if restricoes['torneios']:
+            conjuntos.append(set().union(*(self.por_torneio[t] for t in restricoes['torneios'])))
+        if restricoes['periodo']:
+            inicio, fim, _ = restricoes['periodo']
+            conjuntos.append(self._ids_periodo(inicio, fim))
+        if not conjuntos:
+            return None
+        return set.intersection(*conjuntos)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _indice_invertido(versao):
+    return IndiceInvertido(consultar("""
+        SELECT a.id, c.nome, a.torneio, a.data FROM apostas a LEFT JOIN casas c ON c.id = a.casa_id
+    """))
+
+
+# Restrições citadas na pergunta e os ids que as satisfazem; (None, None) sem restrições
+def restricoes_da_pergunta(pergunta):
+    indice = _indice_invertido(versao_dados())
+    restricoes = extrair_restricoes(normalizar(pergunta), indice.casas, indice.torneios, date.today())
+    ids = indice.ids(restricoes)
+    if ids is None:
+        return None, None
+    return restricoes, ids
+
+
+def descrever_restricoes(restricoes):
+    partes = []
+    if restricoes['casas']:
+        partes.append(", ".join(restricoes['casas']))
+    if restricoes['torneios']:
+        partes.append(", ".join(restricoes['torneios']))
+    if restricoes['periodo']:
+        partes.append(restricoes['periodo'][2])
+    return " / ".join(partes)
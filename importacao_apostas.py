@@ -0,0 +1,239 @@
+import argparse
+import io
+import re
+import time
+import unicodedata
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from db import cursor
+from livro_saldos import origem_movimento
+
+# Colunas gravadas em apostas, na ordem do COPY
+COLUNAS_IMPORTACAO = ['data', 'casa_de_apostas', 'tipo_aposta', 'categoria', 'resultado', 'bonus',
+                      'valor_apostado', 'odd', 'valor_final', 'torneio', 'partida', 'detalhes']
+COLUNAS_TEXTO = ['data', 'casa_de_apostas', 'tipo_aposta', 'categoria', 'resultado',
+                 'odd', 'torneio', 'partida', 'detalhes']
+OBRIGATORIAS = ['data', 'casa_de_apostas', 'valor_apostado', 'odd']
+
+# Nomes alternativos comuns em planilhas
+APELIDOS = {
+    'casa': 'casa_de_apostas', 'casa_de_aposta': 'casa_de_apostas', 'casas_de_apostas': 'casa_de_apostas',
+    'valor': 'valor_apostado', 'stake': 'valor_apostado', 'odds': 'odd',
+    'tipo': 'tipo_aposta', 'categorias': 'categoria', 'torneios': 'torneio',
+    'lucro': 'valor_final', 'detalhes_aposta': 'detalhes', 'data_aposta': 'data',
+}
+RESULTADOS = ['Pendente', 'Ganhou', 'Perdeu']
+TIPOS_POR_PERNAS = {1: 'Simples', 2: 'Dupla', 3: 'Tripla'}
+
+
+def _nome_coluna(nome):
+    nome = unicodedata.normalize('NFKD', str(nome).strip().lower())
+    nome = ''.join(c for c in nome if not unicodedata.combining(c))
+    nome = re.sub(r'\W+', '_', nome).strip('_')
+    return APELIDOS.get(nome, nome)
+
+
+def _numero(serie):
+    texto = serie.astype(str).str.replace(r'[R$\s]', '', regex=True)
+    # "12,50" vira 12.50; "1.234,56" vira 1234.56
+    com_virgula = texto.str.contains(',', regex=False)
+    texto = texto.where(~com_virgula, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(texto, errors='coerce')
+
+
+def _lista(serie):
+    # Categorias/torneios separados por vírgula ou ponto e vírgula, gravados como no formulário
+    partes = serie.fillna('').astype(str).str.split(r'\s*[,;]\s*', regex=True)
+    return partes.map(lambda itens: ", ".join(i.strip() for i in itens if i.strip()))
+
+
+def ler_arquivo(arquivo, nome):
+    if str(nome).lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(arquivo, dtype=str)
+    # sep=None detecta ',' ou ';' (planilhas exportadas em português usam ';')
+    return pd.read_csv(arquivo, sep=None, engine='python', dtype=str)
+
+
+# Valida e normaliza a planilha inteira de uma vez (sem laço por linha).
+# Retorna (apostas válidas prontas para o COPY, linhas rejeitadas com o motivo).
+def validar_apostas(df):
+    df = df.rename(columns=_nome_coluna)
+    faltando = [c for c in OBRIGATORIAS if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+    df = df.reset_index(drop=True)
+    motivos = pd.Series('', index=df.index)
+
+    def rejeitar(mascara, motivo):
+        motivos[mascara & (motivos == '')] = motivo
+
+    datas = pd.to_datetime(df['data'], errors='coerce', format='mixed', dayfirst=True)
+    rejeitar(datas.isna(), 'data inválida')
+
+    casas = df['casa_de_apostas'].fillna('').astype(str).str.strip()
+    rejeitar(casas == '', 'casa de apostas vazia')
+
+    valores = _numero(df['valor_apostado'])
+    rejeitar(valores.isna() | (valores <= 0), 'valor apostado inválido')
+
+    # Odds: pernas antes do '|' separadas por vírgula, o que vem depois é o % de bônus
+    odds_texto = df['odd'].fillna('').astype(str).str.strip()
+    partes_odd = odds_texto.str.split('|', n=1)
+    pernas = partes_odd.str[0].str.split(',').explode().str.strip()
+    pernas_num = pd.to_numeric(pernas, errors='coerce')
+    perna_invalida = (pernas_num.isna() | (pernas_num <= 1)).groupby(level=0).any()
+    rejeitar(perna_invalida.reindex(df.index, fill_value=True), 'odd inválida')
+    qtd_pernas = pernas_num.groupby(level=0).count().reindex(df.index, fill_value=0)
+    produto_odds = pernas_num.groupby(level=0).prod().reindex(df.index)
+    sufixo_bonus = partes_odd.str[1].fillna('').str.strip()
+    bonus_combinadas = pd.to_numeric(sufixo_bonus.where(sufixo_bonus != '', '0'), errors='coerce')
+    rejeitar(bonus_combinadas.isna() | (bonus_combinadas < 0), 'bônus de combinadas inválido')
+    odds = pernas.groupby(level=0).agg(', '.join).reindex(df.index, fill_value='')
+    odds = odds.where(sufixo_bonus == '', odds + '|' + sufixo_bonus)
+
+    resultados = (df['resultado'] if 'resultado' in df.columns else pd.Series(index=df.index, dtype=object))
+    resultados = resultados.fillna('Pendente').astype(str).str.strip().str.title().replace('', 'Pendente')
+    rejeitar(~resultados.isin(RESULTADOS), 'resultado deve ser Pendente, Ganhou ou Perdeu')
+
+    bonus = _numero(df['bonus']).fillna(0) if 'bonus' in df.columns else pd.Series(0, index=df.index)
+    rejeitar(~bonus.isin([0, 1, 2]), 'bonus deve ser 0, 1 (aposta bônus) ou 2 (bônus combinadas)')
+
+    if 'tipo_aposta' in df.columns:
+        tipos = df['tipo_aposta'].fillna('').astype(str).str.strip()
+    else:
+        tipos = pd.Series('', index=df.index)
+    tipos = tipos.where(tipos != '', qtd_pernas.map(TIPOS_POR_PERNAS).fillna('Múltipla'))
+
+    # valor_final (lucro líquido) calculado como no formulário quando não vier na planilha:
+    # o % de bônus de combinadas multiplica o produto das odds
+    calculado = pd.Series(0.0, index=df.index)
+    odd_efetiva = produto_odds * (1 + bonus_combinadas.fillna(0) / 100)
+    calculado = calculado.mask(resultados == 'Ganhou', valores * (odd_efetiva - 1))
+    calculado = calculado.mask((resultados == 'Perdeu') & (bonus != 1), -valores)
+    if 'valor_final' in df.columns:
+        informado = _numero(df['valor_final'])
+        finais = informado.where(informado.notna(), calculado)
+    else:
+        finais = calculado
+
+    apostas = pd.DataFrame({
+        'data': datas.dt.strftime('%Y-%m-%d'),
+        'casa_de_apostas': casas,
+        'tipo_aposta': tipos,
+        'categoria': _lista(df['categoria']) if 'categoria' in df.columns else '',
+        'resultado': resultados,
+        'bonus': bonus.where(bonus.isin([0, 1, 2]), 0).astype(int),
+        'valor_apostado': valores.round(2),
+        'odd': odds,
+        'valor_final': finais.round(2),
+        'torneio': _lista(df['torneio']) if 'torneio' in df.columns else '',
+        'partida': df['partida'].fillna('').astype(str).str.strip() if 'partida' in df.columns else '',
+        'detalhes': df['detalhes'].fillna('').astype(str).str.strip() if 'detalhes' in df.columns else '',
+    }, index=df.index)
+
+    validas = motivos == ''
+    # Número da linha como aparece na planilha (cabeçalho é a linha 1)
+    rejeitadas = pd.DataFrame({'linha': df.index[~validas] + 2, 'motivo': motivos[~validas]})
+    return apostas[validas][COLUNAS_IMPORTACAO].reset_index(drop=True), rejeitadas.reset_index(drop=True)
+
+
+# Efeito de cada aposta no saldo da casa, igual ao fluxo manual: o registro debita o
+# valor apostado (exceto aposta bônus) e a liquidação como "Ganhou" credita o retorno
+def ajustes_por_casa(apostas):
+    aposta_bonus = apostas['bonus'] == 1
+    ganhou = apostas['resultado'] == 'Ganhou'
+    ajuste = (-apostas['valor_apostado']).where(~aposta_bonus, 0.0)
+    credito = (apostas['valor_apostado'] + apostas['valor_final']).where(~aposta_bonus, apostas['valor_final'])
+    ajuste = ajuste + credito.where(ganhou, 0.0)
+    return ajuste.groupby(apostas['casa_de_apostas']).sum().round(2)
+
+
+# Grava tudo em uma transação: COPY das apostas e um UPDATE agregado por casa
+def importar_apostas(apostas, ajustar_saldo=True):
+    inicio = time.perf_counter()
+    buffer = io.StringIO()
+    apostas.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    casas_sem_saldo = []
+    with cursor() as cur:
+        # COPY para uma tabela temporária com o nome da casa; o INSERT troca o nome pelo casa_id
+        cur.execute("""
+            CREATE TEMP TABLE apostas_importadas (
+                data TEXT, casa_de_apostas TEXT, tipo_aposta TEXT, categoria TEXT, resultado TEXT,
+                bonus REAL, valor_apostado REAL, odd TEXT, valor_final REAL, torneio TEXT,
+                partida TEXT, detalhes TEXT
+            ) ON COMMIT DROP
+        """)
+        # FORCE_NOT_NULL: texto vazio entra como '' (como no formulário), não como NULL
+        cur.copy_expert(f"""
+            COPY apostas_importadas ({', '.join(COLUNAS_IMPORTACAO)})
+            FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL ({', '.join(COLUNAS_TEXTO)}))
+        """, buffer)
+        # Casas que ainda não existem são criadas de uma vez
+        cur.execute("""
+            INSERT INTO casas (nome)
+            SELECT DISTINCT casa_de_apostas FROM apostas_importadas
+            ON CONFLICT (nome) DO NOTHING
+        """)
+        colunas = [c for c in COLUNAS_IMPORTACAO if c != 'casa_de_apostas']
+        cur.execute(f"""
+            INSERT INTO apostas (casa_id, {', '.join(colunas)})
+            SELECT c.id, {', '.join('i.' + col for col in colunas)}
+            FROM apostas_importadas i
+            JOIN casas c ON c.nome = i.casa_de_apostas
+        """)
+
+        if ajustar_saldo and not apostas.empty:
+            ajustes = ajustes_por_casa(apostas)
+            origem_movimento(cur, "Importação", "Apostas importadas de planilha")
+            atualizadas = execute_values(cur, """
+                UPDATE saldo_casas s
+                SET saldo = s.saldo + v.ajuste, ultima_atualizacao = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v(casa, ajuste), casas c
+                WHERE c.nome = v.casa AND s.casa_id = c.id
+                RETURNING c.nome
+            """, [(casa, float(valor)) for casa, valor in ajustes.items()], fetch=True)
+            encontradas = {linha[0] for linha in atualizadas}
+            casas_sem_saldo = [casa for casa in ajustes.index if casa not in encontradas]
+
+    decorrido = time.perf_counter() - inicio
+    return {
+        'linhas': len(apostas),
+        'segundos': decorrido,
+        'linhas_por_segundo': len(apostas) / decorrido if decorrido else 0.0,
+        'casas_sem_saldo': casas_sem_saldo,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa apostas em lote de um CSV/XLSX.")
+    parser.add_argument("arquivo", help="Planilha .csv, .xlsx ou .xls")
+    parser.add_argument("--sem-saldo", action="store_true", help="Não ajusta o saldo das casas")
+    parser.add_argument("--simular", action="store_true", help="Só valida, sem gravar nada")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    df = ler_arquivo(args.arquivo, args.arquivo)
+    apostas, rejeitadas = validar_apostas(df)
+    validacao = time.perf_counter() - inicio
+    print(f"{len(df)} linhas lidas e validadas em {validacao:.2f}s: "
+          f"{len(apostas)} válidas, {len(rejeitadas)} rejeitadas")
+    for _, linha in rejeitadas.head(20).iterrows():
+        print(f"  linha {linha['linha']}: {linha['motivo']}")
+    if len(rejeitadas) > 20:
+        print(f"  ... e mais {len(rejeitadas) - 20}")
+    if args.simular or apostas.empty:
+        return
+
+    relatorio = importar_apostas(apostas, ajustar_saldo=not args.sem_saldo)
+    print(f"{relatorio['linhas']} apostas importadas em {relatorio['segundos']:.2f}s "
+          f"({relatorio['linhas_por_segundo']:.0f} linhas/s)")
+    if relatorio['casas_sem_saldo']:
+        print(f"Casas sem saldo cadastrado (saldo não ajustado): {', '.join(relatorio['casas_sem_saldo'])}")
+
+
+if __name__ == "__main__":
+    main()
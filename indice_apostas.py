@@ -0,0 +1,217 @@
+import copy
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+import faiss
+import numpy as np
+import streamlit as st
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from db import consultar
+from cache_embeddings import EmbeddingsEmCache, hash_texto
+from dados_apostas import (
+    ALTERACAO_APOSTA, CAMPOS_APOSTAS, FROM_APOSTAS, MARGEM_SYNC, SELECT_APOSTAS, versao_dados
+)
+from modelo_embeddings import NOME_MODELO
+
+PASTA_INDICE = os.getenv(
+    "FAISS_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "faiss_index")
+)
+ARQUIVO_ESTADO = "estado.json"
+
+logger = logging.getLogger(__name__)
+
+
+# Texto de uma aposta como vai para o embedding e para o prompt
+def documento_aposta(linha):
+    content = ", ".join([f"{CAMPOS_APOSTAS[i]}: {linha[i]}" for i in range(len(CAMPOS_APOSTAS))])
+    return Document(page_content=content, metadata={"id": linha[0]})
+
+
+# Ids das apostas presentes no índice
+def _ids_indexados(vectorstore):
+    if vectorstore is None:
+        return set()
+    return set(vectorstore.index_to_docstore_id.values())
+
+
+# Cópia independente do índice (vetores, documentos e posições), para alterar sem
+# mexer na versão publicada
+def _copiar(vectorstore):
+    copia = copy.copy(vectorstore)
+    copia.index = faiss.clone_index(vectorstore.index)
+    copia.docstore = InMemoryDocstore(dict(vectorstore.docstore._dict))
+    copia.index_to_docstore_id = dict(vectorstore.index_to_docstore_id)
+    return copia
+
+
+# Índice FAISS persistido em disco; a cada sincronização só as apostas novas
+# (id acima da marca d'água) ou alteradas desde a última passam pelo modelo
+class IndiceApostas:
+    def __init__(self, embeddings, pasta=PASTA_INDICE):
+        self.embeddings = embeddings
+        self.pasta = pasta
+        self.vectorstore = None
+        self.ultimo_id = 0
+        self.ultima_sync = None
+        self.versao = None
+        # _lock só protege a troca de self.vectorstore; _lock_sync serializa as sincronizações
+        self._lock = threading.Lock()
+        self._lock_sync = threading.Lock()
+        self._carregar()
+
+    def _carregar(self):
+        caminho_estado = os.path.join(self.pasta, ARQUIVO_ESTADO)
+        # Sem o arquivo de estado não dá para saber o que o índice cobre: reconstrói
+        if not os.path.exists(caminho_estado):
+            return
+        try:
+            with open(caminho_estado, encoding="utf-8") as f:
+                estado = json.load(f)
+            self.vectorstore = FAISS.load_local(
+                self.pasta, self.embeddings, allow_dangerous_deserialization=True
+            )
+        except Exception as e:
+            logger.warning("Índice FAISS em %s ilegível, será reconstruído: %s", self.pasta, e)
+            self.vectorstore = None
+            return
+        self.ultimo_id = estado.get("ultimo_id", 0)
+        if estado.get("ultima_sync"):
+            self.ultima_sync = datetime.fromisoformat(estado["ultima_sync"])
+
+    def _salvar(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        self.vectorstore.save_local(self.pasta)
+        estado = {
+            "ultimo_id": self.ultimo_id,
+            "ultima_sync": self.ultima_sync.isoformat() if self.ultima_sync else None,
+        }
+        # Grava em arquivo temporário e troca, para nunca deixar um estado pela metade
+        temporario = os.path.join(self.pasta, ARQUIVO_ESTADO + ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(temporario, os.path.join(self.pasta, ARQUIVO_ESTADO))
+
+    def sincronizar(self):
+        versao = versao_dados()
+        if versao == self.versao:
+            return self.vectorstore
+
+        # Uma sincronização por vez. As mudanças vão para uma cópia do índice, publicada
+        # no fim: as buscas seguem na versão anterior, que nunca é alterada
+        with self._lock_sync:
+            if versao == self.versao:
+                return self.vectorstore
+
+            atual = self.vectorstore
+            max_id, total, ultima_alteracao = versao
+            where = ""
+            params = None
+            if atual is not None:
+                condicoes = ["apostas.id > %s"]
+                params = [self.ultimo_id]
+                if self.ultima_sync is not None:
+                    condicoes.append(f"{ALTERACAO_APOSTA} >= %s")
+                    params.append(self.ultima_sync - MARGEM_SYNC)
+                where = "WHERE " + " OR ".join(condicoes)
+            linhas = consultar(f"SELECT {SELECT_APOSTAS} FROM {FROM_APOSTAS} {where} ORDER BY apostas.id", params)
+
+            indexados = _ids_indexados(atual)
+            docs, ids, substituidos = [], [], []
+            for linha in linhas:
+                doc = documento_aposta(linha)
+                doc_id = str(linha[0])
+                if doc_id in indexados:
+                    # A folga de sincronização traz linhas já vistas; só reindexa se o texto mudou
+                    anterior = atual.docstore.search(doc_id)
+                    if isinstance(anterior, Document) and anterior.page_content == doc.page_content:
+                        continue
+                    substituidos.append(doc_id)
+                docs.append(doc)
+                ids.append(doc_id)
+
+            # Apostas excluídas (reembolso) saem do índice
+            indexados |= set(ids)
+            removidos = []
+            if len(indexados) != total:
+                existentes = {str(linha[0]) for linha in consultar("SELECT id FROM apostas")}
+                removidos = [doc_id for doc_id in indexados if doc_id not in existentes]
+
+            novo = atual
+            if docs or removidos:
+                if atual is None:
+                    novo = FAISS.from_documents(docs, self.embeddings, ids=ids)
+                else:
+                    novo = _copiar(atual)
+                    if substituidos:
+                        novo.delete(substituidos)
+                    if docs:
+                        novo.add_documents(docs, ids=ids)
+                if removidos:
+                    novo.delete(removidos)
+
+            with self._lock:
+                self.vectorstore = novo
+            self.ultimo_id = max_id
+            self.ultima_sync = ultima_alteracao
+            if novo is not atual:
+                self._salvar()
+                self._compactar_cache()
+            self.versao = versao
+            return novo
+
+    # Vetores de apostas editadas ou excluídas saem do cache de embeddings
+    def _compactar_cache(self):
+        if not isinstance(self.embeddings, EmbeddingsEmCache):
+            return
+        docstore = self.vectorstore.docstore
+        atuais = set()
+        for doc_id in self.vectorstore.index_to_docstore_id.values():
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                atuais.add(hash_texto(doc.page_content))
+        self.embeddings.compactar(atuais)
+
+    # Busca por similaridade; com ids, só essas apostas entram (seletor de ids do FAISS).
+    # O lock só cobre a leitura da versão publicada: embedding e busca rodam fora dele
+    def buscar(self, pergunta, k, ids=None):
+        with self._lock:
+            vectorstore = self.vectorstore
+        if vectorstore is None:
+            return []
+        if ids is None:
+            return vectorstore.similarity_search_with_score(pergunta, k=k)
+
+        index_to_docstore_id = vectorstore.index_to_docstore_id
+        posicoes = {doc_id: posicao for posicao, doc_id in index_to_docstore_id.items()}
+        selecionadas = [posicoes[str(i)] for i in ids if str(i) in posicoes]
+        if not selecionadas:
+            return []
+        k = min(k, len(selecionadas))
+        consulta = np.asarray([self.embeddings.embed_query(pergunta)], dtype=np.float32)
+        seletor = faiss.IDSelectorBatch(np.asarray(selecionadas, dtype=np.int64))
+        distancias, indices = vectorstore.index.search(
+            consulta, k, params=faiss.SearchParameters(sel=seletor)
+        )
+
+        resultados = []
+        for distancia, posicao in zip(distancias[0], indices[0]):
+            if posicao < 0:
+                continue
+            doc = vectorstore.docstore.search(index_to_docstore_id[int(posicao)])
+            if isinstance(doc, Document):
+                resultados.append((doc, float(distancia)))
+        return resultados
+
+
+# Um índice por processo do servidor, compartilhado entre as sessões; os
+# embeddings das apostas passam pelo cache por conteúdo (cache_embeddings.py)
+@st.cache_resource
+def indice_apostas(_embeddings):
+    return IndiceApostas(EmbeddingsEmCache(_embeddings, NOME_MODELO))
@@ -0,0 +1,341 @@
+from db import cursor
+
+# Liquidação inteira no servidor: calcula valor_final como a página de Atualização,
+# grava o resultado, trava e ajusta o saldo da casa e registra no histórico — tudo
+# na mesma transação, em uma única chamada do cliente. Criada por migracoes.py.
+#
+# Cada versão publicada gera o mesmo SQL que a migração correspondente rodou: o
+# corpo é um só (_LIQUIDAR_APOSTA) e as versões diferem apenas nos trechos abaixo.
+# Uma mudança na função entra como trechos (ou corpo) novos e uma migração nova.
+_LIQUIDAR_APOSTA = """
+    CREATE OR REPLACE FUNCTION liquidar_aposta(
+        p_id INTEGER,
+        p_resultado TEXT,
+        p_odds_validas NUMERIC[],
+        p_bonus_percent NUMERIC DEFAULT 0,
+        p_cashout NUMERIC DEFAULT NULL
+    ) RETURNS NUMERIC AS $$
+    DECLARE
+        v_aposta apostas%ROWTYPE;
+        v_valor_apostado NUMERIC;
+        v_produto NUMERIC := 1;{declarar_produto_float}
+        v_odd NUMERIC;
+        v_lucro NUMERIC;
+        v_valor_final NUMERIC;
+        v_ajuste NUMERIC;
+        v_saldo NUMERIC;
+        v_odd_texto TEXT;
+    BEGIN
+        IF p_resultado NOT IN ('Ganhou', 'Perdeu') THEN
+            RAISE EXCEPTION 'Resultado inválido: %', p_resultado;
+        END IF;
+
+        SELECT * INTO v_aposta FROM apostas WHERE id = p_id FOR UPDATE;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Aposta % não encontrada', p_id;
+        END IF;
+        IF v_aposta.resultado <> 'Pendente' THEN
+            RAISE EXCEPTION 'Aposta % já liquidada (%)', p_id, v_aposta.resultado;
+        END IF;
+        v_valor_apostado := v_aposta.valor_apostado::numeric;
+
+        -- Só as pernas válidas entram (pernas anuladas ficam de fora)
+        IF p_odds_validas IS NOT NULL THEN
+            FOREACH v_odd IN ARRAY p_odds_validas LOOP
+                v_produto := v_produto * v_odd;{multiplicar_produto_float}
+            END LOOP;
+        END IF;
+
+        v_lucro := v_valor_apostado * (v_produto - 1);
+        IF COALESCE(p_bonus_percent, 0) > 0 THEN
+            v_lucro := v_lucro * (1 + p_bonus_percent / 100);
+        END IF;
+
+        IF p_cashout IS NOT NULL THEN
+            v_valor_final := p_cashout - v_valor_apostado;
+        ELSIF p_resultado = 'Ganhou' THEN
+            v_valor_final := v_lucro;
+        ELSIF v_aposta.bonus = 1 THEN
+            v_valor_final := 0;
+        ELSE
+            v_valor_final := -v_valor_apostado;
+        END IF;
+
+{odd_texto}
+        UPDATE apostas
+        SET resultado = p_resultado, valor_final = v_valor_final, odd = v_odd_texto
+        WHERE id = p_id;
+
+        -- Ganhou: devolve o valor apostado (exceto aposta bônus) mais o lucro
+        IF p_resultado = 'Ganhou' THEN
+            v_ajuste := CASE WHEN v_aposta.bonus = 1 THEN v_valor_final
+                             ELSE v_valor_apostado + v_valor_final END;
+            -- O UPDATE trava a linha da casa até o fim da transação{origem_movimento}
+            UPDATE saldo_casas
+            SET saldo = saldo + v_ajuste, ultima_atualizacao = CURRENT_TIMESTAMP
+            WHERE {casa_saldo}
+            RETURNING saldo INTO v_saldo;
+
+            IF FOUND THEN
+                INSERT INTO historico_saldos ({coluna_casa}, operacao, valor, observacao, saldo_resultante)
+                VALUES ({valor_casa}, 'Ganhou', v_ajuste,
+                        format('Aposta #%s liquidada', p_id), v_saldo);
+            END IF;
+        END IF;
+
+        RETURN v_valor_final;
+    END;
+    $$ LANGUAGE plpgsql{opcoes}
+    """
+
+# Migração 4: casa pelo nome (casa_nome / casa_de_apostas), odd em NUMERIC sem zeros à direita
+_TRECHOS_V4 = {
+    "declarar_produto_float": "",
+    "multiplicar_produto_float": "",
+    "odd_texto": """\
+        v_odd_texto := v_produto::text;
+        IF position('.' IN v_odd_texto) > 0 THEN
+            v_odd_texto := rtrim(rtrim(v_odd_texto, '0'), '.');
+        END IF;""",
+    "origem_movimento": "",
+    "casa_saldo": "casa_nome = v_aposta.casa_de_apostas",
+    "coluna_casa": "casa_nome",
+    "valor_casa": "v_aposta.casa_de_apostas",
+    "opcoes": "",
+}
+DDL_LIQUIDACAO_V4 = [_LIQUIDAR_APOSTA.format(**_TRECHOS_V4)]
+
+# Migração 7: casa por casa_id
+_TRECHOS_V7 = {
+    **_TRECHOS_V4,
+    "casa_saldo": "casa_id = v_aposta.casa_id",
+    "coluna_casa": "casa_id",
+    "valor_casa": "v_aposta.casa_id",
+}
+DDL_LIQUIDACAO_V7 = [_LIQUIDAR_APOSTA.format(**_TRECHOS_V7)]
+
+# Migração 10: descreve o movimento para o livro de saldos (livro_saldos.py)
+_TRECHOS_V10 = {
+    **_TRECHOS_V7,
+    "origem_movimento": """
+            PERFORM set_config('saldo.operacao', 'Ganhou', true),
+                    set_config('saldo.observacao', format('Aposta #%s liquidada', p_id), true);""",
+}
+DDL_LIQUIDACAO_V10 = [_LIQUIDAR_APOSTA.format(**_TRECHOS_V10)]
+
+# Migração 12: odd gravada como str(float) do Python, o formato da liquidação em lote de então
+_TRECHOS_V12 = {
+    **_TRECHOS_V10,
+    "declarar_produto_float": """
+        v_produto_float DOUBLE PRECISION := 1;""",
+    "multiplicar_produto_float": """
+                v_produto_float := v_produto_float * v_odd::double precision;""",
+    "odd_texto": """\
+        -- Mesmo texto de formatar_odd() (str(float) do Python, como no formulário
+        -- e na liquidação em lote): produto em float8, saída mais curta e exata
+        v_odd_texto := v_produto_float::text;
+        IF v_odd_texto ~ '^-?[0-9]+$' THEN
+            v_odd_texto := v_odd_texto || '.0';
+        END IF;""",
+    "opcoes": " SET extra_float_digits = 1",
+}
+DDL_LIQUIDACAO_V12 = [_LIQUIDAR_APOSTA.format(**_TRECHOS_V12)]
+
+# Migração 13: liquidar_apostas() liquida um lote (arrays paralelos, uma posição por
+# aposta) e é a única dona das regras; liquidar_aposta() vira um lote de uma aposta.
+# Apostas que já não estão pendentes ficam de fora do lote. O saldo muda com um
+# UPDATE por casa, com uma linha de histórico cada (observação p_observacao).
+DDL_LIQUIDACAO_V13 = [
+    """
+    CREATE OR REPLACE FUNCTION liquidar_apostas(
+        p_ids INTEGER[],
+        p_resultados TEXT[],
+        p_odds_validas TEXT[],
+        p_bonus_percent NUMERIC[],
+        p_cashout NUMERIC[],
+        p_observacao TEXT DEFAULT 'Liquidação em lote'
+    ) RETURNS TABLE (aposta_id INTEGER, valor_liquidado NUMERIC) AS $$
+    DECLARE
+        v_aposta apostas%ROWTYPE;
+        v_valor_apostado NUMERIC;
+        v_pernas NUMERIC[];
+        v_posicao INTEGER;
+        v_usadas INTEGER;
+        v_produto NUMERIC;
+        v_produto_float DOUBLE PRECISION;
+        v_odd NUMERIC;
+        v_lucro NUMERIC;
+        v_valor_final NUMERIC;
+        v_odd_texto TEXT;
+        v_casas INTEGER[] := '{}';
+        v_ajustes NUMERIC[] := '{}';
+    BEGIN
+        FOR i IN 1 .. COALESCE(array_length(p_ids, 1), 0) LOOP
+            IF p_resultados[i] IS NULL OR p_resultados[i] NOT IN ('Ganhou', 'Perdeu') THEN
+                RAISE EXCEPTION 'Resultado inválido: %', p_resultados[i];
+            END IF;
+
+            -- Outra sessão pode ter liquidado a aposta no meio tempo
+            SELECT * INTO v_aposta FROM apostas a
+            WHERE a.id = p_ids[i] AND a.resultado = 'Pendente'
+            FOR UPDATE;
+            CONTINUE WHEN NOT FOUND;
+            v_valor_apostado := v_aposta.valor_apostado::numeric;
+
+            -- Só pernas gravadas na aposta, cada uma no máximo quantas vezes aparece
+            -- (pernas anuladas ficam de fora); sem nenhuma, não há odd para liquidar
+            v_pernas := ARRAY(SELECT p.odd FROM pernas_odd(v_aposta.odd) p ORDER BY p.posicao);
+            v_usadas := 0;
+            v_produto := 1;
+            v_produto_float := 1;
+            FOREACH v_odd IN ARRAY COALESCE(string_to_array(p_odds_validas[i], ','), '{}')::numeric[] LOOP
+                v_posicao := array_position(v_pernas, v_odd);
+                IF v_posicao IS NULL THEN
+                    RAISE EXCEPTION 'Odd % não é uma perna da aposta %', v_odd, v_aposta.id;
+                END IF;
+                v_pernas[v_posicao] := NULL;
+                v_usadas := v_usadas + 1;
+                v_produto := v_produto * v_odd;
+                v_produto_float := v_produto_float * v_odd::double precision;
+            END LOOP;
+            IF v_usadas = 0 THEN
+                RAISE EXCEPTION 'Nenhuma perna válida para a aposta %', v_aposta.id;
+            END IF;
+
+            v_lucro := v_valor_apostado * (v_produto - 1);
+            IF COALESCE(p_bonus_percent[i], 0) > 0 THEN
+                v_lucro := v_lucro * (1 + p_bonus_percent[i] / 100);
+            END IF;
+
+            IF p_cashout[i] IS NOT NULL THEN
+                v_valor_final := p_cashout[i] - v_valor_apostado;
+            ELSIF p_resultados[i] = 'Ganhou' THEN
+                v_valor_final := v_lucro;
+            ELSIF v_aposta.bonus = 1 THEN
+                v_valor_final := 0;
+            ELSE
+                v_valor_final := -v_valor_apostado;
+            END IF;
+
+            -- str(float) do Python, como as pernas gravadas pelo formulário
+            v_odd_texto := v_produto_float::text;
+            IF v_odd_texto ~ '^-?[0-9]+$' THEN
+                v_odd_texto := v_odd_texto || '.0';
+            END IF;
+            UPDATE apostas a
+            SET resultado = p_resultados[i], valor_final = v_valor_final, odd = v_odd_texto
+            WHERE a.id = v_aposta.id;
+
+            -- Ganhou: devolve o valor apostado (exceto aposta bônus) mais o lucro
+            IF p_resultados[i] = 'Ganhou' THEN
+                v_casas := v_casas || v_aposta.casa_id;
+                v_ajustes := v_ajustes || CASE WHEN v_aposta.bonus = 1 THEN v_valor_final
+                                               ELSE v_valor_apostado + v_valor_final END;
+            END IF;
+
+            aposta_id := v_aposta.id;
+            valor_liquidado := v_valor_final;
+            RETURN NEXT;
+        END LOOP;
+
+        IF cardinality(v_casas) > 0 THEN
+            PERFORM set_config('saldo.operacao', 'Ganhou', true),
+                    set_config('saldo.observacao', p_observacao, true);
+            WITH ajustes AS (
+                SELECT u.casa_id, round(sum(u.ajuste), 2) AS ajuste
+                FROM unnest(v_casas, v_ajustes) AS u(casa_id, ajuste)
+                GROUP BY u.casa_id
+            ), saldos AS (
+                UPDATE saldo_casas s
+                SET saldo = s.saldo + aj.ajuste, ultima_atualizacao = CURRENT_TIMESTAMP
+                FROM ajustes aj
+                WHERE s.casa_id = aj.casa_id
+                RETURNING s.casa_id, aj.ajuste, s.saldo
+            )
+            INSERT INTO historico_saldos (casa_id, operacao, valor, observacao, saldo_resultante)
+            SELECT sa.casa_id, 'Ganhou', sa.ajuste, p_observacao, sa.saldo FROM saldos sa;
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql SET extra_float_digits = 1
+    """,
+    """
+    CREATE OR REPLACE FUNCTION liquidar_aposta(
+        p_id INTEGER,
+        p_resultado TEXT,
+        p_odds_validas NUMERIC[],
+        p_bonus_percent NUMERIC DEFAULT 0,
+        p_cashout NUMERIC DEFAULT NULL
+    ) RETURNS NUMERIC AS $$
+    DECLARE
+        v_resultado TEXT;
+        v_valor_final NUMERIC;
+    BEGIN
+        SELECT l.valor_liquidado INTO v_valor_final
+        FROM liquidar_apostas(
+            ARRAY[p_id], ARRAY[p_resultado], ARRAY[array_to_string(p_odds_validas, ',')],
+            ARRAY[p_bonus_percent], ARRAY[p_cashout], format('Aposta #%s liquidada', p_id)
+        ) AS l;
+        IF NOT FOUND THEN
+            SELECT resultado INTO v_resultado FROM apostas WHERE id = p_id;
+            IF NOT FOUND THEN
+                RAISE EXCEPTION 'Aposta % não encontrada', p_id;
+            END IF;
+            RAISE EXCEPTION 'Aposta % já liquidada (%)', p_id, v_resultado;
+        END IF;
+        RETURN v_valor_final;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+# Pernas da odd gravada (o que vem depois do '|' é o % de bônus de combinadas)
+def pernas_da_odd(odd_str):
+    odd_str = str(odd_str)
+    if "|" in odd_str:
+        odd_str = odd_str.split("|")[0]
+    return [o.strip() for o in odd_str.split(",")]
+
+
+# Pernas digitadas na liquidação em lote (separadas por vírgula). Como no multiselect
+# da liquidação individual, só valem pernas gravadas na aposta, cada uma no máximo
+# quantas vezes aparece nela; ValueError se nenhuma sobrar ou alguma não bater.
+def pernas_escolhidas(texto, odd_str):
+    escolhidas = [o.strip() for o in str(texto or "").split(",") if o.strip()]
+    if not escolhidas:
+        raise ValueError("Nenhuma perna válida informada")
+    restantes = [float(o) for o in pernas_da_odd(odd_str)]
+    for perna in escolhidas:
+        if float(perna) not in restantes:
+            raise ValueError(f"{perna} não é uma perna da aposta")
+        restantes.remove(float(perna))
+    return escolhidas
+
+
+# Liquida uma aposta em uma ida ao banco; retorna o valor_final gravado
+def liquidar_aposta(aposta_id, resultado, odds_validas, bonus_percent=0.0, cashout=None):
+    with cursor() as cur:
+        cur.execute(
+            "SELECT liquidar_aposta(%s, %s, %s::numeric[], %s, %s)",
+            (aposta_id, resultado, [float(o) for o in odds_validas], bonus_percent, cashout)
+        )
+        return cur.fetchone()[0]
+
+
+# Liquida várias apostas em uma transação e uma ida ao banco (liquidar_apostas()).
+# liquidacoes: [(id, resultado, odds_validas, bonus_percent, cashout)]; retorna
+# (liquidadas, ignoradas), ignoradas as que outra sessão já tinha liquidado
+def liquidar_em_lote(liquidacoes):
+    with cursor() as cur:
+        cur.execute(
+            "SELECT count(*) FROM liquidar_apostas(%s, %s, %s, %s::numeric[], %s::numeric[])",
+            (
+                [l[0] for l in liquidacoes],
+                [l[1] for l in liquidacoes],
+                [", ".join(l[2]) for l in liquidacoes],
+                [l[3] for l in liquidacoes],
+                [l[4] for l in liquidacoes],
+            )
+        )
+        liquidadas = cur.fetchone()[0]
+    return liquidadas, len(liquidacoes) - liquidadas
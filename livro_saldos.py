@@ -0,0 +1,141 @@
+# Livro de movimentos dos saldos: só aceita INSERT, e é alimentado por um trigger
+# em saldo_casas, então nenhum caminho que mexe no saldo (aposta registrada,
+# liquidação individual ou em lote, importação, reembolso, ajustes da página de
+# saldos) deixa de ser registrado. Cada movimento guarda a variação e o saldo
+# resultante: o saldo de uma casa em qualquer instante é o do último movimento até
+# ali, uma busca no índice (casa_id, data, id). Criado pela migração 10 (não alterar:
+# mudanças entram como constante e migração novas).
+DDL_LIVRO = [
+    """
+    CREATE TABLE IF NOT EXISTS movimentos_saldo (
+        id BIGSERIAL PRIMARY KEY,
+        casa_id INTEGER NOT NULL REFERENCES casas(id),
+        data TIMESTAMP NOT NULL DEFAULT clock_timestamp(),
+        operacao TEXT NOT NULL,
+        valor NUMERIC(12,2) NOT NULL,
+        saldo NUMERIC(12,2) NOT NULL,
+        observacao TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_movimentos_casa_data ON movimentos_saldo (casa_id, data, id)",
+    # Quem altera o saldo descreve o movimento com origem_movimento(); sem isso o
+    # trigger usa um nome genérico conforme o comando
+    """
+    CREATE OR REPLACE FUNCTION registrar_movimento_saldo() RETURNS trigger AS $$
+    DECLARE
+        v_casa_id INTEGER := COALESCE(NEW.casa_id, OLD.casa_id);
+        v_anterior NUMERIC := CASE WHEN TG_OP = 'INSERT' THEN 0 ELSE COALESCE(OLD.saldo, 0) END;
+        v_atual NUMERIC := CASE WHEN TG_OP = 'DELETE' THEN 0 ELSE COALESCE(NEW.saldo, 0) END;
+    BEGIN
+        IF v_atual = v_anterior AND TG_OP = 'UPDATE' THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO movimentos_saldo (casa_id, operacao, valor, saldo, observacao)
+        VALUES (
+            v_casa_id,
+            COALESCE(NULLIF(current_setting('saldo.operacao', true), ''),
+                     CASE TG_OP WHEN 'INSERT' THEN 'Saldo inicial'
+                                WHEN 'DELETE' THEN 'Exclusão da casa'
+                                ELSE 'Ajuste' END),
+            v_atual - v_anterior,
+            v_atual,
+            NULLIF(current_setting('saldo.observacao', true), '')
+        );
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_saldo_casas_movimento ON saldo_casas",
+    """
+    CREATE TRIGGER trg_saldo_casas_movimento
+    AFTER INSERT OR UPDATE OF saldo OR DELETE ON saldo_casas
+    FOR EACH ROW EXECUTE FUNCTION registrar_movimento_saldo()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION bloquear_alteracao_livro() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'movimentos_saldo só aceita inserções';
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_movimentos_saldo_somente_insercao ON movimentos_saldo",
+    """
+    CREATE TRIGGER trg_movimentos_saldo_somente_insercao
+    BEFORE UPDATE OR DELETE OR TRUNCATE ON movimentos_saldo
+    FOR EACH STATEMENT EXECUTE FUNCTION bloquear_alteracao_livro()
+    """,
+    # Saldo de uma casa num instante (NULL antes do primeiro movimento)
+    """
+    CREATE OR REPLACE FUNCTION saldo_em(p_casa_id INTEGER, p_momento TIMESTAMP) RETURNS NUMERIC AS $$
+        SELECT saldo FROM movimentos_saldo
+        WHERE casa_id = p_casa_id AND data <= p_momento
+        ORDER BY data DESC, id DESC
+        LIMIT 1
+    $$ LANGUAGE sql STABLE
+    """,
+    # Bancos existentes: o saldo atual de cada casa vira o movimento de abertura
+    """
+    INSERT INTO movimentos_saldo (casa_id, operacao, valor, saldo, observacao)
+    SELECT s.casa_id, 'Saldo inicial', COALESCE(s.saldo, 0), COALESCE(s.saldo, 0),
+           'Saldo existente ao criar o livro de movimentos'
+    FROM saldo_casas s
+    WHERE NOT EXISTS (SELECT 1 FROM movimentos_saldo m WHERE m.casa_id = s.casa_id)
+    """,
+]
+
+# Resumo diário por casa, mantido a cada movimento do livro: variação líquida do dia
+# e saldo de fechamento (o do último movimento). O gráfico de evolução lê só as
+# linhas do período, uma por casa e dia, em vez de agrupar os movimentos. Migração 11.
+DDL_SALDO_DIARIO = [
+    """
+    CREATE TABLE IF NOT EXISTS saldo_diario (
+        casa_id INTEGER NOT NULL REFERENCES casas(id),
+        dia DATE NOT NULL,
+        movimentacao NUMERIC(12,2) NOT NULL,
+        saldo_fechamento NUMERIC(12,2) NOT NULL,
+        PRIMARY KEY (casa_id, dia)
+    )
+    """,
+    # Todas as casas: varredura por intervalo de dias respondida só pelo índice
+    "CREATE INDEX IF NOT EXISTS idx_saldo_diario_dia ON saldo_diario (dia) INCLUDE (casa_id, saldo_fechamento)",
+    # Movimentos de uma casa chegam em ordem (o UPDATE em saldo_casas trava a linha),
+    # então o saldo do movimento novo é sempre o fechamento do dia
+    """
+    CREATE OR REPLACE FUNCTION acumular_saldo_diario() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO saldo_diario (casa_id, dia, movimentacao, saldo_fechamento)
+        VALUES (NEW.casa_id, DATE(NEW.data), NEW.valor, NEW.saldo)
+        ON CONFLICT (casa_id, dia) DO UPDATE
+        SET movimentacao = saldo_diario.movimentacao + EXCLUDED.movimentacao,
+            saldo_fechamento = EXCLUDED.saldo_fechamento;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_movimentos_saldo_diario ON movimentos_saldo",
+    """
+    CREATE TRIGGER trg_movimentos_saldo_diario
+    AFTER INSERT ON movimentos_saldo
+    FOR EACH ROW EXECUTE FUNCTION acumular_saldo_diario()
+    """,
+    # Movimentos já gravados no livro
+    """
+    INSERT INTO saldo_diario (casa_id, dia, movimentacao, saldo_fechamento)
+    SELECT DISTINCT ON (casa_id, DATE(data))
+           casa_id, DATE(data),
+           SUM(valor) OVER (PARTITION BY casa_id, DATE(data)),
+           saldo
+    FROM movimentos_saldo
+    ORDER BY casa_id, DATE(data), data DESC, id DESC
+    ON CONFLICT (casa_id, dia) DO NOTHING
+    """,
+]
+
+
+# Descreve os próximos movimentos de saldo da transação do cursor (vale até o commit)
+def origem_movimento(cur, operacao, observacao=None):
+    cur.execute(
+        "SELECT set_config('saldo.operacao', %s, true), set_config('saldo.observacao', %s, true)",
+        (operacao, observacao or '')
+    )
+
@@ -0,0 +1,259 @@
+import argparse
+import time
+
+from db import conexao, cursor
+
+NOME_MIGRACAO = "apostas_normalizadas"
+
+# Estrutura tipada/normalizada criada ao lado das colunas TEXT originais.
+# As páginas continuam gravando o formato antigo; os triggers mantêm as
+# colunas e tabelas novas em dia, e o backfill converte as linhas antigas.
+# Publicada como migração 3 (migracoes.py): não alterar.
+DDL_NORMALIZACAO = [
+    """
+    CREATE OR REPLACE FUNCTION texto_para_data(p TEXT) RETURNS DATE AS $$
+    BEGIN
+        RETURN NULLIF(btrim(p), '')::date;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql IMMUTABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION texto_para_numeric(p TEXT) RETURNS NUMERIC AS $$
+    BEGIN
+        RETURN NULLIF(btrim(p), '')::numeric;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql IMMUTABLE
+    """,
+    # Pernas da odd: parte antes do '|' separada por vírgula (o que vem depois é o % de bônus)
+    """
+    CREATE OR REPLACE FUNCTION pernas_odd(p_odd TEXT)
+    RETURNS TABLE (posicao INTEGER, odd NUMERIC) AS $$
+        SELECT t.ord::integer, texto_para_numeric(t.valor)
+        FROM unnest(string_to_array(split_part(COALESCE(p_odd, ''), '|', 1), ',')) WITH ORDINALITY AS t(valor, ord)
+        WHERE texto_para_numeric(t.valor) > 0
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION produto_odds(p_odd TEXT) RETURNS NUMERIC AS $$
+        SELECT round(exp(sum(ln(odd)))::numeric, 4) FROM pernas_odd(p_odd)
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION lista_texto(p TEXT) RETURNS SETOF TEXT AS $$
+        SELECT DISTINCT btrim(x)
+        FROM unnest(string_to_array(COALESCE(p, ''), ',')) AS x
+        WHERE btrim(x) <> ''
+    $$ LANGUAGE sql IMMUTABLE
+    """,
+    """
+    ALTER TABLE apostas
+        ADD COLUMN IF NOT EXISTS data_aposta DATE,
+        ADD COLUMN IF NOT EXISTS odd_total NUMERIC(14,4),
+        ADD COLUMN IF NOT EXISTS bonus_percent NUMERIC(6,2)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS aposta_odds (
+        aposta_id INTEGER NOT NULL REFERENCES apostas(id) ON DELETE CASCADE,
+        posicao SMALLINT NOT NULL,
+        odd NUMERIC(10,4) NOT NULL,
+        PRIMARY KEY (aposta_id, posicao)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS categorias (
+        id SERIAL PRIMARY KEY,
+        nome TEXT UNIQUE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS aposta_categorias (
+        aposta_id INTEGER NOT NULL REFERENCES apostas(id) ON DELETE CASCADE,
+        categoria_id INTEGER NOT NULL REFERENCES categorias(id),
+        PRIMARY KEY (aposta_id, categoria_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_aposta_categorias_categoria ON aposta_categorias (categoria_id, aposta_id)",
+    """
+    CREATE TABLE IF NOT EXISTS torneios (
+        id SERIAL PRIMARY KEY,
+        nome TEXT UNIQUE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS aposta_torneios (
+        aposta_id INTEGER NOT NULL REFERENCES apostas(id) ON DELETE CASCADE,
+        torneio_id INTEGER NOT NULL REFERENCES torneios(id),
+        PRIMARY KEY (aposta_id, torneio_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_aposta_torneios_torneio ON aposta_torneios (torneio_id, aposta_id)",
+    """
+    CREATE TABLE IF NOT EXISTS migracao_progresso (
+        nome TEXT PRIMARY KEY,
+        ultimo_id INTEGER NOT NULL DEFAULT 0,
+        concluida BOOLEAN NOT NULL DEFAULT FALSE,
+        atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Grava pernas, categorias e torneios de uma aposta nas tabelas filhas.
+    # Na liquidação a odd vira o produto das pernas válidas; as pernas
+    # registradas na criação são preservadas (p_substituir_odds = FALSE).
+    """
+    CREATE OR REPLACE FUNCTION sincronizar_filhos_aposta(
+        p_id INTEGER, p_odd TEXT, p_categoria TEXT, p_torneio TEXT, p_substituir_odds BOOLEAN
+    ) RETURNS VOID AS $$
+    BEGIN
+        IF p_substituir_odds OR NOT EXISTS (SELECT 1 FROM aposta_odds WHERE aposta_id = p_id) THEN
+            DELETE FROM aposta_odds WHERE aposta_id = p_id;
+            INSERT INTO aposta_odds (aposta_id, posicao, odd)
+            SELECT p_id, posicao, odd FROM pernas_odd(p_odd);
+        END IF;
+
+        INSERT INTO categorias (nome) SELECT lista_texto(p_categoria) ON CONFLICT (nome) DO NOTHING;
+        DELETE FROM aposta_categorias WHERE aposta_id = p_id;
+        INSERT INTO aposta_categorias (aposta_id, categoria_id)
+        SELECT p_id, c.id FROM categorias c WHERE c.nome IN (SELECT lista_texto(p_categoria));
+
+        INSERT INTO torneios (nome) SELECT lista_texto(p_torneio) ON CONFLICT (nome) DO NOTHING;
+        DELETE FROM aposta_torneios WHERE aposta_id = p_id;
+        INSERT INTO aposta_torneios (aposta_id, torneio_id)
+        SELECT p_id, t.id FROM torneios t WHERE t.nome IN (SELECT lista_texto(p_torneio));
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tipar_aposta() RETURNS trigger AS $$
+    BEGIN
+        NEW.data_aposta := texto_para_data(NEW.data);
+        NEW.odd_total := produto_odds(NEW.odd);
+        NEW.bonus_percent := COALESCE(
+            texto_para_numeric(NULLIF(split_part(COALESCE(NEW.odd, ''), '|', 2), '')),
+            CASE WHEN TG_OP = 'UPDATE' THEN OLD.bonus_percent END
+        );
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_apostas_tipar ON apostas",
+    """
+    CREATE TRIGGER trg_apostas_tipar
+    BEFORE INSERT OR UPDATE OF data, odd ON apostas
+    FOR EACH ROW EXECUTE FUNCTION tipar_aposta()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION normalizar_filhos_aposta() RETURNS trigger AS $$
+    BEGIN
+        PERFORM sincronizar_filhos_aposta(NEW.id, NEW.odd, NEW.categoria, NEW.torneio, TG_OP = 'INSERT');
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_apostas_normalizar ON apostas",
+    """
+    CREATE TRIGGER trg_apostas_normalizar
+    AFTER INSERT OR UPDATE OF odd, categoria, torneio ON apostas
+    FOR EACH ROW EXECUTE FUNCTION normalizar_filhos_aposta()
+    """,
+]
+
+
+# Cria colunas, tabelas, funções e triggers (idempotente)
+def aplicar_schema(cur):
+    for ddl in DDL_NORMALIZACAO:
+        cur.execute(ddl)
+    cur.execute("""
+        INSERT INTO migracao_progresso (nome) VALUES (%s)
+        ON CONFLICT (nome) DO NOTHING
+    """, (NOME_MIGRACAO,))
+
+
+def backfill_pendente():
+    with cursor() as cur:
+        cur.execute("SELECT concluida FROM migracao_progresso WHERE nome = %s", (NOME_MIGRACAO,))
+        linha = cur.fetchone()
+    return linha is not None and not linha[0]
+
+
+# Converte as linhas antigas em lotes; cada lote é uma transação curta e o
+# progresso fica em migracao_progresso, então dá para interromper e retomar
+def backfill(tamanho_lote=1000, pausa=0.0, log=print):
+    convertidas = 0
+    inicio = time.perf_counter()
+    while True:
+        with conexao() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT ultimo_id FROM migracao_progresso WHERE nome = %s FOR UPDATE",
+                (NOME_MIGRACAO,)
+            )
+            ultimo_id = cur.fetchone()[0]
+
+            cur.execute(
+                "SELECT id FROM apostas WHERE id > %s ORDER BY id LIMIT %s",
+                (ultimo_id, tamanho_lote)
+            )
+            ids = [linha[0] for linha in cur.fetchall()]
+            if not ids:
+                cur.execute("""
+                    UPDATE migracao_progresso
+                    SET concluida = TRUE, atualizado_em = CURRENT_TIMESTAMP
+                    WHERE nome = %s
+                """, (NOME_MIGRACAO,))
+                break
+
+            cur.execute("""
+                UPDATE apostas
+                SET data_aposta = texto_para_data(data),
+                    odd_total = produto_odds(odd),
+                    bonus_percent = texto_para_numeric(NULLIF(split_part(COALESCE(odd, ''), '|', 2), ''))
+                WHERE id = ANY(%s)
+            """, (ids,))
+            cur.execute("""
+                SELECT sincronizar_filhos_aposta(id, odd, categoria, torneio, FALSE)
+                FROM apostas
+                WHERE id = ANY(%s)
+            """, (ids,))
+            cur.execute("""
+                UPDATE migracao_progresso
+                SET ultimo_id = %s, atualizado_em = CURRENT_TIMESTAMP
+                WHERE nome = %s
+            """, (ids[-1], NOME_MIGRACAO))
+
+        convertidas += len(ids)
+        decorrido = time.perf_counter() - inicio
+        log(f"{convertidas} apostas convertidas (até id {ids[-1]}, {convertidas / decorrido:.0f} linhas/s)")
+        if pausa:
+            time.sleep(pausa)
+
+    log(f"Backfill concluído: {convertidas} apostas convertidas nesta execução.")
+    return convertidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra apostas para o schema tipado/normalizado.")
+    parser.add_argument("--lote", type=int, default=1000, help="Linhas por transação do backfill")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos de pausa entre lotes")
+    parser.add_argument("--somente-schema", action="store_true", help="Cria a estrutura sem executar o backfill")
+    parser.add_argument("--reiniciar", action="store_true", help="Refaz o backfill desde o primeiro id")
+    args = parser.parse_args()
+
+    # A estrutura vem das migrações versionadas (migracoes.py); aqui só o backfill
+    from migracoes import aplicar_migracoes
+    aplicar_migracoes(backfill_tipado=False)
+    if args.reiniciar:
+        with cursor() as cur:
+            cur.execute("""
+                UPDATE migracao_progresso SET ultimo_id = 0, concluida = FALSE
+                WHERE nome = %s
+            """, (NOME_MIGRACAO,))
+
+    if not args.somente_schema:
+        backfill(tamanho_lote=args.lote, pausa=args.pausa)
+
+
+if __name__ == "__main__":
+    main()
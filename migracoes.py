@@ -0,0 +1,401 @@
+import argparse
+
+import streamlit as st
+from psycopg2.extras import execute_values
+
+from db import cursor, consultar, consultar_um
+from liquidacao_apostas import (
+    DDL_LIQUIDACAO_V4, DDL_LIQUIDACAO_V7, DDL_LIQUIDACAO_V10, DDL_LIQUIDACAO_V12, DDL_LIQUIDACAO_V13,
+)
+from livro_saldos import DDL_LIVRO, DDL_SALDO_DIARIO
+from migracao_apostas import aplicar_schema, backfill, backfill_pendente
+
+# Cada migração roda SQL fixo: as constantes usadas por uma versão publicada não
+# mudam depois (nem as importadas de outros módulos, que são versionadas pelo nome,
+# como DDL_LIQUIDACAO_V4/V7/V10/V12/V13). Banco novo e banco atualizado rodam o mesmo SQL.
+
+# Estrutura original das páginas (app.py e Saldo das Casas); tudo idempotente,
+# então bancos criados antes do controle de versão passam direto por aqui
+DDL_BASE = [
+    """
+    CREATE TABLE IF NOT EXISTS apostas (
+        id SERIAL PRIMARY KEY,
+        data TEXT,
+        casa_de_apostas TEXT,
+        tipo_aposta TEXT,
+        categoria TEXT,
+        resultado TEXT,
+        valor_apostado REAL,
+        odd TEXT,
+        valor_final REAL,
+        torneio TEXT,
+        partida TEXT,
+        detalhes TEXT,
+        bonus REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS saldo_casas (
+        id SERIAL PRIMARY KEY,
+        casa_nome TEXT UNIQUE,
+        saldo NUMERIC(10,2) DEFAULT 0,
+        ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS historico_saldos (
+        id SERIAL PRIMARY KEY,
+        data TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        casa_nome TEXT,
+        operacao TEXT,
+        valor NUMERIC(10,2),
+        observacao TEXT,
+        saldo_resultante NUMERIC(10,2)
+    )
+    """,
+    # Bancos antigos têm historico_saldos sem saldo_resultante
+    "ALTER TABLE historico_saldos ADD COLUMN IF NOT EXISTS saldo_resultante NUMERIC(10,2)",
+    """
+    CREATE TABLE IF NOT EXISTS metas (
+        id SERIAL PRIMARY KEY,
+        titulo TEXT,
+        valor_alvo NUMERIC(10,2),
+        data_limite DATE,
+        concluida BOOLEAN DEFAULT FALSE,
+        data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+
+# Coluna atualizado_em e o trigger que a mantém. Só as colunas lidas pelo Dashboard
+# contam (colunas derivadas, como as do backfill, não)
+DDL_RASTREAMENTO_V2 = [
+    """
+    ALTER TABLE apostas
+    ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    """,
+    """
+    CREATE OR REPLACE FUNCTION marcar_atualizacao_aposta() RETURNS trigger AS $$
+    BEGIN
+        NEW.atualizado_em := CURRENT_TIMESTAMP;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_apostas_atualizado_em ON apostas",
+    """
+    CREATE TRIGGER trg_apostas_atualizado_em
+    BEFORE UPDATE ON apostas
+    FOR EACH ROW
+    WHEN (ROW(OLD.data, OLD.tipo_aposta, OLD.valor_apostado, OLD.odd, OLD.valor_final, OLD.torneio,
+              OLD.resultado, OLD.casa_de_apostas, OLD.categoria, OLD.partida, OLD.bonus, OLD.detalhes)
+          IS DISTINCT FROM
+          ROW(NEW.data, NEW.tipo_aposta, NEW.valor_apostado, NEW.odd, NEW.valor_final, NEW.torneio,
+              NEW.resultado, NEW.casa_de_apostas, NEW.categoria, NEW.partida, NEW.bonus, NEW.detalhes))
+    EXECUTE FUNCTION marcar_atualizacao_aposta()
+    """,
+]
+
+
+# Índices casados com as consultas das páginas (benchmarks/bench_indices.py mostra os planos)
+DDL_INDICES = [
+    # Atualização: só as pendentes, já na ordem da listagem; o INCLUDE deixa o resumo
+    # (SUM/COUNT) ser respondido só pelo índice
+    """
+    CREATE INDEX IF NOT EXISTS idx_apostas_pendentes
+    ON apostas (data DESC) INCLUDE (valor_apostado)
+    WHERE resultado = 'Pendente'
+    """,
+    # Histórico do app.py: cada filtro seguido do id, para a paginação por keyset
+    # (WHERE filtro AND id < x ORDER BY id DESC LIMIT n) parar na primeira página
+    "CREATE INDEX IF NOT EXISTS idx_apostas_casa_id ON apostas (casa_de_apostas, id)",
+    "CREATE INDEX IF NOT EXISTS idx_apostas_resultado_id ON apostas (resultado, id)",
+    "CREATE INDEX IF NOT EXISTS idx_apostas_data_id ON apostas (data, id)",
+    # Dashboard: apostas entram mais ou menos em ordem de data, então um BRIN
+    # (poucos KB) basta para recortar o período
+    "CREATE INDEX IF NOT EXISTS idx_apostas_data_aposta_brin ON apostas USING brin (data_aposta)",
+    # Saldo das Casas: histórico e evolução de uma casa
+    "CREATE INDEX IF NOT EXISTS idx_historico_casa_data ON historico_saldos (casa_nome, data)",
+    # data tem DEFAULT CURRENT_TIMESTAMP: cresce com a tabela, caso ideal do BRIN
+    "CREATE INDEX IF NOT EXISTS idx_historico_data_brin ON historico_saldos USING brin (data)",
+]
+
+
+# Casas cadastradas na instalação (antes inseridas a cada execução da página de Saldos)
+CASAS_INICIAIS = [
+    'Bet 365', 'Betano', 'Betfair', 'Superbet', 'Estrela Bet', '4Play Bet', 'PixBet',
+    'Novibet', 'Sporting Bet', 'Bet7k', 'Cassino Pix', 'KTO', 'Stake', 'BR Bet',
+    'Aposta tudo', 'Casa de Apostas', 'Vera Bet', 'Bateu Bet', 'Betnacional',
+    'Jogue Facil', 'Jogo de Ouro', 'Pagol', 'Seu Bet', 'Bet Esporte',
+    'BetFast', 'Faz1Bet', 'Esportiva Bet', 'Betpix365', 'Seguro Bet', 'Outros', 'Minha Conta'
+]
+
+
+# Opções que ficavam fixas no formulário de apostas (app.py)
+CASAS_FORMULARIO = [
+    'Bet 365', 'Betano', 'Betfair', 'Superbet', 'Estrela Bet',
+    '4Play Bet', 'PixBet', 'Vera Bet', 'Bet7k', 'Cassino Pix', 'Bet MGM',
+    'McGames', 'Aposta Ganha', 'Aposta tudo', 'Novibet', 'Sporting Bet',
+    'KTO', 'Stake', 'LotoGreen', 'BR Bet', 'Rei do Pitaco',
+    'Bulls Bet', 'BR4 Bet', 'Casa de Apostas', 'Bateu Bet',
+    'Betnacional', 'Jogue Facil', 'Jogo de Ouro', 'H2 Bet',
+    'Pagol', 'MetGol', 'UxBet', 'HiperBet', 'Seu Bet',
+    'Bet Esporte', 'BetFast', 'Faz1Bet', 'Esportiva Bet',
+    'Betpix365', 'Seguro Bet', 'Outros'
+]
+CATEGORIAS_FORMULARIO = [
+    'Resultado', 'Finalizações', 'Escanteios', 'HT', 'FT',
+    'Gols', 'Chutes ao Gol', 'Ambas Equipes', 'Faltas cometidas',
+    'Faltas Sofridas', 'Cartões', 'Defesas', 'Desarmes',
+    'Handicap', 'Tiro de Linha', 'Impedimentos', 'Desempenho', 'Outros'
+]
+TORNEIOS_FORMULARIO = [
+    'Brasileirão A', 'Champions League', 'Europa League', 'Conference League',
+    'Premier League', 'La Liga', 'Bundesliga', 'Serie A', 'Ligue 1', 'Mundial de Clubes',
+    'Copa do Brasil', 'Serie B', 'Brasileirão B', 'Championship',
+    'Pro Saudi League', 'Torneo Betano', 'Libertadores', 'Sul-Americana',
+    'FA Cup', 'Liga Portugal', 'Super Lig', 'Estaduais', 'Data Fifa', 'Outros'
+]
+
+
+# Um único INSERT com todas as casas; as que já existem (e seus saldos) ficam como estão
+def _semear_casas(cur):
+    execute_values(cur, """
+        INSERT INTO saldo_casas (casa_nome, ultima_atualizacao)
+        VALUES %s
+        ON CONFLICT (casa_nome) DO NOTHING
+    """, [(casa,) for casa in CASAS_INICIAIS], template="(%s, CURRENT_TIMESTAMP)")
+
+
+# Casas com id inteiro: apostas, saldos e histórico passam a apontar para casas.id,
+# então renomear uma casa altera uma única linha
+DDL_CASAS = [
+    """
+    CREATE TABLE IF NOT EXISTS casas (
+        id SERIAL PRIMARY KEY,
+        nome TEXT UNIQUE NOT NULL,
+        atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    INSERT INTO casas (nome)
+    SELECT nome FROM (
+        SELECT casa_nome FROM saldo_casas
+        UNION SELECT casa_nome FROM historico_saldos
+        UNION SELECT casa_de_apostas FROM apostas
+    ) AS t(nome)
+    WHERE btrim(nome) <> ''
+    ORDER BY nome
+    ON CONFLICT (nome) DO NOTHING
+    """,
+    # id da casa pelo nome, criando a casa se ainda não existir (gravações com nome novo)
+    """
+    CREATE OR REPLACE FUNCTION id_casa(p_nome TEXT) RETURNS INTEGER AS $$
+    DECLARE
+        v_id INTEGER;
+    BEGIN
+        IF p_nome IS NULL OR btrim(p_nome) = '' THEN
+            RETURN NULL;
+        END IF;
+        SELECT id INTO v_id FROM casas WHERE nome = p_nome;
+        IF NOT FOUND THEN
+            INSERT INTO casas (nome) VALUES (p_nome)
+            ON CONFLICT (nome) DO UPDATE SET nome = EXCLUDED.nome
+            RETURNING id INTO v_id;
+        END IF;
+        RETURN v_id;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "ALTER TABLE apostas ADD COLUMN IF NOT EXISTS casa_id INTEGER REFERENCES casas(id)",
+    "ALTER TABLE saldo_casas ADD COLUMN IF NOT EXISTS casa_id INTEGER REFERENCES casas(id)",
+    "ALTER TABLE historico_saldos ADD COLUMN IF NOT EXISTS casa_id INTEGER REFERENCES casas(id)",
+    # O trigger de atualizado_em lê casa_de_apostas; sai antes da coluna e volta com casa_id
+    "DROP TRIGGER IF EXISTS trg_apostas_atualizado_em ON apostas",
+    "UPDATE apostas a SET casa_id = c.id FROM casas c WHERE c.nome = a.casa_de_apostas",
+    "UPDATE saldo_casas s SET casa_id = c.id FROM casas c WHERE c.nome = s.casa_nome",
+    "UPDATE historico_saldos h SET casa_id = c.id FROM casas c WHERE c.nome = h.casa_nome",
+    "DELETE FROM saldo_casas WHERE casa_id IS NULL",
+    "ALTER TABLE saldo_casas ALTER COLUMN casa_id SET NOT NULL",
+    "ALTER TABLE saldo_casas ADD CONSTRAINT saldo_casas_casa_id_key UNIQUE (casa_id)",
+    # Os índices da migração 5 sobre os nomes caem junto com as colunas
+    "ALTER TABLE apostas DROP COLUMN casa_de_apostas",
+    "ALTER TABLE saldo_casas DROP COLUMN casa_nome",
+    "ALTER TABLE historico_saldos DROP COLUMN casa_nome",
+    "CREATE INDEX IF NOT EXISTS idx_apostas_casa_id ON apostas (casa_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_historico_casa_data ON historico_saldos (casa_id, data)",
+    # Trigger de atualizado_em de volta, agora com casa_id
+    """
+    CREATE TRIGGER trg_apostas_atualizado_em
+    BEFORE UPDATE ON apostas
+    FOR EACH ROW
+    WHEN (ROW(OLD.data, OLD.tipo_aposta, OLD.valor_apostado, OLD.odd, OLD.valor_final, OLD.torneio,
+              OLD.resultado, OLD.casa_id, OLD.categoria, OLD.partida, OLD.bonus, OLD.detalhes)
+          IS DISTINCT FROM
+          ROW(NEW.data, NEW.tipo_aposta, NEW.valor_apostado, NEW.odd, NEW.valor_final, NEW.torneio,
+              NEW.resultado, NEW.casa_id, NEW.categoria, NEW.partida, NEW.bonus, NEW.detalhes))
+    EXECUTE FUNCTION marcar_atualizacao_aposta()
+    """,
+    # liquidar_aposta() passa a ler e gravar casa_id
+    *DDL_LIQUIDACAO_V7,
+]
+
+
+# Listas do formulário passam a viver no banco (lidas por referencias.py)
+def _semear_referencias(cur):
+    for tabela, nomes in (("casas", CASAS_FORMULARIO), ("categorias", CATEGORIAS_FORMULARIO),
+                          ("torneios", TORNEIOS_FORMULARIO)):
+        execute_values(cur, f"""
+            INSERT INTO {tabela} (nome) VALUES %s
+            ON CONFLICT (nome) DO NOTHING
+        """, [(nome,) for nome in nomes])
+
+
+# Triggers por comando (não por linha) avisam o ouvinte de notificacoes.py (canal
+# notificacoes.CANAL); o
+# Postgres entrega no commit e junta avisos repetidos da mesma transação
+TABELAS_NOTIFICADAS = ['apostas', 'saldo_casas', 'historico_saldos', 'casas']
+DDL_NOTIFICACOES = [
+    """
+    CREATE OR REPLACE FUNCTION notificar_alteracao() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('dados_alterados', TG_TABLE_NAME);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+for _tabela in TABELAS_NOTIFICADAS:
+    DDL_NOTIFICACOES += [
+        f"DROP TRIGGER IF EXISTS trg_{_tabela}_notificar ON {_tabela}",
+        f"""
+        CREATE TRIGGER trg_{_tabela}_notificar
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {_tabela}
+        FOR EACH STATEMENT EXECUTE FUNCTION notificar_alteracao()
+        """,
+    ]
+
+
+def _executar(ddls):
+    def aplicar(cur):
+        for ddl in ddls:
+            cur.execute(ddl)
+    return aplicar
+
+
+# (versão, descrição, função que recebe o cursor). Nunca alterar uma migração já
+# publicada: mudanças novas entram como uma versão nova no fim da lista.
+MIGRACOES = [
+    (1, "Tabelas base: apostas, saldo_casas, historico_saldos, metas", _executar(DDL_BASE)),
+    (2, "Rastreamento de alterações em apostas (atualizado_em)",
+     _executar(DDL_RASTREAMENTO_V2)),
+    (3, "Schema tipado e normalizado de apostas", aplicar_schema),
+    (4, "Função de liquidação liquidar_aposta()", _executar(DDL_LIQUIDACAO_V4)),
+    (5, "Índices das consultas de apostas e histórico de saldos", _executar(DDL_INDICES)),
+    (6, "Casas de apostas iniciais", _semear_casas),
+    (7, "Tabela casas e casa_id em apostas, saldo_casas e historico_saldos", _executar(DDL_CASAS)),
+    (8, "Casas, categorias e torneios do formulário de apostas", _semear_referencias),
+    (9, "Notificações de alteração (LISTEN/NOTIFY)", _executar(DDL_NOTIFICACOES)),
+    (10, "Livro de movimentos dos saldos (movimentos_saldo) e saldo_em()",
+     _executar([*DDL_LIVRO, *DDL_LIQUIDACAO_V10])),
+    (11, "Resumo diário dos saldos por casa (saldo_diario)", _executar(DDL_SALDO_DIARIO)),
+    (12, "liquidar_aposta() grava a odd no formato do Python", _executar(DDL_LIQUIDACAO_V12)),
+    (13, "Liquidação em lote no banco (liquidar_apostas())", _executar(DDL_LIQUIDACAO_V13)),
+]
+VERSAO_SCHEMA = MIGRACOES[-1][0]
+
+# Chave do advisory lock: duas execuções simultâneas não aplicam a mesma migração
+CHAVE_LOCK = 7_340_117
+
+
+def _criar_controle(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def versao_schema():
+    if not consultar_um("SELECT to_regclass('schema_version') IS NOT NULL")[0]:
+        return 0
+    return consultar_um("SELECT COALESCE(MAX(versao), 0) FROM schema_version")[0]
+
+
+# Aplica as migrações pendentes, cada uma em sua transação. Depois completa o
+# backfill do schema tipado (migração 3), que em banco novo termina na hora e
+# libera os filtros em SQL; migracao_apostas.py roda o seu com lote/pausa próprios
+def aplicar_migracoes(log=print, backfill_tipado=True):
+    aplicadas = 0
+    for versao, descricao, aplicar in MIGRACOES:
+        with cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (CHAVE_LOCK,))
+            _criar_controle(cur)
+            cur.execute("SELECT 1 FROM schema_version WHERE versao = %s", (versao,))
+            if cur.fetchone():
+                continue
+            aplicar(cur)
+            cur.execute(
+                "INSERT INTO schema_version (versao, descricao) VALUES (%s, %s)",
+                (versao, descricao)
+            )
+        aplicadas += 1
+        log(f"Migração {versao} aplicada: {descricao}")
+    if not aplicadas:
+        log(f"Schema já está na versão {VERSAO_SCHEMA}.")
+    if backfill_tipado and backfill_pendente():
+        backfill(log=log)
+    return aplicadas
+
+
+class SchemaDesatualizado(Exception):
+    pass
+
+
+# Só o resultado positivo fica em cache: depois de migrar, a próxima execução já enxerga
+@st.cache_resource(show_spinner=False)
+def _confirmar_schema():
+    versao = versao_schema()
+    if versao < VERSAO_SCHEMA:
+        raise SchemaDesatualizado(
+            f"Banco na versão {versao} do schema; esta versão do app precisa da {VERSAO_SCHEMA}. "
+            "Rode `python migracoes.py`."
+        )
+    return versao
+
+
+# Checagem das páginas: nenhuma DDL roda durante uma requisição
+def schema_em_dia():
+    try:
+        _confirmar_schema()
+        return True
+    except SchemaDesatualizado as e:
+        st.error(str(e))
+    except Exception as e:
+        st.error(f"Erro de conexão: {e}")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica as migrações pendentes do banco de apostas.")
+    parser.add_argument("--status", action="store_true", help="Só mostra as versões aplicadas")
+    args = parser.parse_args()
+
+    if args.status:
+        atual = versao_schema()
+        print(f"Versão do schema: {atual} (app espera {VERSAO_SCHEMA})")
+        if atual:
+            for versao, descricao, aplicada_em in consultar(
+                "SELECT versao, descricao, aplicada_em FROM schema_version ORDER BY versao"
+            ):
+                print(f"  {versao:>3}  {aplicada_em:%Y-%m-%d %H:%M}  {descricao}")
+        return
+
+    aplicar_migracoes()
+
+
+if __name__ == "__main__":
+    main()
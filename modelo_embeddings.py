@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+import time
+
+NOME_MODELO = os.getenv("EMBEDDINGS_MODELO", "sentence-transformers/all-MiniLM-L6-v2")
+
+logger = logging.getLogger(__name__)
+
+# Estado do modelo, único por processo do servidor (módulos importados não são
+# reexecutados a cada rerun do Streamlit)
+_lock = threading.Lock()
+_pronto = threading.Event()
+_thread = None
+_modelo = None
+_erro = None
+_tempos = {}
+
+
+def _carregar():
+    global _modelo, _erro
+    try:
+        inicio = time.perf_counter()
+        # Imports pesados (torch/transformers) ficam fora da thread da página
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        torch.classes.__path__ = []
+        modelo = HuggingFaceEmbeddings(model_name=NOME_MODELO)
+        _tempos["carga_fria_s"] = time.perf_counter() - inicio
+
+        # A primeira inferência ainda paga inicializações preguiçosas; a segunda já é "quente"
+        inicio = time.perf_counter()
+        modelo.embed_query("aquecimento do modelo de apostas")
+        _tempos["primeira_inferencia_s"] = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        modelo.embed_query("aquecimento do modelo de apostas")
+        _tempos["inferencia_quente_s"] = time.perf_counter() - inicio
+
+        # O índice (faiss, langchain_community) também é importado aqui, e não na página
+        inicio = time.perf_counter()
+        import indice_apostas  # noqa: F401
+        _tempos["import_indice_s"] = time.perf_counter() - inicio
+
+        _modelo = modelo
+        logger.info(
+            "Modelo %s pronto: carga %.1fs, 1ª inferência %.0fms, quente %.0fms",
+            NOME_MODELO, _tempos['carga_fria_s'], _tempos['primeira_inferencia_s'] * 1000,
+            _tempos['inferencia_quente_s'] * 1000
+        )
+    except Exception as e:
+        _erro = e
+        logger.exception("Falha ao carregar o modelo %s", NOME_MODELO)
+    finally:
+        _pronto.set()
+
+
+# Dispara o carregamento em segundo plano (só a primeira chamada no processo tem efeito)
+def iniciar_aquecimento():
+    global _thread
+    with _lock:
+        if _thread is None:
+            _tempos["inicio_aquecimento"] = time.time()
+            _thread = threading.Thread(target=_carregar, name="aquecimento-embeddings", daemon=True)
+            _thread.start()
+
+
+# Retorna o modelo, esperando o aquecimento terminar se preciso
+def obter_modelo(timeout=None):
+    iniciar_aquecimento()
+    inicio = time.perf_counter()
+    if not _pronto.wait(timeout):
+        return None
+    if _erro is not None:
+        raise RuntimeError(f"Modelo de embeddings indisponível: {_erro}")
+    espera = time.perf_counter() - inicio
+    # Espera > 0 relevante = pedido chegou com o modelo ainda frio
+    chave = "esperas_frias" if espera > 0.05 else "esperas_quentes"
+    with _lock:
+        _tempos[chave] = _tempos.get(chave, 0) + 1
+        if espera > 0.05:
+            _tempos["maior_espera_s"] = max(_tempos.get("maior_espera_s", 0.0), espera)
+    return _modelo
+
+
+def status_modelo():
+    if not _pronto.is_set():
+        estado = "carregando" if _thread is not None else "parado"
+    else:
+        estado = "erro" if _erro is not None else "pronto"
+    return {"estado": estado, "modelo": NOME_MODELO, "erro": str(_erro) if _erro else None, **_tempos}
@@ -0,0 +1,127 @@
+import logging
+import os
+import select
+import threading
+import time
+
+import psycopg2
+import streamlit as st
+
+# Canal dos triggers criados pela migração 9 (payload: nome da tabela alterada)
+CANAL = "dados_alterados"
+# NOTIFICACOES=0 desliga o ouvinte; as versões voltam a ser consultadas no banco
+ATIVO = os.getenv("NOTIFICACOES", "1") != "0"
+# De quanto em quanto tempo (s) as páginas comparam a versão em memória
+INTERVALO_VERIFICACAO = float(os.getenv("NOTIFICACOES_INTERVALO", "5"))
+# Sem o ouvinte (caído ou desligado), as páginas consultam a versão no banco a cada
+# tantas verificações (com o intervalo padrão, uma vez por minuto)
+VERIFICACOES_SEM_OUVINTE = 12
+ESPERA_RECONEXAO = 5
+KEEPALIVE = 60
+
+logger = logging.getLogger(__name__)
+
+
+# Thread única por processo com uma conexão própria (fora do pool) em LISTEN.
+# Cada notificação incrementa a versão; as sessões só comparam números em memória.
+class OuvinteAlteracoes:
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.versao = 0
+        self.por_tabela = {}
+        self.conectado = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._executar, name="ouvinte-alteracoes", daemon=True)
+        self._thread.start()
+
+    def _incrementar(self, tabela=None):
+        with self._lock:
+            self.versao += 1
+            if tabela:
+                self.por_tabela[tabela] = self.por_tabela.get(tabela, 0) + 1
+
+    def _executar(self):
+        while True:
+            try:
+                self._ouvir()
+            except Exception as e:
+                logger.warning("Ouvinte de alterações desconectado, nova tentativa em %ss: %s",
+                               ESPERA_RECONEXAO, e)
+            self.conectado = False
+            time.sleep(ESPERA_RECONEXAO)
+
+    def _ouvir(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CANAL}")
+            # Alterações feitas enquanto estava desconectado não chegaram: conta como uma
+            self._incrementar()
+            self.conectado = True
+            while True:
+                if select.select([conn], [], [], KEEPALIVE) == ([], [], []):
+                    # Sem tráfego: confirma que a conexão continua viva
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                conn.poll()
+                while conn.notifies:
+                    self._incrementar(conn.notifies.pop(0).payload)
+        finally:
+            self.conectado = False
+            conn.close()
+
+
+@st.cache_resource(show_spinner=False)
+def ouvinte():
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("Variável de ambiente DATABASE_URL não definida")
+    return OuvinteAlteracoes(database_url)
+
+
+# Versão em memória dos dados; None quando o ouvinte não está conectado
+# (quem usa deve então consultar o banco, como antes)
+def versao_notificada():
+    if not ATIVO:
+        return None
+    try:
+        atual = ouvinte()
+    except Exception:
+        return None
+    return atual.versao if atual.conectado else None
+
+
+# Versão vista pela página: a notificada ou, sem o ouvinte, a consultada no banco
+def _versao_atual():
+    versao = versao_notificada()
+    if versao is not None:
+        return versao
+    # Import aqui: dados_apostas depende deste módulo
+    from dados_apostas import versao_dados
+    return versao_dados()
+
+
+@st.fragment(run_every=INTERVALO_VERIFICACAO)
+def _verificar_alteracoes():
+    versao = versao_notificada()
+    if versao is None:
+        # Sem o ouvinte, só de tempos em tempos, para não consultar o banco a cada verificação
+        sem_ouvinte = st.session_state.get('verificacoes_sem_ouvinte', 0) + 1
+        st.session_state['verificacoes_sem_ouvinte'] = sem_ouvinte
+        if sem_ouvinte < VERIFICACOES_SEM_OUVINTE:
+            return
+        versao = _versao_atual()
+    st.session_state['verificacoes_sem_ouvinte'] = 0
+    if versao != st.session_state.get('versao_vista'):
+        st.session_state['versao_vista'] = versao
+        st.rerun()
+
+
+# Reexecuta a página quando os dados mudam em outra sessão ou página. A checagem
+# periódica roda só o fragmento e não consulta o banco (exceto sem o ouvinte, a
+# cada VERIFICACOES_SEM_OUVINTE verificações).
+def acompanhar_alteracoes():
+    st.session_state['versao_vista'] = _versao_atual()
+    st.session_state['verificacoes_sem_ouvinte'] = 0
+    _verificar_alteracoes()
@@ -1,53 +1,49 @@
 from dotenv import load_dotenv
 import os
-import psycopg2
+import json
+import logging
 import requests
 import streamlit as st
 import time
-import torch
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.runnables import RunnablePassthrough
+from roteador_perguntas import rotear_pergunta
+from filtro_busca import K_BUSCA, K_FILTRADO, descrever_restricoes, restricoes_da_pergunta
+from contexto_prompt import ORCAMENTO_TOKENS, construir_contexto, estimar_tokens, historico_da_pergunta
+from cache_respostas import cache_respostas
+from dados_apostas import versao_dados
+from db import init_db
+from migracoes import schema_em_dia
+from modelo_embeddings import iniciar_aquecimento, obter_modelo, status_modelo
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
 # Credenciais e configurações
-DATABASE_URL = os.getenv("DATABASE_URL")
 DEEPSEEK_API = os.getenv("DEEPSEEK_API")
 API_URL = os.getenv("API_URL")
+# Streaming (SSE) por padrão; AGENTE_STREAMING=0 volta para a chamada bloqueante
+STREAMING = os.getenv("AGENTE_STREAMING", "1") != "0"
+TIMEOUT_CONEXAO = float(os.getenv("AGENTE_TIMEOUT_CONEXAO", "10"))
+TIMEOUT_LEITURA = float(os.getenv("AGENTE_TIMEOUT_LEITURA", "60"))
+TIMEOUT_TOTAL = float(os.getenv("AGENTE_TIMEOUT_TOTAL", "180"))
+
+logger = logging.getLogger(__name__)
 
 st.set_page_config(page_title="Agente de IA para Apostas", layout="wide")
-torch.classes.__path__ = []
-# Função para carregar dados do Supabase
-def load_data():
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM apostas")
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        docs = []
-        for row in rows:
-            content = ", ".join([f"{columns[i]}: {row[i]}" for i in range(len(columns))])
-            docs.append(Document(page_content=content, metadata={"id": row[0]}))
-        cursor.close()
-        conn.close()
-        return docs
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
-        return []
 
-# Carrega documentos e cria o vectorstore
-documents = load_data()
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-vectorstore = FAISS.from_documents(documents, embeddings)
-retriever = vectorstore.as_retriever(search_kwargs={"k": 150})
+# Modelo de embeddings carregado uma vez por processo, em segundo plano
+iniciar_aquecimento()
 
-# Função para chamar a API do DeepSeek
-def call_deepseek_api(messages):
+if not init_db() or not schema_em_dia():
+    st.stop()
+
+# Endpoint sem suporte a streaming (ou que recusou o pedido): usar a chamada bloqueante
+class StreamingIndisponivel(Exception):
+    pass
+
+
+def _requisicao_deepseek(messages, stream):
     headers = {
         "Authorization": f"Token {DEEPSEEK_API}",  # Alterado para "Token" em vez de "Bearer"
         "Content-Type": "application/json"
@@ -58,8 +54,17 @@ def call_deepseek_api(messages):
         "temperature": 0.7,
         "max_tokens": 1000
     }
+    if stream:
+        payload["stream"] = True
+        headers["Accept"] = "text/event-stream"
+    return requests.post(API_URL, json=payload, headers=headers, stream=stream,
+                         timeout=(TIMEOUT_CONEXAO, TIMEOUT_LEITURA))
+
+
+# Função para chamar a API do DeepSeek
+def call_deepseek_api(messages):
     try:
-        response = requests.post(API_URL, json=payload, headers=headers)
+        response = _requisicao_deepseek(messages, stream=False)
         if response.status_code == 200:
             return response.json()["choices"][0]["message"]["content"]
         return f"Erro na API: {response.text}"
@@ -67,9 +72,58 @@ def call_deepseek_api(messages):
         return f"Erro na conexão: {str(e)}"
 
 
+# Versão em streaming: abre a conexão já aqui (para o fallback poder agir antes de
+# qualquer texto) e devolve um gerador com os pedaços conforme chegam (SSE compatível
+# com OpenAI). Fechar o gerador (ex.: rerun ao clicar em "Parar") encerra a conexão.
+def stream_deepseek_api(messages):
+    try:
+        response = _requisicao_deepseek(messages, stream=True)
+    except requests.RequestException as e:
+        raise StreamingIndisponivel(str(e)) from e
+    if response.status_code != 200:
+        response.close()
+        raise StreamingIndisponivel(f"status {response.status_code}")
+    if "text/event-stream" not in response.headers.get("Content-Type", ""):
+        # Endpoint ignorou o stream e mandou a resposta inteira: aproveita em vez de repetir a chamada
+        try:
+            return iter([response.json()["choices"][0]["message"]["content"]])
+        except (ValueError, KeyError, IndexError) as e:
+            raise StreamingIndisponivel(str(e)) from e
+        finally:
+            response.close()
+    return _ler_stream(response)
+
+
+def _ler_stream(response):
+    inicio = time.monotonic()
+    try:
+        for linha in response.iter_lines(decode_unicode=True):
+            if time.monotonic() - inicio > TIMEOUT_TOTAL:
+                yield "\n\n*(resposta interrompida: tempo limite atingido)*"
+                return
+            if not linha or not linha.startswith("data:"):
+                continue
+            dados = linha[len("data:"):].strip()
+            if dados == "[DONE]":
+                return
+            try:
+                evento = json.loads(dados)
+            except ValueError:
+                continue
+            escolhas = evento.get("choices") or [{}]
+            pedaco = (escolhas[0].get("delta") or {}).get("content")
+            if pedaco:
+                yield pedaco
+    except requests.RequestException as e:
+        yield f"\n\n*(resposta interrompida: {e})*"
+    finally:
+        response.close()
+
+
 # Template do prompt do sistema
 system_prompt = """
-Você é um especialista em apostas de futebol. Use estas informações:
+Você é um especialista em apostas de futebol. Use estas apostas (uma por linha,
+colunas separadas por tabulação, em ordem de relevância):
 {context}
 
 Histórico da conversa:
@@ -78,6 +132,21 @@ Histórico da conversa:
 Responda de forma precisa e detalhada à pergunta atual:
 """
 
+# Template para perguntas agregadas: os números já vêm calculados pelo banco
+system_prompt_agregado = """
+Você é um especialista em apostas de futebol. A pergunta foi respondida por uma
+consulta agregada ao banco de apostas ({descricao}).
+Lucro é a soma de valor_final das apostas liquidadas; roi_pct = lucro / valor apostado
+nas liquidadas; taxa_acerto_pct = ganhas / liquidadas. Use exatamente estes números,
+sem refazer as contas:
+{tabela}
+
+Histórico da conversa:
+{history}
+
+Responda de forma precisa e objetiva à pergunta atual:
+"""
+
 # Inicializa o histórico de mensagens
 if "messages" not in st.session_state:
     st.session_state.messages = [{
@@ -87,6 +156,25 @@ if "messages" not in st.session_state:
 
 st.title("Agente de IA para Apostas")
 
+# Indicador de prontidão do modelo de embeddings
+status = status_modelo()
+with st.sidebar:
+    if status["estado"] == "pronto":
+        st.success("Modelo de embeddings pronto")
+    elif status["estado"] == "erro":
+        st.error(f"Modelo de embeddings indisponível: {status['erro']}")
+    else:
+        st.info("Carregando modelo de embeddings em segundo plano...")
+    with st.expander("Tempos do modelo"):
+        if "carga_fria_s" in status:
+            st.write(f"Carga a frio: {status['carga_fria_s']:.1f} s")
+            st.write(f"Primeira inferência: {status['primeira_inferencia_s'] * 1000:.0f} ms")
+            st.write(f"Inferência a quente: {status['inferencia_quente_s'] * 1000:.0f} ms")
+        st.write(f"Perguntas com modelo já quente: {status.get('esperas_quentes', 0)}")
+        st.write(f"Perguntas que esperaram o modelo: {status.get('esperas_frias', 0)}")
+        if "maior_espera_s" in status:
+            st.write(f"Maior espera: {status['maior_espera_s']:.1f} s")
+
 # Exibe o histórico do chat
 for msg in st.session_state.messages:
     st.chat_message(msg["role"]).write(msg["content"])
@@ -94,12 +182,63 @@ for msg in st.session_state.messages:
 # Input da pergunta
 question = st.chat_input("Faça uma pergunta sobre suas apostas:")
 if question:
-    # Busca documentos relevantes
-    context_docs = retriever.invoke(question)  # Se invoke() não funcionar, use get_relevant_documents(question)
-    context = "\n".join([f"Aposta ID {doc.metadata['id']}: {doc.page_content}" for doc in context_docs])
-    history = "\n".join([f"{m['role'].capitalize()}: {m['content']}" for m in st.session_state.messages[:-1]])
-    full_prompt = system_prompt.format(context=context, history=history) + f"\n\nPergunta atual: {question}"
+    # Histórico com orçamento próprio: turnos recentes inteiros, anteriores resumidos
+    history = historico_da_pergunta(st.session_state.messages, question)
+
+    # Perguntas agregadas (lucro, ROI, acerto, contagem...) vão direto para o SQL
+    try:
+        agregado = rotear_pergunta(question)
+    except Exception as e:
+        st.error(f"Erro na consulta agregada: {e}")
+        agregado = None
+
+    info_contexto = None
+    if agregado is not None:
+        tabela = agregado["tabela"].to_string(index=False) if not agregado["tabela"].empty else "(nenhuma aposta encontrada)"
+        context = agregado["descricao"] + "\n" + tabela
+        full_prompt = system_prompt_agregado.format(
+            descricao=agregado["descricao"], tabela=tabela, history=history
+        ) + f"\n\nPergunta atual: {question}"
+    else:
+        # Atualiza o índice só com as apostas novas/alteradas e busca os documentos relevantes;
+        # casa, torneio ou período citados restringem a busca às apostas que batem
+        restricoes = None
+        try:
+            with st.spinner("Aguardando o modelo de embeddings..."):
+                embeddings = obter_modelo()
+            # faiss/langchain já foram importados pelo aquecimento (modelo_embeddings.py)
+            from indice_apostas import indice_apostas
+            indice = indice_apostas(embeddings)
+            indice.sincronizar()
+            restricoes, ids_permitidos = restricoes_da_pergunta(question)
+            if restricoes is None:
+                context_docs = indice.buscar(question, K_BUSCA)
+            else:
+                context_docs = indice.buscar(question, K_FILTRADO, ids_permitidos)
+        except Exception as e:
+            st.error(f"Erro ao carregar dados: {e}")
+            context_docs = []
+        # O que sobra do orçamento depois do template, histórico e pergunta vai para as apostas
+        orcamento_contexto = ORCAMENTO_TOKENS - estimar_tokens(system_prompt + history + question * 2)
+        context, incluidas, descartadas = construir_contexto(context_docs, max(orcamento_contexto, 0))
+        full_prompt = system_prompt.format(context=context, history=history) + f"\n\nPergunta atual: {question}"
+        info_contexto = (
+            f"Contexto: {incluidas} apostas (~{estimar_tokens(full_prompt)} tokens)"
+            + (f", {descartadas} menos relevantes descartadas pelo orçamento" if descartadas else "")
+            + (f" — busca restrita a {descrever_restricoes(restricoes)} ({len(ids_permitidos)} apostas)"
+               if restricoes is not None else "")
+        )
     
+    # Mesma pergunta, mesmo contexto e mesma versão dos dados: reaproveita a resposta
+    try:
+        versao = versao_dados()
+        cache = cache_respostas()
+        chave_cache = cache.chave(question, context, versao)
+        em_cache = cache.obter(chave_cache, versao)
+    except Exception as e:
+        logger.warning("Cache de respostas indisponível: %s", e)
+        cache = em_cache = None
+
     # Monta as mensagens para a API
     messages = [
         {"role": "system", "content": full_prompt},
@@ -109,6 +248,47 @@ if question:
     # Adiciona a pergunta ao histórico e chama a API
     st.session_state.messages.append({"role": "user", "content": question})
     st.chat_message("user").write(question)
-    response = call_deepseek_api(messages)
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.chat_message("assistant").write(response)
+    # A mensagem entra no histórico antes do streaming: se for cancelada, o texto parcial fica
+    resposta = {"role": "assistant", "content": ""}
+    st.session_state.messages.append(resposta)
+    with st.chat_message("assistant"):
+        response = None
+        inicio = time.perf_counter()
+        if em_cache is not None:
+            response, latencia_original = em_cache
+            st.write(response)
+            st.caption(f"⚡ Cache: hit — economizou ~{latencia_original:.1f} s")
+        elif STREAMING:
+            try:
+                pedacos = stream_deepseek_api(messages)
+            except StreamingIndisponivel:
+                pedacos = None
+            if pedacos is not None:
+                # Clicar em "Parar" dispara um rerun, que interrompe a escrita e fecha a conexão
+                st.button("⏹️ Parar resposta", key="parar_resposta")
+
+                def acumular():
+                    for pedaco in pedacos:
+                        resposta["content"] += pedaco
+                        yield pedaco
+
+                response = st.write_stream(acumular())
+        if response is None:
+            with st.spinner("Gerando resposta..."):
+                response = call_deepseek_api(messages)
+            st.write(response)
+        resposta["content"] = response if isinstance(response, str) else resposta["content"]
+
+        if em_cache is None and cache is not None:
+            latencia = time.perf_counter() - inicio
+            st.caption(f"Cache: miss — resposta gerada em {latencia:.1f} s")
+            # Erros e respostas cortadas não são guardados
+            if resposta["content"] and not resposta["content"].startswith(("Erro na API", "Erro na conexão")) \
+                    and "*(resposta interrompida" not in resposta["content"]:
+                cache.guardar(chave_cache, versao, resposta["content"], latencia)
+        if info_contexto:
+            st.caption(info_contexto)
+        if agregado is not None:
+            with st.expander("Consulta agregada usada na resposta"):
+                st.caption(agregado["descricao"])
+                st.dataframe(agregado["tabela"], hide_index=True)
@@ -1,9 +1,12 @@
 import streamlit as st
-import psycopg2
+import pandas as pd
 from datetime import datetime
 import time
 from dotenv import load_dotenv
-import os
+from db import init_db, cursor, consultar, consultar_um
+from liquidacao_apostas import liquidar_aposta, liquidar_em_lote, pernas_da_odd, pernas_escolhidas
+from livro_saldos import origem_movimento
+from migracoes import schema_em_dia
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -179,44 +182,26 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Função para conectar ao PostgreSQL utilizando o DATABASE_URL
-@st.cache_resource
-def init_db():
-    try:
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            st.error("Variável de ambiente DATABASE_URL não definida")
-            return None
-        conn = psycopg2.connect(database_url)
-        return conn
-    except Exception as e:
-        st.error(f"Erro de conexão: {e}")
-        return None
-
-# Função para atualizar o saldo da casa de apostas
-def atualizar_saldo_casa(casa_de_aposta, valor):
-    try:
-        conn = init_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE saldo_casas
-            SET saldo = saldo + %s
-            WHERE casa_nome = %s
-        """, (valor, casa_de_aposta))
-        conn.commit()
-    except Exception as e:
-        st.error(f"Erro ao atualizar saldo da casa: {e}")
-        conn.rollback()
+# Função para atualizar o saldo da casa de apostas (na transação do chamador)
+def atualizar_saldo_casa(cur, casa_id, valor, operacao="Reembolso", observacao=None):
+    origem_movimento(cur, operacao, observacao)
+    cur.execute("""
+        UPDATE saldo_casas
+        SET saldo = saldo + %s
+        WHERE casa_id = %s
+    """, (valor, casa_id))
 
 # Inicializa o banco de dados
-conn = init_db()
-if not conn:
+if not init_db() or not schema_em_dia():
     st.stop()
-cursor = conn.cursor()
 
 # Título principal com estilo aprimorado
 st.markdown('<h1 class="main-title">📊 Atualização de Resultados de Apostas</h1>', unsafe_allow_html=True)
 
+# Resultado da última liquidação em lote (exibido depois do rerun)
+if "mensagem_lote" in st.session_state:
+    st.success(st.session_state.pop("mensagem_lote"))
+
 # =============================================
 # Seção de Resumo Estilizado
 # =============================================
@@ -224,14 +209,13 @@ with st.container():
     st.markdown('<div class="resumo-box">', unsafe_allow_html=True)
     
     # Consulta o total de apostas pendentes
-    cursor.execute("""
+    resumo = consultar_um("""
         SELECT 
             SUM(valor_apostado) as total,
             COUNT(*) as quantidade
         FROM apostas 
         WHERE resultado = 'Pendente'
     """)
-    resumo = cursor.fetchone()
     total = resumo[0] or 0.0
     quantidade = resumo[1] or 0
 
@@ -262,13 +246,14 @@ with st.container():
 # =============================================
 # Listagem e Atualização de Apostas
 # =============================================
-cursor.execute("""
-    SELECT id, data, tipo_aposta, valor_apostado, odd, torneio, partida, detalhes, casa_de_apostas, bonus
-    FROM apostas
-    WHERE resultado = 'Pendente'
-    ORDER BY data DESC
+apostas_pendentes = consultar("""
+    SELECT a.id, a.data, a.tipo_aposta, a.valor_apostado, a.odd, a.torneio, a.partida, a.detalhes,
+           c.nome, a.bonus, a.casa_id
+    FROM apostas a
+    LEFT JOIN casas c ON c.id = a.casa_id
+    WHERE a.resultado = 'Pendente'
+    ORDER BY a.data DESC
 """)
-apostas_pendentes = cursor.fetchall()
 
 if not apostas_pendentes:
     st.markdown("""
@@ -328,12 +313,7 @@ else:
                 bonus_class = 'bonus-active' if aposta[9] == 1 else 'bonus-inactive'
                 st.markdown(f"**🎁 Bônus:** <span class='{bonus_class}'>{bonus_status}</span>", unsafe_allow_html=True)
             with col3:
-                odd_str = str(aposta[4])
-                if "|" in odd_str:
-                    odds_partes = odd_str.split("|")
-                    odds_list = [o.strip() for o in odds_partes[0].split(",")]
-                else:
-                    odds_list = [o.strip() for o in odd_str.split(",")]
+                odds_list = pernas_da_odd(aposta[4])
                 
                 st.markdown("**📈 Odds:**")
                 for odd in odds_list:
@@ -367,14 +347,8 @@ else:
     
     # Processamento das odds
     aposta = apostas_mapping[aposta_selecionada]
-    odd_str = str(aposta[4])
     bonus_flag = aposta[9] == 1
-
-    if "|" in odd_str:
-        odds_partes = odd_str.split("|")
-        odds_list = [o.strip() for o in odds_partes[0].split(",")]
-    else:
-        odds_list = [o.strip() for o in odd_str.split(",")]
+    odds_list = pernas_da_odd(aposta[4])
 
     with col2:
         # Seleção de odds válidas
@@ -468,24 +442,12 @@ else:
             try:
                 aposta_id = apostas_mapping[aposta_selecionada][0]
                 
-                if aposta_encerrada:
-                    valor_final = valor_final_override - valor_apostado
-                else:
-                    valor_final = lucro_liquido if novo_resultado == "Ganhou" else computed_perdeu
-
-                # Atualiza o banco de dados
-                cursor.execute("""
-                    UPDATE apostas
-                    SET resultado = %s, valor_final = %s, odd = %s
-                    WHERE id = %s
-                """, (novo_resultado, valor_final, str(multiplicacao_odds), aposta_id))
-                conn.commit()
-
-                # Atualiza o saldo da casa
-                casa = apostas_mapping[aposta_selecionada][8]
-                if novo_resultado == "Ganhou":
-                    ajuste = valor_apostado + valor_final if not bonus_flag else valor_final
-                    atualizar_saldo_casa(casa, ajuste)
+                # Resultado, saldo da casa e histórico gravados pela função do banco, em uma chamada
+                liquidar_aposta(
+                    aposta_id, novo_resultado, odds_validas,
+                    bonus_percent if bonus_lucro else 0.0,
+                    valor_final_override if aposta_encerrada else None
+                )
 
                 # Mensagem de sucesso animada
                 st.markdown("""
@@ -498,7 +460,6 @@ else:
                 st.rerun()
             except Exception as e:
                 st.error(f"Erro na atualização: {str(e)}")
-                conn.rollback()
 
     # Seção de reembolso
     st.markdown("<div style='margin-top:30px;'></div>", unsafe_allow_html=True)
@@ -515,13 +476,14 @@ else:
             if st.button("🗑️ Excluir Aposta e Reembolsar", key="btn_reembolso", help="Cancela a aposta e devolve o valor apostado à casa"):
                 try:
                     aposta_id = apostas_mapping[aposta_selecionada][0]
-                    casa = apostas_mapping[aposta_selecionada][8]
+                    casa_id = apostas_mapping[aposta_selecionada][10]
                     valor_apostado = apostas_mapping[aposta_selecionada][3]
                     
-                    cursor.execute("DELETE FROM apostas WHERE id = %s", (aposta_id,))
-                    if not bonus_flag:
-                        atualizar_saldo_casa(casa, valor_apostado)
-                    conn.commit()
+                    with cursor() as cur:
+                        cur.execute("DELETE FROM apostas WHERE id = %s", (aposta_id,))
+                        if not bonus_flag:
+                            atualizar_saldo_casa(cur, casa_id, valor_apostado,
+                                                 observacao=f"Aposta #{aposta_id} cancelada")
                     
                     # Mensagem de sucesso animada
                     st.markdown("""
@@ -534,6 +496,74 @@ else:
                     st.rerun()
                 except Exception as e:
                     st.error(f"Erro no reembolso: {str(e)}")
-                    conn.rollback()
     
-    st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    # =============================================
+    # Liquidação em Lote
+    # =============================================
+    with st.expander("📦 Liquidação em Lote", expanded=False):
+        st.caption(
+            "Marque as apostas, escolha o resultado e, se preciso, remova pernas anuladas de "
+            "\"Odds válidas\", informe o bônus sobre o lucro (%) ou o valor do cashout. "
+            "Tudo é gravado em uma única transação."
+        )
+        odds_gravadas = {a[0]: a[4] for a in apostas_pendentes}
+        grade = pd.DataFrame({
+            "Liquidar": False,
+            "ID": [a[0] for a in apostas_pendentes],
+            "Data": [a[1] for a in apostas_pendentes],
+            "Casa": [a[8] for a in apostas_pendentes],
+            "Partida": [a[6] for a in apostas_pendentes],
+            "Valor": [float(a[3]) for a in apostas_pendentes],
+            "Bônus": [a[9] == 1 for a in apostas_pendentes],
+            "Resultado": "Ganhou",
+            "Odds válidas": [", ".join(pernas_da_odd(a[4])) for a in apostas_pendentes],
+            "Bônus lucro (%)": 0.0,
+            "Cashout": None,
+        })
+        grade["Cashout"] = grade["Cashout"].astype(float)
+        editada = st.data_editor(
+            grade,
+            key="grade_lote",
+            hide_index=True,
+            use_container_width=True,
+            disabled=["ID", "Data", "Casa", "Partida", "Valor", "Bônus"],
+            column_config={
+                "Liquidar": st.column_config.CheckboxColumn(),
+                "Valor": st.column_config.NumberColumn(format="R$ %.2f"),
+                "Resultado": st.column_config.SelectboxColumn(options=["Ganhou", "Perdeu"], required=True),
+                "Odds válidas": st.column_config.TextColumn(help="Pernas consideradas no cálculo, separadas por vírgula (só as da aposta)"),
+                "Bônus lucro (%)": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=0.5),
+                "Cashout": st.column_config.NumberColumn(min_value=0.0, format="R$ %.2f"),
+            },
+        )
+
+        selecionadas = editada[editada["Liquidar"]]
+        if st.button(f"✅ Liquidar {len(selecionadas)} apostas", key="btn_lote", type="primary",
+                     disabled=selecionadas.empty):
+            liquidacoes = []
+            erros = []
+            for linha in selecionadas.to_dict("records"):
+                try:
+                    odds_validas = pernas_escolhidas(linha["Odds válidas"], odds_gravadas[int(linha["ID"])])
+                    cashout = linha["Cashout"] if pd.notna(linha["Cashout"]) else None
+                    bonus_lucro_pct = linha["Bônus lucro (%)"] if pd.notna(linha["Bônus lucro (%)"]) else 0.0
+                    liquidacoes.append((int(linha["ID"]), linha["Resultado"], odds_validas,
+                                        float(bonus_lucro_pct), float(cashout) if cashout is not None else None))
+                except ValueError:
+                    erros.append(str(linha["ID"]))
+
+            if erros:
+                st.error(f"Odds válidas vazias ou fora das pernas da aposta: {', '.join(erros)}")
+            else:
+                try:
+                    liquidadas, ignoradas = liquidar_em_lote(liquidacoes)
+                    st.session_state.mensagem_lote = (
+                        f"✅ {liquidadas} apostas liquidadas"
+                        + (f" ({ignoradas} já não estavam pendentes)" if ignoradas else "")
+                    )
+                except Exception as e:
+                    st.error(f"Erro na liquidação em lote: {str(e)}")
+                else:
+                    st.rerun()
@@ -5,9 +5,13 @@ import plotly.graph_objects as go
 from datetime import datetime
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
-import psycopg2
 from dotenv import load_dotenv
-import os
+from db import init_db
+from migracoes import schema_em_dia
+from dados_apostas import (
+    load_apostas_indexadas, load_apostas_filtradas, filtrar_apostas,
+    filtro_sql_disponivel, opcoes_filtros, opcoes_do_frame
+)
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -19,51 +23,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Função para conectar ao PostgreSQL utilizando o DATABASE_URL
-@st.cache_resource
-def init_db():
-    try:
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            st.error("Variável de ambiente DATABASE_URL não definida")
-            return None
-        conn = psycopg2.connect(database_url)
-        return conn
-    except Exception as e:
-        st.error(f"Erro de conexão: {e}")
-        return None
-
 # Inicializa o banco de dados
-conn = init_db()
-if not conn:
+if not init_db() or not schema_em_dia():
     st.stop()
-cursor = conn.cursor()
-
-# Função para carregar os dados de apostas
-def load_data():
-    cursor.execute("""
-        SELECT id, data, tipo_aposta, valor_apostado, odd, valor_final, torneio, resultado, 
-               casa_de_apostas, categoria, partida, bonus, detalhes
-        FROM apostas
-    """)
-    data = cursor.fetchall()
-    columns = ['id', 'data', 'tipo_aposta', 'valor_apostado', 'odd', 'valor_final', 
-               'torneio', 'resultado', 'casa_de_apostas', 'categoria', 'partida', 'bonus', 'detalhes']
-    df = pd.DataFrame(data, columns=columns)
-    
-    # Processamento de dados
-    df['data'] = pd.to_datetime(df['data'], errors='coerce')
-    df['valor_final'] = pd.to_numeric(df['valor_final'], errors='coerce')
-    df['resultado'] = df['resultado'].str.strip().str.title()
-    df['retorno'] = df['valor_final'] / df['valor_apostado'].replace(0, 1)  # Evitar divisão por zero
-    df['odd'] = pd.to_numeric(df['odd'].str.replace(',', ''), errors='coerce')
-    df['categoria'] = df['categoria'].str.split(', ')
-    df['torneio'] = df['torneio'].str.split(', ')
-    
-    return df
 
-# Carregar os dados
-df = load_data()
+# Com o schema tipado, os filtros vão para o SQL; senão, carrega tudo (cache incremental)
+filtro_sql = filtro_sql_disponivel()
+if filtro_sql:
+    opcoes = opcoes_filtros()
+else:
+    df, indices = load_apostas_indexadas()
+    opcoes = opcoes_do_frame(df, indices)
 
 # Create tabs
 tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
@@ -84,15 +54,15 @@ if filtrar_hoje:
 else:
     periodo = st.sidebar.date_input(
         "Selecione o período", 
-        [df['data'].min().date(), df['data'].max().date()]
+        [opcoes['data_min'], opcoes['data_max']]
     )
 
-tipo_aposta_filter = st.sidebar.multiselect("Tipo de Aposta", df['tipo_aposta'].unique(), default=df['tipo_aposta'].unique())
+tipo_aposta_filter = st.sidebar.multiselect("Tipo de Aposta", opcoes['tipo_aposta'], default=opcoes['tipo_aposta'])
 torneio_filter = st.sidebar.multiselect(
     "Torneio", 
-    df['torneio'].explode().unique(), 
-    default=df['torneio'].explode().unique())
-casa_filter = st.sidebar.multiselect("Casa de Apostas", df['casa_de_apostas'].unique(), default=df['casa_de_apostas'].unique())
+    opcoes['torneio'], 
+    default=opcoes['torneio'])
+casa_filter = st.sidebar.multiselect("Casa de Apostas", opcoes['casa_de_apostas'], default=opcoes['casa_de_apostas'])
 resultado_filter = st.sidebar.multiselect(
     "Resultado",
     options=["Ganhou", "Perdeu", "Pendente"],
@@ -101,18 +71,22 @@ resultado_filter = st.sidebar.multiselect(
 )
 categoria_filter = st.sidebar.multiselect(
     "Categoria", 
-    df['categoria'].explode().unique(), 
-    default=df['categoria'].explode().unique())
+    opcoes['categoria'], 
+    default=opcoes['categoria'])
 
 # Aplicando filtros
-df_filtered = df[
-    (df['data'].between(pd.to_datetime(periodo[0]), pd.to_datetime(periodo[1]))) &
-    (df['tipo_aposta'].isin(tipo_aposta_filter)) &
-    (df['torneio'].apply(lambda tours: any(tour in torneio_filter for tour in tours)) if torneio_filter else True) &
-    (df['casa_de_apostas'].isin(casa_filter)) &
-    (df['resultado'].isin(resultado_filter)) &
-    (df['categoria'].apply(lambda cats: any(cat in categoria_filter for cat in cats)) if categoria_filter else True
-)]
+filtros = {
+    'periodo': periodo,
+    'tipo_aposta': tipo_aposta_filter,
+    'torneio': torneio_filter,
+    'casa_de_apostas': casa_filter,
+    'resultado': resultado_filter,
+    'categoria': categoria_filter,
+}
+if filtro_sql:
+    df_filtered = load_apostas_filtradas(filtros)
+else:
+    df_filtered = filtrar_apostas(df, filtros, indices)
 
 with tab1:
     st.subheader("📊 Visão Geral das Apostas")
@@ -810,7 +784,7 @@ with tab5:
     with col_cond1:
         odd_min = st.number_input("Odd Mínima", value=2.0)
     with col_cond2:
-        categoria_alvo = st.selectbox("Categoria Alvo", df['categoria'].explode().unique())
+        categoria_alvo = st.selectbox("Categoria Alvo", opcoes['categoria'])
     
     condicao = (df_filtered['odd'] > odd_min) & (df_filtered['categoria'].str.contains(categoria_alvo))
     total_cond = len(df_filtered[condicao])
@@ -886,7 +860,7 @@ with tab6:
     )
     
     # Estatísticas rápidas
-    st.caption(f"Exibindo {len(filtered_df)} registros filtrados de {len(df)} totais")
+    st.caption(f"Exibindo {len(filtered_df)} registros filtrados de {opcoes['total']} totais")
     st.download_button(
         label="Exportar para CSV",
         data=filtered_df.to_csv(index=False).encode('utf-8'),
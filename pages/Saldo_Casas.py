@@ -1,7 +1,11 @@
 import streamlit as st
-import psycopg2
 from dotenv import load_dotenv
-import os
+import db
+from db import init_db
+from livro_saldos import origem_movimento
+from migracoes import schema_em_dia
+from referencias import casas_com_saldo, invalidar_referencias
+from notificacoes import acompanhar_alteracoes
 import pandas as pd
 import plotly.express as px
 from datetime import datetime, timedelta
@@ -140,101 +144,17 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Função para conectar ao PostgreSQL utilizando a variável DATABASE_URL
-@st.cache_resource
-def init_db():
-    try:
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            st.error("Variável de ambiente DATABASE_URL não definida")
-            return None
-        
-        conn = psycopg2.connect(database_url)
-        conn.autocommit = True
-        # Cria tabela de saldos se não existir
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS saldo_casas (
-                    id SERIAL PRIMARY KEY,
-                    casa_nome TEXT UNIQUE,
-                    saldo NUMERIC(10,2) DEFAULT 0,
-                    ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Cria tabela de histórico
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS historico_saldos (
-                    id SERIAL PRIMARY KEY,
-                    data TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    casa_nome TEXT,
-                    operacao TEXT,
-                    valor NUMERIC(10,2),
-                    observacao TEXT,
-                    saldo_resultante NUMERIC(10,2)
-                )
-            """)
-            
-            # Verifica e adiciona coluna saldo_resultante se não existir
-            cursor.execute("""
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (
-                        SELECT 1 
-                        FROM information_schema.columns 
-                        WHERE table_name = 'historico_saldos' 
-                        AND column_name = 'saldo_resultante'
-                    ) THEN
-                        ALTER TABLE historico_saldos
-                        ADD COLUMN saldo_resultante NUMERIC(10,2);
-                    END IF;
-                END $$;
-            """)
-
-            # Cria tabela de metas
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS metas (
-                    id SERIAL PRIMARY KEY,
-                    titulo TEXT,
-                    valor_alvo NUMERIC(10,2),
-                    data_limite DATE,
-                    concluida BOOLEAN DEFAULT FALSE,
-                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.commit()
-            
-        return conn
-    except Exception as e:
-        st.error(f"Erro de conexão: {e}")
-        return None
-
-conn = init_db()
-
-# Função para popular casas iniciais
-def popular_casas_iniciais():
-    casas = [
-        'Bet 365', 'Betano', 'Betfair', 'Superbet', 'Estrela Bet', '4Play Bet', 'PixBet',
-        'Novibet', 'Sporting Bet', 'Bet7k', 'Cassino Pix', 'KTO', 'Stake', 'BR Bet', 
-        'Aposta tudo', 'Casa de Apostas', 'Vera Bet', 'Bateu Bet', 'Betnacional', 
-        'Jogue Facil', 'Jogo de Ouro', 'Pagol', 'Seu Bet', 'Bet Esporte', 
-        'BetFast', 'Faz1Bet', 'Esportiva Bet', 'Betpix365', 'Seguro Bet', 'Outros', 'Minha Conta'
-    ]
-    
-    with conn.cursor() as cursor:
-        for casa in casas:
-            cursor.execute("""
-                INSERT INTO saldo_casas (casa_nome, ultima_atualizacao)
-                VALUES (%s, CURRENT_TIMESTAMP)
-                ON CONFLICT (casa_nome) DO NOTHING
-            """, (casa,))
-        conn.commit()
+if not init_db() or not schema_em_dia():
+    st.stop()
 
 # Função para obter dados formatados para visualização
 def get_saldos_data():
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT casa_nome, saldo, ultima_atualizacao FROM saldo_casas ORDER BY saldo DESC")
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.nome, s.saldo, s.ultima_atualizacao
+            FROM saldo_casas s JOIN casas c ON c.id = s.casa_id
+            ORDER BY s.saldo DESC
+        """)
         resultados = cursor.fetchall()
         
     df = pd.DataFrame(resultados, columns=["Casa", "Saldo", "Última Atualização"])
@@ -255,15 +175,16 @@ def get_saldos_data():
 # Função para obter histórico de transações
 def get_historico(limit=100, casa=None, periodo=None):
     query = """
-        SELECT h.id, h.data, h.casa_nome, h.operacao, h.valor, h.observacao, h.saldo_resultante
+        SELECT h.id, h.data, c.nome, h.operacao, h.valor, h.observacao, h.saldo_resultante
         FROM historico_saldos h
+        LEFT JOIN casas c ON c.id = h.casa_id
     """
     
     conditions = []
     params = []
     
     if casa and casa != "Todas":
-        conditions.append("h.casa_nome = %s")
+        conditions.append("h.casa_id = (SELECT id FROM casas WHERE nome = %s)")
         params.append(casa)
     
     if periodo:
@@ -282,7 +203,7 @@ def get_historico(limit=100, casa=None, periodo=None):
     if limit:
         query += f" LIMIT {limit}"
     
-    with conn.cursor() as cursor:
+    with db.cursor() as cursor:
         cursor.execute(query, params)
         resultados = cursor.fetchall()
         
@@ -291,10 +212,14 @@ def get_historico(limit=100, casa=None, periodo=None):
 # Função para atualizar saldo
 def atualizar_saldo(casa, operacao, valor, observacao):
     try:
-        with conn.cursor() as cursor:
-            # Obtém saldo atual
-            cursor.execute("SELECT saldo FROM saldo_casas WHERE casa_nome = %s", (casa,))
-            saldo_atual = float(cursor.fetchone()[0])
+        with db.cursor() as cursor:
+            # Obtém saldo atual (com lock da linha, pois outras sessões podem escrever em paralelo)
+            cursor.execute("""
+                SELECT s.casa_id, s.saldo FROM saldo_casas s JOIN casas c ON c.id = s.casa_id
+                WHERE c.nome = %s FOR UPDATE OF s
+            """, (casa,))
+            casa_id, saldo_atual = cursor.fetchone()
+            saldo_atual = float(saldo_atual)
             
             # Calcula novo saldo
             if operacao == "Depósito":
@@ -309,73 +234,81 @@ def atualizar_saldo(casa, operacao, valor, observacao):
                 novo_saldo = valor
                 
             # Atualiza no banco
+            origem_movimento(cursor, operacao, observacao)
             cursor.execute("""
                 UPDATE saldo_casas
                 SET saldo = %s, ultima_atualizacao = CURRENT_TIMESTAMP
-                WHERE casa_nome = %s
-            """, (novo_saldo, casa))
+                WHERE casa_id = %s
+            """, (novo_saldo, casa_id))
             
             # Registra histórico
             cursor.execute("""
-                INSERT INTO historico_saldos (casa_nome, operacao, valor, observacao, saldo_resultante)
+                INSERT INTO historico_saldos (casa_id, operacao, valor, observacao, saldo_resultante)
                 VALUES (%s, %s, %s, %s, %s)
             """, (
-                casa,
+                casa_id,
                 operacao,
                 valor if operacao != "Ajuste Manual" else abs(novo_saldo - saldo_atual),
                 observacao,
                 novo_saldo
             ))
             
-            conn.commit()
             return True, "Saldo atualizado com sucesso!"
                 
     except Exception as e:
-        conn.rollback()
         return False, f"Erro na operação: {str(e)}"
 
-# Função para obter dados para gráficos
+# Função para obter dados para gráficos: saldo de fechamento de cada dia, lido do
+# resumo saldo_diario (abertura = último fechamento antes do período)
 def get_evolucao_saldo(casa=None, dias=30):
     try:
-        query = """
-            SELECT 
-                DATE(data) as dia,
-                casa_nome,
-                SUM(CASE 
-                    WHEN operacao = 'Depósito' OR operacao = 'Ganhou' THEN valor
-                    WHEN operacao = 'Saque' OR operacao = 'Perdeu' THEN -valor
-                    ELSE 0
-                END) as movimentacao
-            FROM historico_saldos
-            WHERE data >= CURRENT_DATE - INTERVAL %s DAY
-        """
-        
-        params = [f"{dias} DAY"]
-        
+        inicio = datetime.now().date() - timedelta(days=dias)
+        filtro = ""
+        params = []
         if casa and casa != "Todas":
-            query += " AND casa_nome = %s"
+            filtro = "AND c.nome = %s"
             params.append(casa)
-            
-        query += " GROUP BY dia, casa_nome ORDER BY dia"
         
-        with conn.cursor() as cursor:
-            cursor.execute(query, params)
+        with db.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT c.nome, a.saldo_fechamento
+                FROM casas c
+                CROSS JOIN LATERAL (
+                    SELECT d.saldo_fechamento FROM saldo_diario d
+                    WHERE d.casa_id = c.id AND d.dia < %s
+                    ORDER BY d.dia DESC
+                    LIMIT 1
+                ) a
+                WHERE 1=1 {filtro}
+            """, [inicio] + params)
+            aberturas = {nome: float(saldo) for nome, saldo in cursor.fetchall() if saldo is not None}
+            
+            cursor.execute(f"""
+                SELECT d.dia, c.nome, d.saldo_fechamento
+                FROM saldo_diario d
+                JOIN casas c ON c.id = d.casa_id
+                WHERE d.dia >= %s {filtro}
+            """, [inicio] + params)
             resultados = cursor.fetchall()
             
-        df = pd.DataFrame(resultados, columns=["Data", "Casa", "Movimentação"])
+        df = pd.DataFrame(resultados, columns=["Data", "Casa", "Saldo"])
+        if df.empty and not aberturas:
+            return pd.DataFrame()
         
-        # Criar uma tabela pivotada para a evolução do saldo
-        if not df.empty:
-            if casa and casa != "Todas":
-                df_pivot = df.pivot(index='Data', values='Movimentação', columns='Casa')
-                df_pivot = df_pivot.fillna(0).cumsum()
-            else:
-                df_pivot = df.groupby('Data')['Movimentação'].sum().cumsum().reset_index()
-                df_pivot.columns = ['Data', 'Saldo Acumulado']
-                
+        # Dias sem movimento repetem o saldo do dia anterior (ou o de abertura)
+        df["Saldo"] = pd.to_numeric(df["Saldo"], errors='coerce')
+        df_pivot = df.pivot(index='Data', columns='Casa', values='Saldo')
+        dias_periodo = pd.date_range(inicio, datetime.now().date(), freq='D').date
+        colunas = sorted(set(df_pivot.columns) | set(aberturas))
+        df_pivot = df_pivot.reindex(index=dias_periodo, columns=colunas).ffill().fillna(value=aberturas)
+        df_pivot.index.name = 'Data'
+        
+        if casa and casa != "Todas":
             return df_pivot
-        else:
-            return pd.DataFrame()
+        
+        df_total = df_pivot.sum(axis=1).reset_index()
+        df_total.columns = ['Data', 'Saldo Acumulado']
+        return df_total
         
     except Exception as e:
         st.error(f"Erro ao obter dados para gráfico: {str(e)}")
@@ -383,11 +316,12 @@ def get_evolucao_saldo(casa=None, dias=30):
 
 # Função para obter distribuição de saldo por casa
 def get_distribuicao_casas():
-    with conn.cursor() as cursor:
+    with db.cursor() as cursor:
         cursor.execute("""
-            SELECT casa_nome, saldo FROM saldo_casas 
-            WHERE saldo <> 0
-            ORDER BY saldo DESC
+            SELECT c.nome, s.saldo FROM saldo_casas s
+            JOIN casas c ON c.id = s.casa_id
+            WHERE s.saldo <> 0
+            ORDER BY s.saldo DESC
         """)
         resultados = cursor.fetchall()
         
@@ -403,7 +337,7 @@ def get_distribuicao_casas():
 
 # Função para gerenciar metas
 def get_metas():
-    with conn.cursor() as cursor:
+    with db.cursor() as cursor:
         cursor.execute("""
             SELECT id, titulo, valor_alvo, data_limite, concluida
             FROM metas
@@ -415,38 +349,32 @@ def get_metas():
 
 def adicionar_meta(titulo, valor_alvo, data_limite):
     try:
-        with conn.cursor() as cursor:
+        with db.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO metas (titulo, valor_alvo, data_limite)
                 VALUES (%s, %s, %s)
             """, (titulo, valor_alvo, data_limite))
-            conn.commit()
         return True, "Meta adicionada com sucesso!"
     except Exception as e:
-        conn.rollback()
         return False, f"Erro ao adicionar meta: {str(e)}"
 
 def atualizar_meta(meta_id, concluida):
     try:
-        with conn.cursor() as cursor:
+        with db.cursor() as cursor:
             cursor.execute("""
                 UPDATE metas SET concluida = %s
                 WHERE id = %s
             """, (concluida, meta_id))
-            conn.commit()
         return True
     except Exception as e:
-        conn.rollback()
         return False
 
 def excluir_meta(meta_id):
     try:
-        with conn.cursor() as cursor:
+        with db.cursor() as cursor:
             cursor.execute("DELETE FROM metas WHERE id = %s", (meta_id,))
-            conn.commit()
             return True
     except Exception as e:
-        conn.rollback()
         st.error(f"Erro ao excluir meta: {str(e)}")
         return False
 # Interface principal
@@ -463,16 +391,8 @@ pagina = st.sidebar.radio("Navegação", [
     "⚙️ Configurações"
 ])
 
-# Popular casas iniciais se necessário
-popular_casas_iniciais()
-
-if 'last_update' not in st.session_state:
-    st.session_state['last_update'] = datetime.now()
-
-current_time = datetime.now()
-if (current_time - st.session_state['last_update']) > timedelta(minutes=5):
-    st.session_state['last_update'] = current_time
-    st.rerun()
+# Atualiza a página só quando saldos, histórico ou apostas mudam (LISTEN/NOTIFY)
+acompanhar_alteracoes()
 
 if pagina == "📊 Dashboard":
     st.markdown("<h1 class='main-header'>📊 Dashboard Completo de Saldos</h1>", unsafe_allow_html=True)
@@ -604,9 +524,7 @@ elif pagina == "💸 Atualizar Saldo":
     with tabs[0]:
         st.markdown("<div class='tab-content'>", unsafe_allow_html=True)
         
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT casa_nome FROM saldo_casas ORDER BY casa_nome")
-            casas = [row[0] for row in cursor.fetchall()]
+        casas = casas_com_saldo()
         
         col1, col2 = st.columns(2)
         
@@ -683,8 +601,10 @@ elif pagina == "💸 Atualizar Saldo":
             casa_ajuste = st.selectbox("Selecione a casa:", casas, key="casa_ajuste")
             
             # Buscar saldo atual para exibir
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT saldo FROM saldo_casas WHERE casa_nome = %s", (casa_ajuste,))
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT s.saldo FROM saldo_casas s JOIN casas c ON c.id = s.casa_id WHERE c.nome = %s
+                """, (casa_ajuste,))
                 saldo_atual = float(cursor.fetchone()[0])
             
             st.info(f"Saldo atual: R$ {saldo_atual:.2f}")
@@ -714,32 +634,41 @@ elif pagina == "💸 Atualizar Saldo":
         if st.button("Cadastrar Nova Casa", key="btn_nova_casa"):
             if nova_casa.strip():
                 try:
-                    with conn.cursor() as cursor:
+                    with db.cursor() as cursor:
+                        # id_casa() reaproveita a casa se ela já existir (ex.: usada em apostas)
+                        origem_movimento(cursor, "Saldo inicial", "Cadastro da casa")
                         cursor.execute("""
-                            INSERT INTO saldo_casas (casa_nome, saldo)
-                            VALUES (%s, %s)
-                            ON CONFLICT (casa_nome) DO NOTHING
+                            INSERT INTO saldo_casas (casa_id, saldo)
+                            VALUES (id_casa(%s), %s)
+                            ON CONFLICT (casa_id) DO NOTHING
+                            RETURNING casa_id
                         """, (nova_casa.strip(), saldo_inicial))
+                        # Nenhuma linha inserida: a casa já tem saldo cadastrado
+                        criada = cursor.fetchone() if cursor.rowcount else None
                         
-                        if saldo_inicial > 0:
+                        if criada and saldo_inicial > 0:
                             cursor.execute("""
                                 INSERT INTO historico_saldos 
-                                (casa_nome, operacao, valor, observacao, saldo_resultante)
+                                (casa_id, operacao, valor, observacao, saldo_resultante)
                                 VALUES (%s, %s, %s, %s, %s)
                             """, (
-                                nova_casa.strip(),
+                                criada[0],
                                 "Depósito",
                                 saldo_inicial,
                                 "Saldo inicial",
                                 saldo_inicial
                             ))
                             
-                        conn.commit()
+                except Exception as e:
+                    st.markdown(f"<div class='error-message'>Erro ao cadastrar: {str(e)}</div>", unsafe_allow_html=True)
+                else:
+                    if criada:
+                        invalidar_referencias()
                         st.markdown(f"<div class='success-message'>Casa '{nova_casa}' cadastrada com sucesso!</div>", unsafe_allow_html=True)
                         time.sleep(1)
                         st.rerun()
-                except Exception as e:
-                    st.markdown(f"<div class='error-message'>Erro ao cadastrar: {str(e)}</div>", unsafe_allow_html=True)
+                    else:
+                        st.warning(f"A casa '{nova_casa.strip()}' já está cadastrada; nada foi alterado.")
             else:
                 st.warning("Digite um nome válido para a casa")
         
@@ -754,9 +683,7 @@ elif pagina == "📜 Histórico":
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT casa_nome FROM saldo_casas ORDER BY casa_nome")
-            casas = ["Todas"] + [row[0] for row in cursor.fetchall()]
+        casas = ["Todas"] + casas_com_saldo()
         
         filtro_casa = st.selectbox("Casa de Apostas:", casas)
     
@@ -858,14 +785,12 @@ elif pagina == "📈 Gráficos e Análises":
         # Filtros
         col1, col2 = st.columns(2)
         with col1:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT casa_nome FROM saldo_casas WHERE saldo <> 0 ORDER BY casa_nome")
-                casas_ativas = ["Todas"] + [row[0] for row in cursor.fetchall()]
+            casas_ativas = ["Todas"] + casas_com_saldo()
             
             filtro_casa_grafico = st.selectbox("Casa de Apostas:", casas_ativas, key="casa_grafico")
         
         with col2:
-            periodo_dias = st.slider("Período (dias):", min_value=7, max_value=180, value=30, step=1)
+            periodo_dias = st.slider("Período (dias):", min_value=7, max_value=730, value=30, step=1)
         
         # Obter dados de evolução
         df_evolucao = get_evolucao_saldo(
@@ -947,7 +872,7 @@ elif pagina == "📈 Gráficos e Análises":
     with graf_tabs[2]:
         # Obter dados de desempenho mensal
         try:
-            with conn.cursor() as cursor:
+            with db.cursor() as cursor:
                 cursor.execute("""
                     SELECT 
                         to_char(data, 'YYYY-MM') as mes,
@@ -1149,8 +1074,10 @@ elif pagina == "⚙️ Configurações":
         st.markdown("<div class='section-title'>Gerenciar Casas de Apostas</div>", unsafe_allow_html=True)
         
         # Listar todas as casas com opção de inativar/reativar
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT casa_nome, saldo FROM saldo_casas ORDER BY casa_nome")
+        with db.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.nome, s.saldo FROM saldo_casas s JOIN casas c ON c.id = s.casa_id ORDER BY c.nome
+            """)
             todas_casas = cursor.fetchall()
         
         if todas_casas:
@@ -1182,33 +1109,28 @@ elif pagina == "⚙️ Configurações":
                     if st.button("Salvar Alterações"):
                         if novo_nome and novo_nome != st.session_state['casa_editar']:
                             try:
-                                with conn.cursor() as cursor:
+                                renomeada = False
+                                with db.cursor() as cursor:
                                     # Verificar se o novo nome já existe
-                                    cursor.execute("SELECT casa_nome FROM saldo_casas WHERE casa_nome = %s", (novo_nome,))
+                                    cursor.execute("SELECT 1 FROM casas WHERE nome = %s", (novo_nome,))
                                     if cursor.fetchone():
                                         st.error(f"A casa '{novo_nome}' já existe.")
                                     else:
-                                        # Atualizar nome na tabela de saldos
-                                        cursor.execute("""
-                                            UPDATE saldo_casas 
-                                            SET casa_nome = %s
-                                            WHERE casa_nome = %s
-                                        """, (novo_nome, st.session_state['casa_editar']))
-                                        
-                                        # Atualizar nome no histórico
+                                        # Saldos, histórico e apostas apontam para o id: só uma linha muda
                                         cursor.execute("""
-                                            UPDATE historico_saldos
-                                            SET casa_nome = %s
-                                            WHERE casa_nome = %s
+                                            UPDATE casas
+                                            SET nome = %s, atualizado_em = CURRENT_TIMESTAMP
+                                            WHERE nome = %s
                                         """, (novo_nome, st.session_state['casa_editar']))
+                                        renomeada = True
                                         
-                                        conn.commit()
-                                        st.success(f"Casa '{st.session_state['casa_editar']}' renomeada para '{novo_nome}'.")
-                                        del st.session_state['casa_editar']
-                                        time.sleep(1)
-                                        st.rerun()
+                                if renomeada:
+                                    invalidar_referencias()
+                                    st.success(f"Casa '{st.session_state['casa_editar']}' renomeada para '{novo_nome}'.")
+                                    del st.session_state['casa_editar']
+                                    time.sleep(1)
+                                    st.rerun()
                             except Exception as e:
-                                conn.rollback()
                                 st.error(f"Erro ao atualizar: {str(e)}")
                         else:
                             st.warning("O nome não foi alterado ou está em branco.")
@@ -1242,7 +1164,7 @@ elif pagina == "⚙️ Configurações":
                 
                 if st.button("Excluir Histórico") and confirmar == "CONFIRMAR":
                     try:
-                        with conn.cursor() as cursor:
+                        with db.cursor() as cursor:
                             if periodo_excluir == "Todo o histórico":
                                 cursor.execute("DELETE FROM historico_saldos")
                                 mensagem = "Todo o histórico de transações foi excluído."
@@ -1260,18 +1182,14 @@ elif pagina == "⚙️ Configurações":
                                 
                                 mensagem = f"Histórico de transações dos {periodo_excluir.lower()} foi excluído."
                             
-                            conn.commit()
-                            st.success(mensagem)
-                            time.sleep(1)
-                            st.rerun()
+                        st.success(mensagem)
+                        time.sleep(1)
+                        st.rerun()
                     except Exception as e:
-                        conn.rollback()
                         st.error(f"Erro ao excluir histórico: {str(e)}")
         
         elif opcao_exclusao == "Casa de Apostas Específica":
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT casa_nome FROM saldo_casas ORDER BY casa_nome")
-                casas_disponiveis = [row[0] for row in cursor.fetchall()]
+            casas_disponiveis = casas_com_saldo()
             
             casa_excluir = st.selectbox("Selecione a casa para excluir:", ["Selecione uma casa"] + casas_disponiveis)
             
@@ -1280,20 +1198,24 @@ elif pagina == "⚙️ Configurações":
                 
                 if st.button("Excluir Casa") and confirmar == "CONFIRMAR":
                     try:
-                        with conn.cursor() as cursor:
+                        with db.cursor() as cursor:
                             # Excluir da tabela de saldos
-                            cursor.execute("DELETE FROM saldo_casas WHERE casa_nome = %s", (casa_excluir,))
+                            # A casa continua em casas: apostas antigas ainda apontam para ela
+                            cursor.execute("""
+                                DELETE FROM saldo_casas WHERE casa_id = (SELECT id FROM casas WHERE nome = %s)
+                            """, (casa_excluir,))
                             
                             # Opcionalmente, excluir do histórico também
                             if st.checkbox("Excluir também o histórico desta casa"):
-                                cursor.execute("DELETE FROM historico_saldos WHERE casa_nome = %s", (casa_excluir,))
+                                cursor.execute("""
+                                    DELETE FROM historico_saldos WHERE casa_id = (SELECT id FROM casas WHERE nome = %s)
+                                """, (casa_excluir,))
                             
-                            conn.commit()
-                            st.success(f"Casa '{casa_excluir}' excluída com sucesso.")
-                            time.sleep(1)
-                            st.rerun()
+                        invalidar_referencias()
+                        st.success(f"Casa '{casa_excluir}' excluída com sucesso.")
+                        time.sleep(1)
+                        st.rerun()
                     except Exception as e:
-                        conn.rollback()
                         st.error(f"Erro ao excluir casa: {str(e)}")
         
         elif opcao_exclusao == "Todas as Metas":
@@ -1301,14 +1223,12 @@ elif pagina == "⚙️ Configurações":
             
             if st.button("Excluir Todas as Metas") and confirmar == "CONFIRMAR":
                 try:
-                    with conn.cursor() as cursor:
+                    with db.cursor() as cursor:
                         cursor.execute("DELETE FROM metas")
-                        conn.commit()
-                        st.success("Todas as metas foram excluídas com sucesso.")
-                        time.sleep(1)
-                        st.rerun()
+                    st.success("Todas as metas foram excluídas com sucesso.")
+                    time.sleep(1)
+                    st.rerun()
                 except Exception as e:
-                    conn.rollback()
                     st.error(f"Erro ao excluir metas: {str(e)}")
     
     # Tab 3: Sobre o App
@@ -0,0 +1,43 @@
+import streamlit as st
+
+from db import consultar
+
+# Ordem alfabética com "Outros" no fim, como nas listas antigas do formulário
+ORDEM_NOMES = "ORDER BY nome = 'Outros', nome"
+
+
+# Casas, categorias e torneios lidos uma vez por processo e servidos da memória.
+# Só mudam quando uma casa é criada, renomeada ou excluída (ou numa importação),
+# e quem faz essas alterações chama invalidar_referencias()
+@st.cache_resource(show_spinner=False)
+def _referencias():
+    return {
+        'casas': [l[0] for l in consultar(f"SELECT nome FROM casas {ORDEM_NOMES}")],
+        'casas_com_saldo': [l[0] for l in consultar("""
+            SELECT c.nome FROM saldo_casas s JOIN casas c ON c.id = s.casa_id ORDER BY c.nome
+        """)],
+        'categorias': [l[0] for l in consultar(f"SELECT nome FROM categorias {ORDEM_NOMES}")],
+        'torneios': [l[0] for l in consultar(f"SELECT nome FROM torneios {ORDEM_NOMES}")],
+    }
+
+
+# Todas as casas (formulário e filtros de apostas)
+def casas():
+    return _referencias()['casas']
+
+
+# Casas com saldo cadastrado (páginas de Saldo das Casas)
+def casas_com_saldo():
+    return _referencias()['casas_com_saldo']
+
+
+def categorias():
+    return _referencias()['categorias']
+
+
+def torneios():
+    return _referencias()['torneios']
+
+
+def invalidar_referencias():
+    _referencias.clear()
@@ -0,0 +1,244 @@
+import re
+import unicodedata
+from datetime import date, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from db import consultar
+from dados_apostas import JUNCOES_FILTRO, filtro_sql_disponivel, versao_dados
+
+MESES = ['janeiro', 'fevereiro', 'marco', 'abril', 'maio', 'junho', 'julho',
+         'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+NOMES_MESES = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho',
+               'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+
+# Métricas reconhecidas (texto já sem acentos e em minúsculas); a ordem decide o empate
+PADROES_METRICA = [
+    ('roi', r'\broi\b|retorno sobre (o )?investimento'),
+    ('taxa_acerto', r'taxa de acerto|aproveitamento|percentual de acerto|% de acerto|quantas? (eu )?acertei'),
+    ('contagem', r'quantas apostas|quantidade de apostas|numero de apostas|quantas vezes apostei'),
+    ('total_apostado', r'quanto (eu )?apostei|total apostado|valor apostado total|volume apostado'),
+    ('lucro', r'\blucr|quanto (eu )?(ganhei|perdi)|prejuizo|resultado financeiro|saldo das apostas'),
+]
+
+# Perguntas sobre apostas específicas continuam no retriever
+PADRAO_ABERTA = r'\b(qual|quais) (foi |foram |e |sao )?(a |as |o |os )?(aposta|apostas|jogo|jogos|partida|partidas)\b'
+
+# Dimensões de agrupamento: chave -> (expressão, junção)
+AGRUPAMENTOS = {
+    'casa': ("g.nome", "LEFT JOIN casas g ON g.id = a.casa_id"),
+    'torneio': ("g.nome", "JOIN aposta_torneios gj ON gj.aposta_id = a.id JOIN torneios g ON g.id = gj.torneio_id"),
+    'categoria': ("g.nome", "JOIN aposta_categorias gj ON gj.aposta_id = a.id JOIN categorias g ON g.id = gj.categoria_id"),
+    'mes': ("to_char(a.data_aposta, 'YYYY-MM')", ""),
+}
+PADROES_AGRUPAMENTO = {
+    'casa': r'\bpor casas?\b|\bcada casa\b',
+    'torneio': r'\bpor (torneios?|campeonatos?|ligas?)\b|\bcada (torneio|campeonato|liga)\b',
+    'categoria': r'\bpor categorias?\b|\bcada categoria\b',
+    'mes': r'\bpor mes\b|\bmes a mes\b|\bmensal',
+}
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+# Palavras comuns em perguntas: nomes feitos só delas ("Casa de Apostas", "Stake",
+# "Outros") só contam quando citados explicitamente
+PALAVRAS_COMUNS = {'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'e', 'casa', 'casas',
+                   'aposta', 'apostas', 'apostar', 'stake', 'outro', 'outros', 'outra', 'outras',
+                   'bet', 'bets', 'bonus', 'jogo', 'jogos', 'esporte', 'esportes', 'geral'}
+ASPAS = '"\'\u201c\u201d\u2018\u2019'
+
+
+def _nome_generico(nome):
+    return all(p in PALAVRAS_COMUNS for p in normalizar(nome).split())
+
+
+def _padrao_nome(nome):
+    # "Bet 365" também casa com "bet365"
+    partes = [re.escape(p) for p in normalizar(nome).split()]
+    padrao = r'\s*'.join(partes)
+    if _nome_generico(nome):
+        # Só entre aspas ou depois de "na"/"no" ("lucro na Stake")
+        return rf'[{ASPAS}]\s*{padrao}\s*[{ASPAS}]|\bn[ao]s?\s+{padrao}\b'
+    return rf'\b{padrao}\b'
+
+
+def _encontrar_nomes(texto, nomes):
+    return [nome for nome in nomes if nome and re.search(_padrao_nome(nome), texto)]
+
+
+# Texto sem os trechos de agrupamento ("por casa", "cada torneio"), que não são filtros
+def _sem_agrupamentos(texto):
+    return re.sub('|'.join(PADROES_AGRUPAMENTO.values()), ' ', texto)
+
+
+def _fim_do_mes(ano, mes):
+    if mes == 12:
+        return date(ano, 12, 31)
+    return date(ano, mes + 1, 1) - timedelta(days=1)
+
+
+# Período citado na pergunta -> (início, fim, descrição) ou None
+def extrair_periodo(texto, hoje):
+    m = re.search(r'\bultim[oa]s (\d+) dias\b', texto)
+    if m:
+        return hoje - timedelta(days=int(m.group(1)) - 1), hoje, f"últimos {m.group(1)} dias"
+    if re.search(r'\bhoje\b', texto):
+        return hoje, hoje, "hoje"
+    if re.search(r'\bontem\b', texto):
+        ontem = hoje - timedelta(days=1)
+        return ontem, ontem, "ontem"
+    if re.search(r'\b(esta|essa|nesta|nessa) semana\b', texto):
+        inicio = hoje - timedelta(days=hoje.weekday())
+        return inicio, hoje, "esta semana"
+    if re.search(r'\bsemana passada\b', texto):
+        inicio = hoje - timedelta(days=hoje.weekday() + 7)
+        return inicio, inicio + timedelta(days=6), "semana passada"
+    if re.search(r'\b(este|esse|neste|nesse) mes\b', texto):
+        return hoje.replace(day=1), hoje, "este mês"
+    if re.search(r'\bmes passado\b', texto):
+        fim = hoje.replace(day=1) - timedelta(days=1)
+        return fim.replace(day=1), fim, "mês passado"
+    if re.search(r'\b(este|esse|neste|nesse) ano\b', texto):
+        return date(hoje.year, 1, 1), hoje, "este ano"
+    if re.search(r'\bano passado\b', texto):
+        return date(hoje.year - 1, 1, 1), date(hoje.year - 1, 12, 31), "ano passado"
+
+    m = re.search(r'\b(' + '|'.join(MESES) + r')\b(?:\s+(?:de\s+)?(\d{4}))?', texto)
+    if m:
+        mes = MESES.index(m.group(1)) + 1
+        if m.group(2):
+            ano = int(m.group(2))
+        else:
+            # Mês sem ano: o mais recente que já começou
+            ano = hoje.year if mes <= hoje.month else hoje.year - 1
+        return date(ano, mes, 1), _fim_do_mes(ano, mes), f"{NOMES_MESES[mes - 1]}/{ano}"
+
+    m = re.search(r'\b(20\d{2})\b', texto)
+    if m:
+        ano = int(m.group(1))
+        return date(ano, 1, 1), date(ano, 12, 31), str(ano)
+    return None
+
+
+# Casas e torneios conhecidos (recalculados só quando os dados mudam)
+@st.cache_data(max_entries=4, show_spinner=False)
+def _nomes_conhecidos(versao):
+    casas = [l[0] for l in consultar("""
+        SELECT c.nome FROM casas c WHERE EXISTS (SELECT 1 FROM apostas a WHERE a.casa_id = c.id)
+    """)]
+    torneios = [l[0] for l in consultar("SELECT nome FROM torneios")]
+    # Nomes mais longos primeiro, para "Copa do Brasil" não virar só "Brasil"
+    return sorted(casas, key=len, reverse=True), sorted(torneios, key=len, reverse=True)
+
+
+# Casas, torneios e período citados (texto já normalizado)
+def extrair_restricoes(texto, casas, torneios, hoje=None):
+    texto_nomes = _sem_agrupamentos(texto)
+    casas_citadas = _encontrar_nomes(texto_nomes, casas)
+    torneios_citados = _encontrar_nomes(texto_nomes, torneios)
+    # Evita contar a casa também como torneio quando os nomes coincidem
+    torneios_citados = [t for t in torneios_citados if t not in casas_citadas]
+    return {
+        'casas': casas_citadas,
+        'torneios': torneios_citados,
+        'periodo': extrair_periodo(texto, hoje or date.today()),
+    }
+
+
+# Classifica a pergunta: dict com a intenção agregada ou None (pergunta aberta)
+def detectar_intencao(pergunta, casas, torneios, hoje=None):
+    texto = normalizar(pergunta)
+    if re.search(PADRAO_ABERTA, texto):
+        return None
+    metrica = next((nome for nome, padrao in PADROES_METRICA if re.search(padrao, texto)), None)
+    if metrica is None:
+        return None
+
+    return {
+        'metrica': metrica,
+        **extrair_restricoes(texto, casas, torneios, hoje),
+        'agrupar': next((chave for chave, padrao in PADROES_AGRUPAMENTO.items() if re.search(padrao, texto)), None),
+    }
+
+
+# Monta o SELECT agregado parametrizado para a intenção
+def montar_agregado(intencao):
+    condicoes, params = [], []
+    if intencao['periodo']:
+        inicio, fim, _ = intencao['periodo']
+        condicoes.append("a.data_aposta BETWEEN %s AND %s")
+        params.extend([inicio, fim])
+    if intencao['casas']:
+        condicoes.append("a.casa_id = ANY(ARRAY(SELECT id FROM casas WHERE nome = ANY(%s)))")
+        params.append(intencao['casas'])
+    if intencao['torneios']:
+        juncao, tabela, chave = JUNCOES_FILTRO['torneio']
+        condicoes.append(f"""EXISTS (
+            SELECT 1 FROM {juncao} j JOIN {tabela} t ON t.id = j.{chave}
+            WHERE j.aposta_id = a.id AND t.nome = ANY(%s)
+        )""")
+        params.append(intencao['torneios'])
+
+    grupo, juncao_grupo = AGRUPAMENTOS.get(intencao['agrupar'], (None, ""))
+    liquidada = "a.resultado IN ('Ganhou', 'Perdeu')"
+    metricas = f"""
+        COUNT(*) AS apostas,
+        COUNT(*) FILTER (WHERE {liquidada}) AS liquidadas,
+        COUNT(*) FILTER (WHERE a.resultado = 'Ganhou') AS ganhas,
+        ROUND(COALESCE(SUM(a.valor_apostado), 0)::numeric, 2) AS total_apostado,
+        ROUND(COALESCE(SUM(a.valor_final) FILTER (WHERE {liquidada}), 0)::numeric, 2) AS lucro,
+        ROUND((100 * SUM(a.valor_final) FILTER (WHERE {liquidada})
+               / NULLIF(SUM(a.valor_apostado) FILTER (WHERE {liquidada}), 0))::numeric, 2) AS roi_pct,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE a.resultado = 'Ganhou')
+              / NULLIF(COUNT(*) FILTER (WHERE {liquidada}), 0), 2) AS taxa_acerto_pct
+    """
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    if grupo:
+        query = f"""
+            SELECT {grupo} AS grupo, {metricas}
+            FROM apostas a {juncao_grupo}
+            {where}
+            GROUP BY 1
+            ORDER BY {'1' if intencao['agrupar'] == 'mes' else 'lucro DESC'}
+        """
+        colunas = ['grupo']
+    else:
+        query = f"SELECT {metricas} FROM apostas a {where}"
+        colunas = []
+    colunas += ['apostas', 'liquidadas', 'ganhas', 'total_apostado', 'lucro', 'roi_pct', 'taxa_acerto_pct']
+    return query, params, colunas
+
+
+def descrever(intencao):
+    partes = [f"métrica: {intencao['metrica']}"]
+    if intencao['casas']:
+        partes.append(f"casas: {', '.join(intencao['casas'])}")
+    if intencao['torneios']:
+        partes.append(f"torneios: {', '.join(intencao['torneios'])}")
+    if intencao['periodo']:
+        inicio, fim, rotulo = intencao['periodo']
+        partes.append(f"período: {rotulo} ({inicio:%d/%m/%Y} a {fim:%d/%m/%Y})")
+    else:
+        partes.append("período: todo o histórico")
+    if intencao['agrupar']:
+        partes.append(f"agrupado por {intencao['agrupar']}")
+    return "; ".join(partes)
+
+
+# Responde perguntas agregadas direto no banco. Retorna None quando a pergunta
+# é aberta ou o schema tipado (migracao_apostas.py) ainda não foi convertido.
+def rotear_pergunta(pergunta):
+    if not filtro_sql_disponivel():
+        return None
+    casas, torneios = _nomes_conhecidos(versao_dados())
+    intencao = detectar_intencao(pergunta, casas, torneios)
+    if intencao is None:
+        return None
+    query, params, colunas = montar_agregado(intencao)
+    tabela = pd.DataFrame(consultar(query, params), columns=colunas)
+    return {'intencao': intencao, 'descricao': descrever(intencao), 'tabela': tabela}
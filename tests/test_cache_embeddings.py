@@ -0,0 +1,44 @@
+from cache_embeddings import EmbeddingsEmCache, hash_texto
+
+
+class ModeloFalso:
+    def __init__(self):
+        self.chamadas = 0
+
+    def embed_documents(self, textos):
+        self.chamadas += len(textos)
+        return [[float(len(t)), 1.0] for t in textos]
+
+    def embed_query(self, texto):
+        return [0.0, 0.0]
+
+
+def test_compactar_mantem_so_textos_atuais(tmp_path):
+    cache = EmbeddingsEmCache(ModeloFalso(), "modelo", pasta=tmp_path)
+    cache.embed_documents(["a", "bb", "ccc", "dddd"])
+
+    removidos = cache.compactar({hash_texto("bb"), hash_texto("dddd")})
+
+    assert removidos == 2
+    assert len(cache.mapa) == 2
+    assert cache.embed_documents(["dddd", "bb"]) == [[4.0, 1.0], [2.0, 1.0]]
+
+
+def test_compactacao_persiste_entre_processos(tmp_path):
+    cache = EmbeddingsEmCache(ModeloFalso(), "modelo", pasta=tmp_path)
+    cache.embed_documents(["a", "bb", "ccc"])
+    cache.compactar({hash_texto("ccc")})
+
+    modelo = ModeloFalso()
+    recarregado = EmbeddingsEmCache(modelo, "modelo", pasta=tmp_path)
+    assert recarregado.embed_documents(["ccc"]) == [[3.0, 1.0]]
+    assert modelo.chamadas == 0
+
+
+def test_compactar_respeita_folga(tmp_path):
+    cache = EmbeddingsEmCache(ModeloFalso(), "modelo", pasta=tmp_path)
+    textos = [str(i) * 3 for i in range(10)]
+    cache.embed_documents(textos)
+
+    assert cache.compactar({hash_texto(t) for t in textos[1:]}) == 0
+    assert len(cache.mapa) == 10
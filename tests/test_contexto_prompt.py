@@ -0,0 +1,69 @@
+from contexto_prompt import estimar_tokens, historico_da_pergunta, resumir_historico, tabela_no_orcamento
+from dados_apostas import CAMPOS_APOSTAS
+
+
+def aposta(aposta_id, partida="Time A vs Time B"):
+    valores = {campo: f"{campo}-{aposta_id}" for campo in CAMPOS_APOSTAS}
+    valores.update(id=aposta_id, partida=partida, detalhes=None)
+    return tuple(valores[campo] for campo in CAMPOS_APOSTAS)
+
+
+def test_tabela_mantem_ordem_de_relevancia_e_cabecalho_unico():
+    linhas = {i: aposta(i) for i in (1, 2, 3)}
+    texto, incluidas, descartadas = tabela_no_orcamento([3, 1, 2], linhas, 10_000)
+
+    partes = texto.split("\n")
+    assert partes[0] == "\t".join(CAMPOS_APOSTAS)
+    assert [p.split("\t")[0] for p in partes[1:]] == ["3", "1", "2"]
+    assert (incluidas, descartadas) == (3, 0)
+
+
+def test_tabela_para_quando_o_orcamento_acaba():
+    linhas = {i: aposta(i) for i in range(1, 11)}
+    uma_linha = estimar_tokens("\t".join(str(v) for v in linhas[1]))
+    orcamento = estimar_tokens("\t".join(CAMPOS_APOSTAS)) + 3 * uma_linha
+
+    texto, incluidas, descartadas = tabela_no_orcamento(list(linhas), linhas, orcamento)
+
+    assert (incluidas, descartadas) == (3, 7)
+    assert estimar_tokens(texto) <= orcamento + 1
+
+
+def test_tabela_ignora_apostas_excluidas_e_normaliza_celulas():
+    linhas = {1: aposta(1, partida="Time A\n  vs   Time B")}
+    texto, incluidas, descartadas = tabela_no_orcamento([1, 99], linhas, 10_000)
+
+    assert (incluidas, descartadas) == (1, 1)
+    assert "Time A vs Time B" in texto
+    assert "None" not in texto
+
+
+def test_historico_resume_turnos_antigos():
+    mensagens = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"mensagem {i} " + "x" * 300}
+                 for i in range(8)]
+    texto = resumir_historico(mensagens, orcamento=2_000, turnos_recentes=2)
+
+    assert texto.startswith("Resumo de turnos anteriores:")
+    assert texto.count("- User:") + texto.count("- Assistant:") == 6
+    assert mensagens[-1]["content"] in texto
+
+
+def test_historico_respeita_orcamento():
+    mensagens = [{"role": "user", "content": "y" * 4_000} for _ in range(5)]
+    texto = resumir_historico(mensagens, orcamento=300, turnos_recentes=4)
+
+    assert estimar_tokens(texto) <= 300
+
+
+def test_historico_da_pergunta_inclui_a_ultima_troca():
+    mensagens = [
+        {"role": "assistant", "content": "Olá! Como posso ajudar?"},
+        {"role": "user", "content": "Quanto lucrei na Betano?"},
+        {"role": "assistant", "content": "Você lucrou R$ 120,00 na Betano."},
+    ]
+    # A pergunta nova ainda não entrou na lista (como na página) ou já entrou
+    for lista in (mensagens, mensagens + [{"role": "user", "content": "E na Stake?"}]):
+        texto = historico_da_pergunta(lista, "E na Stake?")
+        assert "Quanto lucrei na Betano?" in texto
+        assert "Você lucrou R$ 120,00 na Betano." in texto
+        assert "E na Stake?" not in texto
@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from importacao_apostas import COLUNAS_IMPORTACAO, ajustes_por_casa, validar_apostas
+
+
+def planilha(**colunas):
+    return pd.DataFrame(colunas, dtype=str)
+
+
+def test_apelidos_e_formatos_brasileiros():
+    apostas, rejeitadas = validar_apostas(planilha(**{
+        'Data': ['15/06/2024'],
+        'Casa': ['Betano'],
+        'Stake': ['R$ 1.234,50'],
+        'Odds': ['1.5'],
+    }))
+
+    assert rejeitadas.empty
+    assert list(apostas.columns) == COLUNAS_IMPORTACAO
+    linha = apostas.iloc[0]
+    assert linha['data'] == '2024-06-15'
+    assert linha['valor_apostado'] == 1234.5
+    assert linha['resultado'] == 'Pendente'
+    assert linha['tipo_aposta'] == 'Simples'
+
+
+def test_odds_multiplas_com_bonus_e_valor_final_calculado():
+    apostas, _ = validar_apostas(planilha(
+        data=['2024-06-15', '2024-06-16', '2024-06-17'],
+        casa_de_apostas=['Betano', 'Betano', 'Stake'],
+        valor_apostado=['10', '10', '10'],
+        odd=['1.5, 2.0|10', '2.0', '3.0'],
+        resultado=['ganhou', 'Perdeu', 'Perdeu'],
+        bonus=['2', '0', '1'],
+    ))
+
+    assert list(apostas['odd']) == ['1.5, 2.0|10', '2.0', '3.0']
+    assert list(apostas['tipo_aposta']) == ['Dupla', 'Simples', 'Simples']
+    assert list(apostas['resultado']) == ['Ganhou', 'Perdeu', 'Perdeu']
+    # Ganhou: lucro 10 * (3 * 1.10 - 1), com o bônus de combinadas como no formulário;
+    # Perdeu: -valor, exceto aposta bônus
+    assert list(apostas['valor_final']) == [23.0, -10.0, 0.0]
+
+
+def test_bonus_de_combinadas_invalido_rejeitado():
+    apostas, rejeitadas = validar_apostas(planilha(
+        data=['2024-06-15', '2024-06-15'],
+        casa_de_apostas=['Betano', 'Betano'],
+        valor_apostado=['10', '10'],
+        odd=['1.5, 2.0|dez', '1.5, 2.0|'],
+        resultado=['Ganhou', 'Ganhou'],
+    ))
+
+    assert list(rejeitadas['motivo']) == ['bônus de combinadas inválido']
+    assert list(apostas['valor_final']) == [20.0]
+
+
+def test_linhas_invalidas_rejeitadas_com_motivo():
+    apostas, rejeitadas = validar_apostas(planilha(
+        data=['2024-06-15', 'ontem', '2024-06-15', '2024-06-15', '2024-06-15', '2024-06-15'],
+        casa_de_apostas=['Betano', 'Betano', ' ', 'Betano', 'Betano', 'Betano'],
+        valor_apostado=['10', '10', '10', '0', '10', '10'],
+        odd=['1.8', '1.8', '1.8', '1.8', '1.8, abc', '1.8'],
+        resultado=['Ganhou', 'Ganhou', 'Ganhou', 'Ganhou', 'Ganhou', 'Anulada'],
+    ))
+
+    assert len(apostas) == 1
+    assert list(rejeitadas['linha']) == [3, 4, 5, 6, 7]
+    assert list(rejeitadas['motivo']) == [
+        'data inválida', 'casa de apostas vazia', 'valor apostado inválido', 'odd inválida',
+        'resultado deve ser Pendente, Ganhou ou Perdeu',
+    ]
+
+
+def test_coluna_obrigatoria_ausente():
+    with pytest.raises(ValueError, match='odd'):
+        validar_apostas(planilha(data=['2024-06-15'], casa_de_apostas=['Betano'], valor_apostado=['10']))
+
+
+def test_ajustes_por_casa_seguem_o_fluxo_manual():
+    apostas = pd.DataFrame({
+        'casa_de_apostas': ['Betano', 'Betano', 'Betano', 'Stake', 'Stake'],
+        'resultado': ['Ganhou', 'Perdeu', 'Pendente', 'Ganhou', 'Perdeu'],
+        'bonus': [0, 0, 0, 1, 1],
+        'valor_apostado': [10.0, 20.0, 5.0, 10.0, 10.0],
+        'valor_final': [8.0, -20.0, 0.0, 15.0, 0.0],
+    })
+
+    ajustes = ajustes_por_casa(apostas)
+
+    # Betano: -10 + (10 + 8), -20, -5; Stake (bônus): só o lucro da que ganhou
+    assert ajustes.to_dict() == {'Betano': -17.0, 'Stake': 15.0}
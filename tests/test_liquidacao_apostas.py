@@ -0,0 +1,36 @@
+import hashlib
+
+import pytest
+
+import liquidacao_apostas
+from liquidacao_apostas import pernas_da_odd, pernas_escolhidas
+
+
+def test_pernas_da_odd_ignora_bonus_de_combinadas():
+    assert pernas_da_odd("1.5, 2.0|10") == ["1.5", "2.0"]
+    assert pernas_da_odd(1.8) == ["1.8"]
+
+
+def test_pernas_escolhidas_aceita_subconjunto_das_pernas():
+    assert pernas_escolhidas("2.0", "1.5, 2.0|10") == ["2.0"]
+    assert pernas_escolhidas(" 1.5 ,2 ", "1.5, 2.0") == ["1.5", "2"]
+    assert pernas_escolhidas("1.5, 1.5", "1.5, 1.5, 3.0") == ["1.5", "1.5"]
+
+
+@pytest.mark.parametrize("texto", ["", None, "2.5", "1.5, 1.5", "1,5"])
+def test_pernas_escolhidas_rejeita_vazio_e_pernas_que_nao_sao_da_aposta(texto):
+    with pytest.raises(ValueError):
+        pernas_escolhidas(texto, "1.5, 2.0")
+
+
+# SQL que cada migração publicada rodou: montar as versões a partir do corpo comum
+# não pode mudar nenhuma delas
+@pytest.mark.parametrize("versao, digest", [
+    ("V4", "ba26fc2f052e7375319b79cbdbd001beb1b4e3094b70d090c5eb96e2982577f6"),
+    ("V7", "4692191086dba6ba32e714680d6f0a09560ebb56bd75f336bd27e7d2d53449c8"),
+    ("V10", "4495f384c4dc4add4405e0ea75315e4b649c2b586d92413da89d503b687e0e79"),
+    ("V12", "971a9e509977f36357af35dc18c6585338a3815e0be71f058fe8fb5d4f506b6d"),
+])
+def test_versoes_publicadas_da_liquidacao_nao_mudam(versao, digest):
+    sql = "".join(getattr(liquidacao_apostas, f"DDL_LIQUIDACAO_{versao}"))
+    assert hashlib.sha256(sql.encode()).hexdigest() == digest
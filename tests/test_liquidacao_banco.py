@@ -0,0 +1,138 @@
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+# Regras de liquidação rodando no PostgreSQL (liquidar_apostas() e liquidar_aposta()).
+# Precisam de um banco descartável: TESTE_DATABASE_URL recebe as migrações e linhas de teste.
+TESTE_DATABASE_URL = os.getenv("TESTE_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TESTE_DATABASE_URL, reason="TESTE_DATABASE_URL não definida")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def banco():
+    os.environ["DATABASE_URL"] = TESTE_DATABASE_URL
+    import db
+    from migracoes import aplicar_migracoes
+    db._criar_pool.clear()
+    aplicar_migracoes(log=lambda *_: None)
+    yield
+    db._criar_pool.clear()
+
+
+@pytest.fixture
+def casa():
+    from db import cursor
+    with cursor() as cur:
+        cur.execute("INSERT INTO casas (nome) VALUES (%s) RETURNING id", (f"Teste {uuid.uuid4().hex[:8]}",))
+        casa_id = cur.fetchone()[0]
+        cur.execute("INSERT INTO saldo_casas (casa_id, saldo) VALUES (%s, 100)", (casa_id,))
+    return casa_id
+
+
+def criar_aposta(casa_id, odd, valor=10.0, bonus=0):
+    from db import cursor
+    with cursor() as cur:
+        cur.execute("""
+            INSERT INTO apostas (data, tipo_aposta, resultado, valor_apostado, odd, bonus, casa_id)
+            VALUES ('2026-01-10', 'Simples', 'Pendente', %s, %s, %s, %s)
+            RETURNING id
+        """, (valor, odd, bonus, casa_id))
+        return cur.fetchone()[0]
+
+
+def aposta(aposta_id):
+    from db import consultar_um
+    return consultar_um("SELECT resultado, valor_final, odd FROM apostas WHERE id = %s", (aposta_id,))
+
+
+def saldo(casa_id):
+    from db import consultar_um
+    return float(consultar_um("SELECT saldo FROM saldo_casas WHERE casa_id = %s", (casa_id,))[0])
+
+
+def test_ganhou_devolve_aposta_mais_lucro(casa):
+    from liquidacao_apostas import liquidar_aposta
+    aposta_id = criar_aposta(casa, "1.5, 2.0")
+    assert float(liquidar_aposta(aposta_id, "Ganhou", ["1.5", "2.0"])) == 20.0
+    assert aposta(aposta_id) == ("Ganhou", 20.0, "3.0")
+    assert saldo(casa) == 130.0
+
+
+def test_ganhou_com_bonus_de_combinadas(casa):
+    from liquidacao_apostas import liquidar_aposta
+    aposta_id = criar_aposta(casa, "1.5, 2.0|10")
+    assert float(liquidar_aposta(aposta_id, "Ganhou", ["1.5", "2.0"], bonus_percent=10)) == pytest.approx(22.0)
+    assert saldo(casa) == 132.0
+
+
+def test_aposta_bonus_credita_so_o_lucro(casa):
+    from liquidacao_apostas import liquidar_em_lote
+    ganhou, perdeu = criar_aposta(casa, "3.0", bonus=1), criar_aposta(casa, "3.0", bonus=1)
+    assert liquidar_em_lote([(ganhou, "Ganhou", ["3.0"], 0.0, None),
+                             (perdeu, "Perdeu", ["3.0"], 0.0, None)]) == (2, 0)
+    assert aposta(ganhou)[1] == 20.0
+    assert aposta(perdeu)[1] == 0.0
+    assert saldo(casa) == 120.0
+
+
+def test_perdeu_nao_mexe_no_saldo(casa):
+    from liquidacao_apostas import liquidar_aposta
+    aposta_id = criar_aposta(casa, "3.0")
+    liquidar_aposta(aposta_id, "Perdeu", ["3.0"])
+    assert aposta(aposta_id)[:2] == ("Perdeu", -10.0)
+    assert saldo(casa) == 100.0
+
+
+def test_cashout_substitui_o_calculo_pelas_odds(casa):
+    from liquidacao_apostas import liquidar_em_lote
+    aposta_id = criar_aposta(casa, "3.0")
+    liquidar_em_lote([(aposta_id, "Ganhou", ["3.0"], 0.0, 15.0)])
+    assert aposta(aposta_id)[1] == 5.0
+    assert saldo(casa) == 115.0
+
+
+def test_odd_no_formato_do_formulario(casa):
+    # Mesmo texto de ", ".join(map(str, odds)) no formulário, nos dois caminhos
+    from liquidacao_apostas import liquidar_aposta, liquidar_em_lote
+    individual, lote = criar_aposta(casa, "1.5, 2.3"), criar_aposta(casa, "1.5, 2.3")
+    liquidar_aposta(individual, "Ganhou", ["1.5", "2.3"])
+    liquidar_em_lote([(lote, "Ganhou", ["1.5", "2.3"], 0.0, None)])
+    assert aposta(individual)[2] == aposta(lote)[2] == str(1.5 * 2.3)
+
+
+def test_lote_agrega_o_saldo_e_o_historico_por_casa(casa):
+    from db import consultar
+    from liquidacao_apostas import liquidar_em_lote
+    primeira, segunda = criar_aposta(casa, "2.0"), criar_aposta(casa, "1.5")
+    liquidar_em_lote([(primeira, "Ganhou", ["2.0"], 0.0, None), (segunda, "Ganhou", ["1.5"], 0.0, None)])
+    assert saldo(casa) == 135.0
+    historico = consultar("SELECT operacao, valor, observacao FROM historico_saldos WHERE casa_id = %s", (casa,))
+    assert [(o, float(v), obs) for o, v, obs in historico] == [("Ganhou", 35.0, "Liquidação em lote")]
+    movimentos = consultar(
+        "SELECT operacao, valor, observacao FROM movimentos_saldo WHERE casa_id = %s ORDER BY id", (casa,)
+    )
+    assert [(o, float(v), obs) for o, v, obs in movimentos][-1] == ("Ganhou", 35.0, "Liquidação em lote")
+
+
+def test_lote_ignora_apostas_ja_liquidadas(casa):
+    from liquidacao_apostas import liquidar_aposta, liquidar_em_lote
+    aposta_id = criar_aposta(casa, "2.0")
+    liquidar_aposta(aposta_id, "Perdeu", ["2.0"])
+    assert liquidar_em_lote([(aposta_id, "Ganhou", ["2.0"], 0.0, None)]) == (0, 1)
+    assert aposta(aposta_id)[0] == "Perdeu"
+    with pytest.raises(psycopg2.Error, match="já liquidada"):
+        liquidar_aposta(aposta_id, "Ganhou", ["2.0"])
+
+
+@pytest.mark.parametrize("odds", [[], ["2.5"], ["2.0", "2.0"]])
+def test_rejeita_pernas_vazias_ou_que_nao_sao_da_aposta(casa, odds):
+    from liquidacao_apostas import liquidar_aposta, liquidar_em_lote
+    aposta_id = criar_aposta(casa, "1.5, 2.0")
+    with pytest.raises(psycopg2.Error):
+        liquidar_em_lote([(aposta_id, "Ganhou", odds, 0.0, None)])
+    with pytest.raises(psycopg2.Error):
+        liquidar_aposta(aposta_id, "Ganhou", odds)
+    assert aposta(aposta_id)[0] == "Pendente"
+    assert saldo(casa) == 100.0
@@ -0,0 +1,79 @@
+from datetime import date
+
+from roteador_perguntas import detectar_intencao, extrair_periodo, extrair_restricoes, normalizar
+
+CASAS = sorted(['Bet 365', 'Betano', 'Casa de Apostas', 'Stake', 'Outros'], key=len, reverse=True)
+TORNEIOS = sorted(['Brasileirão A', 'Copa do Brasil', 'Outros'], key=len, reverse=True)
+HOJE = date(2024, 6, 15)
+
+
+def intencao(pergunta):
+    return detectar_intencao(pergunta, CASAS, TORNEIOS, HOJE)
+
+
+def test_agrupar_por_casa_de_apostas_nao_filtra_casa():
+    resultado = intencao("Qual o lucro por casa de apostas?")
+    assert resultado['agrupar'] == 'casa'
+    assert resultado['casas'] == []
+
+
+def test_stake_como_palavra_nao_e_casa():
+    texto = normalizar("Quanto de stake apostei este mês?")
+    assert extrair_restricoes(texto, CASAS, TORNEIOS, HOJE)['casas'] == []
+    assert intencao("Quanto apostei em outros jogos?")['casas'] == []
+
+
+def test_nome_generico_citado_explicitamente():
+    assert intencao("Qual meu lucro na Stake?")['casas'] == ['Stake']
+    assert intencao('Qual meu lucro na "Casa de Apostas"?')['casas'] == ['Casa de Apostas']
+    assert intencao("Quanto apostei no torneio 'Outros'?")['torneios'] == []
+
+
+def test_nome_especifico_em_qualquer_lugar():
+    assert intencao("Qual o ROI da bet365 por mês?")['casas'] == ['Bet 365']
+    assert intencao("Lucro em apostas do Brasileirão A")['torneios'] == ['Brasileirão A']
+
+
+def test_normalizar_remove_acentos():
+    assert normalizar("Março Prejuízo") == "marco prejuizo"
+
+
+def test_periodos_relativos():
+    assert extrair_periodo('ultimos 7 dias', HOJE) == (date(2024, 6, 9), HOJE, "últimos 7 dias")
+    assert extrair_periodo('ontem', HOJE)[:2] == (date(2024, 6, 14), date(2024, 6, 14))
+    # 15/06/2024 é um sábado
+    assert extrair_periodo('esta semana', HOJE)[:2] == (date(2024, 6, 10), HOJE)
+    assert extrair_periodo('semana passada', HOJE)[:2] == (date(2024, 6, 3), date(2024, 6, 9))
+    assert extrair_periodo('mes passado', HOJE)[:2] == (date(2024, 5, 1), date(2024, 5, 31))
+    assert extrair_periodo('ano passado', HOJE)[:2] == (date(2023, 1, 1), date(2023, 12, 31))
+
+
+def test_mes_sem_ano_e_o_mais_recente():
+    assert extrair_periodo('em marco', HOJE) == (date(2024, 3, 1), date(2024, 3, 31), "março/2024")
+    assert extrair_periodo('em dezembro', HOJE)[:2] == (date(2023, 12, 1), date(2023, 12, 31))
+    assert extrair_periodo('fevereiro de 2024', HOJE)[1] == date(2024, 2, 29)
+
+
+def test_ano_e_sem_periodo():
+    assert extrair_periodo('lucro em 2023', HOJE)[:2] == (date(2023, 1, 1), date(2023, 12, 31))
+    assert extrair_periodo('lucro total', HOJE) is None
+
+
+def test_metricas_e_agrupamentos():
+    assert intencao("Qual meu ROI por mês?")['metrica'] == 'roi'
+    assert intencao("Qual meu ROI por mês?")['agrupar'] == 'mes'
+    assert intencao("Qual minha taxa de acerto por torneio?")['agrupar'] == 'torneio'
+    assert intencao("Quantas apostas fiz na Betano em maio?")['metrica'] == 'contagem'
+    assert intencao("Quanto ganhei ontem?")['metrica'] == 'lucro'
+
+
+def test_intencao_combina_casa_e_periodo():
+    resultado = intencao("Quanto apostei na Betano no mês passado?")
+    assert resultado['metrica'] == 'total_apostado'
+    assert resultado['casas'] == ['Betano']
+    assert resultado['periodo'][:2] == (date(2024, 5, 1), date(2024, 5, 31))
+
+
+def test_perguntas_abertas_vao_para_o_retriever():
+    assert intencao("Qual foi a aposta com maior odd?") is None
+    assert intencao("Me fale sobre o jogo de ontem") is None